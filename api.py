@@ -0,0 +1,360 @@
+"""Headless HTTP API: Solver, Notes and Quizzer plus PDF extraction/export, without the Streamlit UI.
+
+    python api.py                      # listens on API_HOST:API_PORT (0.0.0.0:8000)
+
+Endpoints (JSON in, JSON out; add "stream": true or send `Accept: text/event-stream` to get
+Server-Sent Events instead):
+
+    POST /v1/solve        {"prompt": str, "document": str?, "context": [str]?}
+    POST /v1/notes        {"text": str}
+    POST /v1/quiz         {"topic": str, "difficulty": str?, "num_questions": int?, "session_id": str?}
+    POST /v1/pdf/extract  raw PDF body; ?first=&last= pick 1-based pages
+    POST /v1/pdf/export   {"text": str, "title": str?}  -> application/pdf
+    GET  /health, GET /metrics
+
+Each request runs on its own thread against the same helper layer as the UI, so the response
+cache, singleflight, scheduler and metrics are shared. Metrics are served on the API's own port
+(GET /metrics); METRICS_PORT is left to the Streamlit app. A client that disconnects mid-stream
+cancels its upstream call. A failed model call is answered 502 (503 when it timed out in the
+model queue), or ends a stream with an `error` event.
+
+Quizzes are never padded with placeholder questions: if the model falls short a quiz may have
+fewer than `num_questions` questions, and one nothing could be generated for is answered like a
+failed model call. Quiz questions are banked and reused. Without a `session_id` nothing tracks which questions a
+caller has seen, so anonymous quiz requests may get the same banked questions again.
+"""
+import hmac
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from core.notes_generator import generate_notes_stream
+from core.quizzer import QuizGenerationError, create_quiz_json, create_quiz_json_stream
+from core.solver import solve_problem_stream
+from utils.cancellation import cancel_scope
+from utils.context_packer import packing_status
+from utils.metrics import Counter, registry
+from utils.pdf_export import export_pdf_bytes
+from utils.pdf_extractor import extract_pdf, pdf_info
+from utils.retrieval import retrieve_context
+from utils.scheduler import queue_status
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Optional shared secret: when set, every /v1 request needs `Authorization: Bearer <API_KEY>`
+API_KEY = os.getenv("API_KEY", "")
+# Request bodies above this are refused (PDF uploads are the largest)
+API_MAX_BODY_MB = float(os.getenv("API_MAX_BODY_MB", "25"))
+# Requests handled at once; more are answered 503 with Retry-After instead of piling up threads
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "64"))
+# Idle socket timeout while reading a request or writing to a stalled client
+API_SOCKET_TIMEOUT_SECONDS = float(os.getenv("API_SOCKET_TIMEOUT_SECONDS", "120"))
+
+# Quiz sizes and difficulties the quizzer generates (same choices as the sidebar; "god" = "god level")
+QUIZ_SIZES = (10, 20, 30, 50)
+QUIZ_DIFFICULTIES = ("easy", "medium", "hard", "god level", "god")
+# The helper layer yields a message with this prefix in place of a reply when the model call failed
+UPSTREAM_FAILURE_PREFIX = "❌ AI"
+
+api_requests = registry.add(Counter("api_requests_total", "Headless API requests by endpoint and status code.", ("endpoint", "status")))
+api_disconnects = registry.add(Counter("api_stream_disconnects_total", "SSE streams whose client went away before the end.", ("endpoint",)))
+
+_inflight = threading.BoundedSemaphore(max(1, API_MAX_INFLIGHT))
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _text_field(body: dict, *names: str, required: bool = True) -> str:
+    for name in names:
+        value = body.get(name)
+        if isinstance(value, str) and value.strip():
+            return value
+    if required:
+        raise ApiError(400, f"'{names[0]}' is required.")
+    return ""
+
+
+def _upstream_error(message: str) -> ApiError:
+    """502 when the model call failed, 503 when the request timed out in the model queue."""
+    # QueueTimeout: "Timed out after waiting in the model queue (...)"
+    return ApiError(503 if "model queue" in message else 502, message)
+
+
+def _checked(chunks):
+    """Pass text chunks through; a helper-layer failure message becomes an ApiError."""
+    for text in chunks:
+        if text.startswith(UPSTREAM_FAILURE_PREFIX):
+            raise _upstream_error(text)
+        yield text
+
+
+def _checked_quiz(questions):
+    """Pass quiz questions through; a quiz nothing could be generated for becomes an ApiError."""
+    try:
+        yield from questions
+    except QuizGenerationError as e:
+        raise _upstream_error(str(e)) from None
+
+
+def _page_range(query: dict, num_pages: int) -> tuple[int, int]:
+    """0-based [start, end) from 1-based inclusive ?first=&last= (whole document by default)."""
+    try:
+        first = int(query.get("first", ["1"])[0])
+        last = int(query.get("last", [str(num_pages)])[0])
+    except ValueError:
+        raise ApiError(400, "'first' and 'last' must be page numbers.") from None
+    first, last = max(1, first), min(num_pages, last)
+    if first > last:
+        raise ApiError(400, f"Empty page range (document has {num_pages} pages).")
+    return first - 1, last
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "BrainDrainAPI/1.0"
+    timeout = API_SOCKET_TIMEOUT_SECONDS
+
+    # --- Plumbing ---
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # Client hung up between requests
+            pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.status = status
+
+    def _json(self, status: int, data, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", headers)
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "Invalid Content-Length.") from None
+        if length > API_MAX_BODY_MB * 1024 * 1024:
+            raise ApiError(413, f"Request body is larger than {API_MAX_BODY_MB:g} MB.")
+        return self.rfile.read(length) if length > 0 else b""
+
+    def _read_json(self) -> dict:
+        raw = self._read_body()
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            raise ApiError(400, "Request body is not valid JSON.") from None
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object.")
+        return body
+
+    def _wants_stream(self, body: dict) -> bool:
+        if "stream" in body:
+            return bool(body["stream"])
+        return "text/event-stream" in (self.headers.get("Accept") or "")
+
+    def _authorized(self) -> bool:
+        if not API_KEY:
+            return True
+        auth = self.headers.get("Authorization") or ""
+        return hmac.compare_digest(auth.encode("utf-8"), f"Bearer {API_KEY}".encode("utf-8"))
+
+    # --- Server-Sent Events ---
+
+    def _sse(self, endpoint: str, events) -> None:
+        """Send `events` ((event, data) pairs) as Server-Sent Events, plus queue/trim notices.
+
+        A write to a client that has gone away cancels the LLM calls behind the stream.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        # Stop reverse proxies (nginx ingress) from buffering the stream
+        self.send_header("X-Accel-Buffering", "no")
+        self.end_headers()
+        self.status = 200
+        lock = threading.Lock()
+        gone = threading.Event()
+
+        def _emit(event: str, data) -> None:
+            payload = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+            with lock:
+                if gone.is_set():
+                    return
+                try:
+                    self.wfile.write(payload)
+                    self.wfile.flush()
+                except OSError:
+                    gone.set()
+                    token.cancel()
+
+        # Observers may fire on pump threads; _emit serializes writes
+        with cancel_scope() as token, queue_status(lambda position: _emit("queue", {"position": position})), \
+                packing_status(lambda report: _emit("trimmed", {"dropped_tokens": report["dropped_tokens"]})):
+            it = iter(events)
+            try:
+                for event, data in it:
+                    _emit(event, data)
+                    if gone.is_set():
+                        break
+                else:
+                    _emit("done", {})
+            except ApiError as e:
+                _emit("error", {"error": str(e), "status": e.status})
+            except Exception as e:
+                _emit("error", {"error": str(e)})
+            finally:
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+        if gone.is_set():
+            api_disconnects.inc(endpoint)
+        self.close_connection = True
+
+    # --- Endpoints ---
+
+    def _solve(self, body: dict) -> None:
+        prompt = _text_field(body, "prompt")
+        context = body.get("context")
+        if not (isinstance(context, list) and all(isinstance(c, str) for c in context)):
+            document = _text_field(body, "document", required=False)
+            context = retrieve_context(document, prompt) if document else None
+        if self._wants_stream(body):
+            self._sse("solve", (("chunk", {"text": text}) for text in _checked(solve_problem_stream(prompt, context_chunks=context))))
+        else:
+            self._json(200, {"text": "".join(_checked(solve_problem_stream(prompt, context_chunks=context)))})
+
+    def _notes(self, body: dict) -> None:
+        text = _text_field(body, "text")
+        if self._wants_stream(body):
+            self._sse("notes", (("chunk", {"text": chunk}) for chunk in _checked(generate_notes_stream(text))))
+        else:
+            self._json(200, {"text": "".join(_checked(generate_notes_stream(text)))})
+
+    def _quiz(self, body: dict) -> None:
+        source = _text_field(body, "topic", "text")
+        difficulty = body.get("difficulty") or "Medium"
+        if not (isinstance(difficulty, str) and difficulty.strip().lower() in QUIZ_DIFFICULTIES):
+            raise ApiError(400, f"'difficulty' must be one of {', '.join(QUIZ_DIFFICULTIES)}.")
+        difficulty = difficulty.strip()
+        num_questions = body.get("num_questions") or 10
+        if num_questions not in QUIZ_SIZES:
+            raise ApiError(400, f"'num_questions' must be one of {', '.join(map(str, QUIZ_SIZES))}.")
+        session_id = body.get("session_id") if isinstance(body.get("session_id"), str) else None
+        if self._wants_stream(body):
+            questions = create_quiz_json_stream(source, difficulty, num_questions, session_id=session_id, placeholders=False)
+            self._sse("quiz", (("question", q) for q in _checked_quiz(questions)))
+        else:
+            try:
+                quiz = create_quiz_json(source, difficulty, num_questions, session_id=session_id, placeholders=False)
+            except QuizGenerationError as e:
+                raise _upstream_error(str(e)) from None
+            self._json(200, quiz)
+
+    def _pdf_extract(self, query: dict) -> None:
+        data = self._read_body()
+        if not data.startswith(b"%PDF"):
+            raise ApiError(400, "Request body must be a PDF file.")
+        try:
+            info = pdf_info(data)
+        except Exception as e:
+            raise ApiError(400, f"Could not read PDF: {e}") from None
+        start, end = _page_range(query, info["num_pages"])
+        result = extract_pdf(data, start=start, end=end)
+        self._json(200, {
+            "digest": result["digest"],
+            "num_pages": info["num_pages"],
+            "first": start + 1,
+            "last": end,
+            "outline": info["outline"],
+            "text": "".join(result["pages"]),
+            "seconds": round(result["seconds"], 4),
+            "cached": result["cached"],
+        })
+
+    def _pdf_export(self, body: dict) -> None:
+        text = _text_field(body, "text")
+        title = str(body.get("title") or "BrainDrain Notes")
+        self._send(200, export_pdf_bytes(text, title), "application/pdf",
+                   {"Content-Disposition": 'attachment; filename="braindrain_notes.pdf"'})
+
+    # --- Routing ---
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path in {"/", "/health"}:
+            self._json(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._send(200, registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._json(404, {"error": "Not found."})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        routes = {
+            "/v1/solve": lambda: self._solve(self._read_json()),
+            "/v1/notes": lambda: self._notes(self._read_json()),
+            "/v1/quiz": lambda: self._quiz(self._read_json()),
+            "/v1/pdf/extract": lambda: self._pdf_extract(parse_qs(url.query)),
+            "/v1/pdf/export": lambda: self._pdf_export(self._read_json()),
+        }
+        endpoint = url.path.rsplit("/v1/", 1)[-1]
+        self.status = 500
+        try:
+            route = routes.get(url.path)
+            if route is None:
+                raise ApiError(404, "Not found.")
+            if not self._authorized():
+                raise ApiError(401, "Missing or invalid API key.")
+            if not _inflight.acquire(blocking=False):
+                self._json(503, {"error": "Server busy, retry shortly."}, {"Retry-After": "2"})
+                return
+            try:
+                route()
+            finally:
+                _inflight.release()
+        except ApiError as e:
+            self._json(e.status, {"error": str(e)}, {"Retry-After": "2"} if e.status == 503 else None)
+        except OSError:
+            # Client went away while we were reading or answering
+            self.close_connection = True
+        except Exception as e:
+            self._json(500, {"error": f"❌ AI unavailable: {e}"})
+        finally:
+            api_requests.inc(endpoint if url.path in routes else "unknown", str(self.status))
+
+
+def make_server(host: str = API_HOST, port: int = API_PORT) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    server = make_server()
+    print(f"[api] BrainDrainAI API listening on http://{API_HOST}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
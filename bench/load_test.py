@@ -0,0 +1,481 @@
+"""Multi-session load harness: many simulated students on one `streamlit run main.py`, as in a pod.
+
+    python -m bench.load_test                          # levels 1,2,4,8,16 against the mock API
+    python -m bench.load_test --levels 1,4,16,32 --questions 5 --unique-pdfs --app-cpus 1
+
+The harness starts the app once, the way the pod runs it, pointed at the mock API, and connects
+N browser-like clients to it over Streamlit's websocket. Every session runs the same journey: open
+the app, upload a PDF, ask the Solver, generate notes, switch to Quizzer, start a quiz and answer
+a few questions. Because all sessions live in the one app process, they share what they share in
+a replica: the scheduler and its concurrency limit, singleflight, the job and export pools and the
+in-memory caches. `--app-cpus 1` pins the app to one CPU like the deployment's limit.
+
+Each client speaks the frontend's protocol (BackMsg/ForwardMsg protobufs): it sends every
+widget value it holds with each rerun, sends clicks and chat messages once, uploads files through
+the upload endpoint and answers the quiz fragment's auto-reruns while it waits for a question. A
+rerun is timed from sending it until the app reports the run finished. Clients are threads of this
+process and only encode and decode messages; with --app-cpus they run on the remaining CPUs.
+
+Reported per level: rerun latency p50/p99 (overall and per step), reruns/sec, errors and the app
+process's resident memory (children included): baseline, peak and growth per session. The
+saturation point is the first level where throughput stops growing (< --min-gain) or p99 exceeds
+--p99-budget. One warm-up journey runs before the levels so every level sees warm imports and
+caches, like a pod that has been up for a while.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+
+from bench.mock_fireworks import MockFireworks
+from bench.run_bench import RESULTS_DIR, _configure_env, _git_commit, _percentile, NOTES_TEXT
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(REPO_ROOT, "main.py")
+
+# Widget values the frontend sends once (a click, a chat message) rather than on every rerun
+_TRIGGER_FIELDS = {"trigger_value", "string_trigger_value", "chat_input_value", "json_trigger_value"}
+
+
+def _sample_pdf(tag: str = "") -> bytes:
+    from components.pdf_handler import generate_pdf_from_text
+
+    body = "\n\n".join(f"## Chapter {i} {tag}\n\n{NOTES_TEXT[:1800]}" for i in range(12))
+    return generate_pdf_from_text(body, title=f"Load test handout {tag}".strip())
+
+
+# --- App under test ---------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_app(cpus: int | None, log_path: str, timeout: float = 60) -> tuple[subprocess.Popen, str]:
+    """`streamlit run main.py` on a free local port (environment already pointed at the mock); returns (process, base URL)."""
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", APP_FILE,
+        "--server.headless=true", "--server.address=127.0.0.1", f"--server.port={port}",
+        # Local clients without a browser: no XSRF cookie round-trip or CORS checks
+        "--server.enableXsrfProtection=false", "--server.enableCORS=false",
+        "--server.fileWatcherType=none", "--browser.gatherUsageStats=false",
+    ]
+    log = open(log_path, "w", encoding="utf-8")
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT)
+    if cpus:
+        available = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(proc.pid, available[:cpus])
+        if len(available) > cpus:
+            # Keep the clients off the app's CPUs
+            os.sched_setaffinity(0, available[cpus:])
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=2).read()
+            return proc, base_url
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError(f"streamlit did not start; see {log_path}")
+            time.sleep(0.2)
+
+
+def _rss_bytes(pid: int) -> int | None:
+    """Resident memory of `pid` and its child processes (PDF extraction workers); None off Linux."""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status", "r", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", "r", encoding="utf-8") as fh:
+                    pending.extend(int(child) for child in fh.read().split())
+    except (OSError, ValueError):
+        return total or None
+    return total
+
+
+class _RssSampler:
+    """Peak resident memory of the app while a level runs."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes(self.pid) or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# --- Browser-like client ------------------------------------------------------------
+
+class AppClient:
+    """One browser tab: a websocket session on the app plus the widget values the frontend would send."""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.ws = None
+        self.session_id = ""
+        # Delta path -> (element, fragment id) as currently shown
+        self.elements: dict[tuple, tuple] = {}
+        self.states: dict = {}
+        # Fragment id -> auto-rerun interval (seconds) requested by the app
+        self.auto_reruns: dict[str, float] = {}
+        self.exceptions: list[str] = []
+
+    def __enter__(self) -> "AppClient":
+        from websockets.sync.client import connect
+
+        self.ws = connect(
+            self.base_url.replace("http://", "ws://") + "/_stcore/stream",
+            subprotocols=["streamlit"], max_size=None, open_timeout=self.timeout,
+        ).__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.ws.__exit__(*exc)
+
+    def _recv(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = ForwardMsg()
+        msg.ParseFromString(self.ws.recv(timeout=self.timeout))
+        return msg
+
+    def run(self, fragment_id: str = "") -> None:
+        """Rerun the app (or one fragment) with the current widget values; returns once the run has finished."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        back.rerun_script.widget_states.widgets.extend(self.states.values())
+        if fragment_id:
+            back.rerun_script.fragment_id = fragment_id
+            back.rerun_script.is_auto_rerun = True
+        self.ws.send(back.SerializeToString())
+        self.states = {wid: s for wid, s in self.states.items() if s.WhichOneof("value") not in _TRIGGER_FIELDS}
+
+        shown: dict[tuple, tuple] = {}
+        fragments = {fragment_id} if fragment_id else set()
+        while True:
+            msg = self._recv()
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # Every script run (also one continued after st.rerun) starts with this
+                shown = {}
+                self.session_id = msg.new_session.initialize.session_id or self.session_id
+                fragments = set(msg.new_session.fragment_ids_this_run) or fragments
+                if not fragments:
+                    self.auto_reruns.clear()
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                shown[tuple(msg.metadata.delta_path)] = (element, msg.delta.fragment_id)
+                if element.WhichOneof("type") == "exception":
+                    self.exceptions.append(element.exception.message)
+            elif kind == "auto_rerun":
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                for fid in msg.stop_auto_rerun.fragment_ids:
+                    self.auto_reruns.pop(fid, None)
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+        if fragments:
+            # A fragment run only redraws its own elements
+            kept = {path: entry for path, entry in self.elements.items() if entry[1] not in fragments}
+            self.elements = {**kept, **shown}
+        else:
+            self.elements = shown
+
+    def poll(self) -> float:
+        """What the frontend does while the app waits on a background job: rerun the polling fragment (or the app).
+
+        Returns the interval the app asked for between polls.
+        """
+        if self.auto_reruns:
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            self.run(fragment_id)
+            return interval
+        self.run()
+        return 0.25
+
+    def widget(self, kind: str, key: str | None = None):
+        """The first shown `kind` widget proto (with user key `key`), or None."""
+        for path in sorted(self.elements):
+            element = self.elements[path][0]
+            if element.WhichOneof("type") == kind:
+                proto = getattr(element, kind)
+                if key is None or proto.id.endswith(f"-{key}"):
+                    return proto
+        return None
+
+    def _state(self, proto):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState(id=proto.id)
+        self.states[proto.id] = state
+        return state
+
+    def select(self, proto, option: str) -> None:
+        self._state(proto).string_value = option
+
+    def click(self, proto) -> None:
+        self._state(proto).trigger_value = True
+
+    def chat(self, proto, text: str) -> None:
+        self._state(proto).chat_input_value.data = text
+
+    def upload(self, proto, name: str, data: bytes, content_type: str = "application/pdf") -> None:
+        """Upload a file like the uploader widget: ask for upload URLs, PUT the file, then set the widget."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        request = BackMsg()
+        request.file_urls_request.request_id = uuid.uuid4().hex
+        request.file_urls_request.file_names.append(name)
+        request.file_urls_request.session_id = self.session_id
+        self.ws.send(request.SerializeToString())
+        while True:
+            msg = self._recv()
+            if msg.WhichOneof("type") == "file_urls_response" and msg.file_urls_response.response_id == request.file_urls_request.request_id:
+                break
+        urls = msg.file_urls_response.file_urls[0]
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        put = urllib.request.Request(
+            urls.upload_url if urls.upload_url.startswith("http") else self.base_url + urls.upload_url,
+            data=body, method="PUT", headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        urllib.request.urlopen(put, timeout=self.timeout).read()
+        info = self._state(proto).file_uploader_state_value.uploaded_file_info.add()
+        info.name = name
+        info.size = len(data)
+        info.file_id = urls.file_id
+        info.file_urls.CopyFrom(urls)
+
+
+class Session:
+    """One simulated student; records (step, seconds) for every rerun it triggers."""
+
+    def __init__(self, sid: int, pdf: bytes, questions: int, think: float, timeout: float):
+        self.sid = sid
+        self.pdf = pdf
+        self.questions = questions
+        self.think = think
+        self.timeout = timeout
+        self.samples: list[tuple[str, float]] = []
+        self.errors: list[str] = []
+        self.started = self.finished = 0.0
+        self.app: AppClient | None = None
+
+    def _run(self, step: str, action=None, poll: bool = False) -> float:
+        if action is not None:
+            action()
+        seen = len(self.app.exceptions)
+        started = time.perf_counter()
+        interval = self.app.poll() if poll else self.app.run()
+        self.samples.append((step, time.perf_counter() - started))
+        self.errors.extend(f"{step}: {message}" for message in self.app.exceptions[seen:])
+        if self.think:
+            time.sleep(self.think)
+        return interval or 0.0
+
+    def _find(self, kind: str, key: str):
+        """The widget with `key`, polling (like the quiz fragment's auto-rerun) until it renders or we time out."""
+        deadline = time.monotonic() + self.timeout
+        interval = 0.25
+        while True:
+            proto = self.app.widget(kind, key)
+            if proto is not None:
+                return proto
+            if time.monotonic() > deadline:
+                self.errors.append(f"{key}: not rendered after {self.timeout:.0f}s")
+                return None
+            time.sleep(interval)
+            interval = self._run("quiz_poll", poll=True) or 0.25
+
+    def journey(self, base_url: str) -> None:
+        self.started = time.time()
+        try:
+            with AppClient(base_url, self.timeout) as app:
+                self.app = app
+                self._journey(app)
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+        self.finished = time.time()
+
+    def _journey(self, app: AppClient) -> None:
+        self._run("load")
+        self._run("upload_pdf", lambda: app.upload(app.widget("file_uploader"), f"handout-{self.sid}.pdf", self.pdf))
+        self._run("solver", lambda: app.chat(app.widget("chat_input"), f"Session {self.sid}: explain memoization vs tabulation."))
+        modes = app.widget("radio", "mode_radio")
+        self._run("mode_notes", lambda: app.select(modes, "Notes Generator"))
+        self._run("notes", lambda: app.chat(app.widget("chat_input"), f"Session {self.sid}: {NOTES_TEXT[:1500]}"))
+        self._run("mode_quizzer", lambda: app.select(modes, "Quizzer"))
+        self._run("quiz_start", lambda: app.chat(app.widget("chat_input"), f"Session {self.sid}: operating systems scheduling"))
+        for i in range(self.questions):
+            choice = self._find("radio", f"quiz_choice_{i}")
+            if choice is None:
+                break
+            self._run("quiz_answer", lambda: (app.select(choice, choice.options[0]), app.click(app.widget("button", f"submit_{i}"))))
+            next_button = self._find("button", f"next_{i}")
+            if next_button is None:
+                break
+            self._run("quiz_next", lambda: app.click(next_button))
+
+
+# --- Levels and report --------------------------------------------------------------
+
+def _run_level(n: int, pdfs: list[bytes], args, base_url: str, app_pid: int) -> dict:
+    sessions = [Session(i, pdfs[i % len(pdfs)], args.questions, args.think_ms / 1000.0, args.timeout) for i in range(n)]
+    baseline = _rss_bytes(app_pid)
+
+    def _start(session: Session, delay: float) -> None:
+        time.sleep(delay)
+        session.journey(base_url)
+
+    threads = [threading.Thread(target=_start, args=(s, i * args.ramp_ms / 1000.0), daemon=True) for i, s in enumerate(sessions)]
+    with _RssSampler(app_pid) as rss:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = max(s.finished for s in sessions) - min(s.started for s in sessions)
+
+    latencies = [sec for s in sessions for _, sec in s.samples]
+    steps: dict[str, list[float]] = {}
+    for s in sessions:
+        for step, sec in s.samples:
+            steps.setdefault(step, []).append(sec)
+    errors = [e for s in sessions for e in s.errors]
+    return {
+        "sessions": n,
+        "reruns": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "reruns_per_sec": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50": round(_percentile(latencies, 0.5), 4),
+        "p99": round(_percentile(latencies, 0.99), 4),
+        "mean": round(statistics.fmean(latencies), 4) if latencies else 0.0,
+        "steps": {
+            step: {"p50": round(_percentile(v, 0.5), 4), "p99": round(_percentile(v, 0.99), 4), "n": len(v)}
+            for step, v in steps.items()
+        },
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "rss_baseline_bytes": baseline,
+        "rss_peak_bytes": rss.peak or None,
+        "rss_per_session_bytes": (rss.peak - baseline) // n if baseline and rss.peak else None,
+    }
+
+
+def _saturation(levels: list[dict], min_gain: float, p99_budget: float) -> dict:
+    for prev, cur in zip(levels, levels[1:]):
+        gain = (cur["reruns_per_sec"] - prev["reruns_per_sec"]) / prev["reruns_per_sec"] if prev["reruns_per_sec"] else 0.0
+        if cur["p99"] > p99_budget:
+            return {"sessions": prev["sessions"], "reason": f"p99 {cur['p99']:.2f}s > {p99_budget:.2f}s at {cur['sessions']} sessions"}
+        if gain < min_gain:
+            return {"sessions": prev["sessions"], "reason": f"throughput +{gain * 100:.0f}% from {prev['sessions']} to {cur['sessions']} sessions"}
+    return {"sessions": None, "reason": "not reached; try higher --levels"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BrainDrainAI multi-session load test (one streamlit process + mock API)")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrent session counts")
+    parser.add_argument("--questions", type=int, default=3, help="quiz questions answered per session")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a session's reruns")
+    parser.add_argument("--ramp-ms", type=float, default=50, help="delay between session starts")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout (seconds)")
+    parser.add_argument("--unique-pdfs", action="store_true", help="give every session a different PDF (no shared cache hits)")
+    parser.add_argument("--app-cpus", type=int, default=0, help="pin the app to this many CPUs, like a pod CPU limit (0 = all)")
+    parser.add_argument("--p99-budget", type=float, default=5.0, help="rerun p99 (seconds) treated as saturated")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-sec", type=float, default=400)
+    parser.add_argument("--max-output-tokens", type=int, default=400)
+    parser.add_argument("--out", help="result file (default: bench/results/load-<commit>-<timestamp>.json)")
+    args = parser.parse_args()
+
+    from bench.mock_fireworks import Responder
+
+    mock = MockFireworks(0, args.ttft_ms, args.tokens_per_sec, responder=Responder(max_output_tokens=args.max_output_tokens)).start()
+    _configure_env(mock.url)
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    pdfs = [_sample_pdf(f"#{i}") for i in range(max(levels))] if args.unique_pdfs else [_sample_pdf()]
+    commit = _git_commit()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{commit}-{stamp}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    results = []
+    app, base_url = _start_app(args.app_cpus or None, os.path.splitext(out)[0] + ".app.log")
+    try:
+        warmup = Session(-1, _sample_pdf("warm-up"), 1, 0.0, args.timeout)
+        warmup.journey(base_url)
+        if warmup.errors:
+            print(f"warm-up errors: {warmup.errors[:3]}", flush=True)
+        for n in levels:
+            result = _run_level(n, pdfs, args, base_url, app.pid)
+            results.append(result)
+            rss = f"  rss +{result['rss_per_session_bytes'] / 1024 / 1024:.1f} MiB/session" if result["rss_per_session_bytes"] is not None else ""
+            print(
+                f"{n:>4} sessions  p50 {result['p50']:7.3f}s  p99 {result['p99']:7.3f}s  "
+                f"{result['reruns_per_sec']:7.2f} reruns/s  errors {result['errors']}{rss}",
+                flush=True,
+            )
+    finally:
+        app.terminate()
+        try:
+            app.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            app.kill()
+        mock.stop()
+
+    saturation = _saturation(results, args.min_gain, args.p99_budget)
+    print(f"saturation: {saturation['sessions']} sessions ({saturation['reason']})")
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "app_cpus": args.app_cpus or None,
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+        "levels": results,
+        "saturation": saturation,
+    }
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
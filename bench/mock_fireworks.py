@@ -0,0 +1,280 @@
+"""Local stand-in for the Fireworks chat completions API.
+
+Serves POST .../chat/completions (streaming SSE and plain JSON) with a configurable time to
+first token and token rate, so the app's own overhead can be measured without the provider:
+
+    python -m bench.mock_fireworks --port 8765 --ttft-ms 300 --tokens-per-sec 80
+    FIREWORKS_BASE_URL=http://127.0.0.1:8765 FIREWORKS_API_KEY=mock streamlit run main.py
+
+Responses are recorded streams (--recordings) when one matches the prompt, otherwise
+deterministic synthetic text shaped like what the caller asked for (quiz JSON, notes
+sections, a notes summary, or a worked answer).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_TTFT_MS = float(os.getenv("MOCK_TTFT_MS", "300"))
+MOCK_TOKENS_PER_SEC = float(os.getenv("MOCK_TOKENS_PER_SEC", "80"))
+MOCK_TOKENS_PER_CHUNK = int(os.getenv("MOCK_TOKENS_PER_CHUNK", "4"))
+MOCK_MAX_OUTPUT_TOKENS = int(os.getenv("MOCK_MAX_OUTPUT_TOKENS", "800"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+
+_QUIZ_RE = re.compile(r"exactly (\d+) questions")
+_PART_RE = re.compile(r"part (\d+) of (\d+)")
+_WORDS = (
+    "gradient entropy vector matrix theorem proof lemma kernel tensor integral derivative limit "
+    "series function domain range mapping graph node edge path cycle tree heap queue stack cache "
+    "latency throughput protocol packet frame signal filter sample estimate variance bias model"
+).split()
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text into ~4-character pieces, the usual rule of thumb for one token."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+class Profile:
+    """Latency shape of one model: time to first token and decode rate (0 = unlimited)."""
+
+    def __init__(self, ttft_ms: float, tokens_per_sec: float):
+        self.ttft = max(0.0, ttft_ms) / 1000.0
+        self.tokens_per_sec = max(0.0, tokens_per_sec)
+
+    @classmethod
+    def parse(cls, spec: str) -> tuple[str, "Profile"]:
+        """"model=ttft_ms:tokens_per_sec" -> (model, Profile)."""
+        model, _, shape = spec.partition("=")
+        ttft, _, rate = shape.partition(":")
+        return model.strip(), cls(float(ttft or 0), float(rate or 0))
+
+
+class Responder:
+    """Builds the response text for a request: a matching recording, else synthetic content."""
+
+    def __init__(self, recordings: list[dict] | None = None, max_output_tokens: int = MOCK_MAX_OUTPUT_TOKENS):
+        self.recordings = recordings or []
+        self.max_output_tokens = max_output_tokens
+
+    def respond(self, prompt: str, max_tokens: int | None) -> list[str]:
+        for rec in self.recordings:
+            if rec.get("match", "") in prompt:
+                return list(rec["chunks"])
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        quiz = _QUIZ_RE.search(prompt)
+        if quiz:
+            text = self._quiz(int(quiz.group(1)), rng)
+        elif "Summary & Key Takeaways" in prompt:
+            text = self._summary(rng)
+        else:
+            part = _PART_RE.search(prompt)
+            budget = min(self.max_output_tokens, max_tokens or self.max_output_tokens)
+            text = self._notes(budget, rng, int(part.group(1)) if part else 0)
+        pieces = _tokens(text)
+        if max_tokens and not quiz:
+            pieces = pieces[:max_tokens]
+        return pieces
+
+    @staticmethod
+    def _sentence(rng: random.Random, n: int = 14) -> str:
+        words = [rng.choice(_WORDS) for _ in range(n)]
+        return " ".join(words).capitalize() + "."
+
+    def _quiz(self, n: int, rng: random.Random) -> str:
+        quiz = []
+        for i in range(n):
+            topic = " ".join(rng.choice(_WORDS) for _ in range(3))
+            quiz.append({
+                "question": f"Q{i + 1}: which statement about the {topic} is correct?",
+                "options": [f"The {topic} {rng.choice(_WORDS)} option {j + 1}" for j in range(4)],
+                "answer_index": rng.randrange(4),
+                "explanation": self._sentence(rng, 10),
+            })
+        return json.dumps({"quiz": quiz})
+
+    def _summary(self, rng: random.Random) -> str:
+        bullets = "\n".join(f"- {self._sentence(rng, 8)}" for _ in range(6))
+        return f"## Summary & Key Takeaways\n\n{self._sentence(rng, 30)}\n\n{bullets}\n"
+
+    def _notes(self, budget_tokens: int, rng: random.Random, part: int) -> str:
+        out = []
+        size = 0
+        section = 0
+        while size < budget_tokens * 4:
+            section += 1
+            heading = " ".join(rng.choice(_WORDS) for _ in range(2)).title()
+            block = [f"## {heading} {part}.{section}" if part else f"## {heading}", ""]
+            block += [" ".join(self._sentence(rng) for _ in range(4)), ""]
+            if section % 3 == 0:
+                block += ["```python", "def f(x):", "    return x * x", "```", ""]
+            if section % 4 == 0:
+                block += ["$$ E = \\sum_i p_i x_i $$", ""]
+            chunk = "\n".join(block)
+            out.append(chunk)
+            size += len(chunk)
+        return "\n".join(out)[: budget_tokens * 4]
+
+
+class MockFireworks:
+    """In-process mock server; `url` is what FIREWORKS_BASE_URL should point at."""
+
+    def __init__(self, port: int = 0, ttft_ms: float = MOCK_TTFT_MS, tokens_per_sec: float = MOCK_TOKENS_PER_SEC,
+                 tokens_per_chunk: int = MOCK_TOKENS_PER_CHUNK, profiles: dict | None = None,
+                 responder: Responder | None = None, error_rate: float = MOCK_ERROR_RATE, seed: int = 0):
+        self.default = Profile(ttft_ms, tokens_per_sec)
+        self.profiles = profiles or {}
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.responder = responder or Responder()
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockFireworks":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-fireworks", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                mock.requests += 1
+                if mock._should_fail():
+                    self._json(503, {"error": {"message": "mock overloaded", "type": "overloaded"}})
+                    return
+                model = body.get("model", "mock")
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                pieces = mock.responder.respond(prompt, body.get("max_tokens"))
+                profile = mock.profiles.get(model, mock.default)
+                usage = {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(pieces),
+                    "total_tokens": len(prompt) // 4 + len(pieces),
+                }
+                if body.get("stream"):
+                    self._stream(model, pieces, profile, usage)
+                else:
+                    time.sleep(profile.ttft + (len(pieces) / profile.tokens_per_sec if profile.tokens_per_sec else 0))
+                    self._json(200, {
+                        "id": "mock-" + hashlib.md5(prompt.encode("utf-8")).hexdigest()[:12],
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+
+            def _json(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _event(self, payload) -> None:
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                line = f"data: {data}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, model: str, pieces: list[str], profile: Profile, usage: dict) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": "mock-stream", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+                step = mock.tokens_per_chunk
+                interval = step / profile.tokens_per_sec if profile.tokens_per_sec else 0.0
+                started = time.monotonic()
+                try:
+                    time.sleep(profile.ttft)
+                    for i in range(0, len(pieces), step):
+                        # Pace against the start time so scheduling jitter does not accumulate
+                        due = started + profile.ttft + (i // step) * interval
+                        delay = due - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        delta = {"content": "".join(pieces[i:i + step])}
+                        if i == 0:
+                            delta["role"] = "assistant"
+                        self._event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                    self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+                    self._event("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client closed the stream early (cancelled or hedged request)
+                    pass
+
+        return Handler
+
+
+def load_recordings(path: str) -> list[dict]:
+    """Recordings file: a JSON list of {"match": "<prompt substring>", "chunks": ["...", ...]}."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Fireworks-compatible mock server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=MOCK_TTFT_MS)
+    parser.add_argument("--tokens-per-sec", type=float, default=MOCK_TOKENS_PER_SEC, help="0 = unlimited")
+    parser.add_argument("--tokens-per-chunk", type=int, default=MOCK_TOKENS_PER_CHUNK)
+    parser.add_argument("--max-output-tokens", type=int, default=MOCK_MAX_OUTPUT_TOKENS)
+    parser.add_argument("--model-profile", action="append", default=[], help="model=ttft_ms:tokens_per_sec (repeatable)")
+    parser.add_argument("--recordings", help="JSON list of recorded streams to replay")
+    parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE)
+    args = parser.parse_args()
+
+    profiles = dict(Profile.parse(spec) for spec in args.model_profile)
+    responder = Responder(load_recordings(args.recordings) if args.recordings else None, args.max_output_tokens)
+    mock = MockFireworks(args.port, args.ttft_ms, args.tokens_per_sec, args.tokens_per_chunk, profiles, responder, args.error_rate)
+    print(f"Mock Fireworks API on {mock.url} (ttft {args.ttft_ms:.0f} ms, {args.tokens_per_sec:g} tok/s)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Notes-to-PDF layout benchmark: the layout engine in utils.pdf_export versus the legacy path.
+
+    python -m bench.pdf_layout                     # ~10k-word notes, 5 iterations
+    python -m bench.pdf_layout --words 20000 --iterations 10
+
+Two documents are measured. "plain" has only headings, bullets and paragraphs, which both
+paths lay out the same way. "mixed" adds fenced code blocks and pipe tables, which only the new
+engine understands (the legacy path wraps them as paragraphs). Reported per path: seconds,
+pages and pages/sec, plus a wrap-only comparison of wrap_text against reportlab's simpleSplit.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+from bench.run_bench import RESULTS_DIR, NOTES_TEXT, _git_commit, _percentile
+from utils.pdf_export import generate_pdf_from_text, wrap_text
+
+_WORDS = NOTES_TEXT.split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def build_notes(words: int, mixed: bool, seed: int = 0) -> str:
+    """Synthetic long-form notes of roughly `words` words, shaped like the Notes Generator output."""
+    rng = random.Random(seed)
+    out: list[str] = []
+    count = 0
+    section = 0
+    while count < words:
+        section += 1
+        out.append(f"## {section}. {_sentence(rng, 5)[:-1]}")
+        out.append("### Overview")
+        para = " ".join(_sentence(rng, rng.randint(10, 22)) for _ in range(5))
+        out.append(para)
+        bullets = [f"- **{rng.choice(_WORDS)}**: {_sentence(rng, rng.randint(8, 24))}" for _ in range(4)]
+        bullets += [f"  - {_sentence(rng, rng.randint(6, 14))}" for _ in range(2)]
+        out.append("\n".join(bullets))
+        count += len(para.split()) + sum(len(b.split()) for b in bullets)
+        if mixed:
+            code = [f"def step_{section}(n):", "    memo = {}", "    for i in range(n):",
+                    f"        memo[i] = memo.get(i - 1, 0) + i  # {_sentence(rng, 6)}", "    return memo"]
+            out.append("```python\n" + "\n".join(code) + "\n```")
+            table = ["| Term | Meaning | Example |", "|---|---|---|"]
+            table += [f"| {rng.choice(_WORDS)} | {_sentence(rng, 8)} | {_sentence(rng, 4)} |" for _ in range(4)]
+            out.append("\n".join(table))
+            count += 60
+    return "\n\n".join(out)
+
+
+def _pages(pdf: bytes) -> int:
+    return len(PdfReader(io.BytesIO(pdf)).pages)
+
+
+def _measure(fn, text: str, iterations: int) -> dict:
+    # The legacy path runs with reportlab's default ASCII85 page encoding; the engine's canvas skips it
+    seconds = []
+    pdf = b""
+    for _ in range(iterations):
+        started = time.perf_counter()
+        pdf = fn(text, title="Bench")
+        seconds.append(time.perf_counter() - started)
+    pages = _pages(pdf)
+    p50 = _percentile(seconds, 0.5)
+    return {"seconds_p50": round(p50, 4), "pages": pages, "pages_per_sec": round(pages / p50, 1) if p50 else 0.0, "bytes": len(pdf)}
+
+
+def _measure_wrap(text: str, iterations: int) -> dict:
+    lines = [line for line in text.splitlines() if line.strip()]
+    out = {}
+    for name, fn in (("simpleSplit", simpleSplit), ("wrap_text", wrap_text)):
+        seconds = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            for line in lines:
+                fn(line, "Helvetica", 12, 504)
+            seconds.append(time.perf_counter() - started)
+        out[name] = round(_percentile(seconds, 0.5), 4)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Notes-to-PDF layout benchmark (new engine vs legacy)")
+    parser.add_argument("--words", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--out", help="result file (default: bench/results/pdf-layout-<commit>-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = {"commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "words": args.words, "documents": {}}
+    for doc, mixed in (("plain", False), ("mixed", True)):
+        text = build_notes(args.words, mixed)
+        # Warm both paths (font metrics, reportlab's font cache) before timing
+        generate_pdf_from_text(text[:2000])
+        legacy_generate_pdf_from_text(text[:2000])
+        row = {
+            "legacy": _measure(legacy_generate_pdf_from_text, text, args.iterations),
+            "engine": _measure(generate_pdf_from_text, text, args.iterations),
+            "wrap_seconds": _measure_wrap(text, args.iterations),
+        }
+        report["documents"][doc] = row
+        speedup = row["legacy"]["seconds_p50"] / row["engine"]["seconds_p50"] if row["engine"]["seconds_p50"] else 0.0
+        print(
+            f"{doc:<6} legacy {row['legacy']['pages_per_sec']:7.1f} pages/s ({row['legacy']['pages']} pages)  "
+            f"engine {row['engine']['pages_per_sec']:7.1f} pages/s ({row['engine']['pages']} pages)  "
+            f"x{speedup:.2f}  wrap {row['wrap_seconds']['simpleSplit']:.3f}s -> {row['wrap_seconds']['wrap_text']:.3f}s",
+            flush=True,
+        )
+
+    out = args.out or os.path.join(RESULTS_DIR, f"pdf-layout-{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {out}")
+
+
+def legacy_generate_pdf_from_text(text: str, title: str = "BrainDrain Notes") -> bytes:
+    """generate_pdf_from_text as it was before the layout engine, kept verbatim as the baseline:
+    simpleSplit and drawString per line, regexes compiled on every call.
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    left_margin = 54
+    right_margin = 54
+    top_margin = 54
+    bottom_margin = 54
+    usable_width = width - left_margin - right_margin
+
+    base_font = "Helvetica"
+    base_size = 12
+    line_height = 16
+
+    def draw_header(page_num: int):
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(left_margin, height - top_margin + 6, title)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(width - right_margin, height - top_margin + 6, f"Page {page_num}")
+        c.setLineWidth(0.5)
+        c.line(left_margin, height - top_margin, width - right_margin, height - top_margin)
+
+    def new_page(page_num):
+        c.showPage()
+        draw_header(page_num)
+        c.setFont(base_font, base_size)
+        return height - top_margin - 24
+
+    normalized = (text or "").replace("\t", "    ")
+    lines = normalized.splitlines()
+    if not lines:
+        lines = [normalized]
+
+    y = height - top_margin - 24
+    page_num = 1
+    draw_header(page_num)
+    c.setFont(base_font, base_size)
+
+    import re
+    heading_re = re.compile(r"^(#{1,6})\s+(.*)$")
+    bullet_re = re.compile(r"^(\s*)([-*•])\s+(.*)$")
+
+    for raw_line in lines:
+        line = raw_line.rstrip()
+
+        # Blank line -> small spacing
+        if not line.strip():
+            y -= 8
+            if y <= bottom_margin:
+                page_num += 1
+                y = new_page(page_num)
+            continue
+
+        # Heading detection (#, ##, ### ...)
+        h_match = heading_re.match(line)
+        if h_match:
+            hashes, h_text = h_match.groups()
+            level = len(hashes)
+            # Larger font sizes for headings
+            if level == 1:
+                size = 26
+            elif level == 2:
+                size = 22
+            elif level == 3:
+                size = 18
+            else:
+                size = 16
+
+            # Spacing before heading
+            y -= 12
+            if y <= bottom_margin:
+                page_num += 1
+                y = new_page(page_num)
+            c.setFont("Helvetica-Bold", size)
+            wrapped = simpleSplit(h_text, "Helvetica-Bold", size, usable_width)
+            for i, w in enumerate(wrapped):
+                if y <= bottom_margin:
+                    page_num += 1
+                    y = new_page(page_num)
+                    c.setFont("Helvetica-Bold", size)
+                c.drawString(left_margin, y, w)
+                y -= (size + 4 if i == 0 else size + 2)
+            # Spacing after heading
+            y -= 8
+            c.setFont(base_font, base_size)
+            continue
+
+        # Bullet detection (-, *, •) with indentation
+        b_match = bullet_re.match(line)
+        if b_match:
+            indent_spaces, symbol, b_text = b_match.groups()
+            # Compute bullet level by leading spaces (2 spaces per level)
+            level = min(len(indent_spaces) // 2, 4)
+            indent_offset = 22 + (level * 20)
+            bullet_x = left_margin + indent_offset - 10
+            text_x = left_margin + indent_offset
+            max_width = usable_width - indent_offset
+
+            # Wrap bullet text
+            wrapped = simpleSplit(b_text, base_font, base_size, max_width)
+            for i, w in enumerate(wrapped):
+                if y <= bottom_margin:
+                    page_num += 1
+                    y = new_page(page_num)
+                    c.setFont(base_font, base_size)
+                if i == 0:
+                    c.setFont("Helvetica", base_size)
+                    c.drawString(bullet_x, y, "•")
+                c.drawString(text_x, y, w)
+                y -= line_height
+            # Spacing after a bullet block
+            y -= 6
+            continue
+
+        # Regular paragraph line
+        wrapped = simpleSplit(line, base_font, base_size, usable_width)
+        for w in wrapped:
+            if y <= bottom_margin:
+                page_num += 1
+                y = new_page(page_num)
+                c.setFont(base_font, base_size)
+            c.drawString(left_margin, y, w)
+            y -= line_height
+        # Paragraph spacing
+        y -= 8
+
+    c.save()
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Offline benchmark suite: drives the app's generation paths against the local mock API.
+
+    python -m bench.run_bench                      # default scenarios, 5 iterations each
+    python -m bench.run_bench --ttft-ms 0 --tokens-per-sec 0   # pure app overhead
+    python -m bench.run_bench --compare bench/results/<older>.json
+
+Each run writes bench/results/<commit>-<timestamp>.json so numbers can be compared across commits.
+Response caching and rate limiting are switched off so every iteration pays the full path.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.mock_fireworks import MockFireworks, Profile, Responder, load_recordings
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SOLVER_PROMPT = "Explain how backpropagation computes gradients in a two-layer network, with a worked example."
+NOTES_TEXT = (
+    "Dynamic programming solves problems by combining solutions to overlapping subproblems. "
+    "Memoization caches results top-down while tabulation fills a table bottom-up. "
+) * 40
+QUIZ_TOPIC = "Operating systems: processes, threads, scheduling and virtual memory"
+
+
+def _configure_env(mock_url: str) -> None:
+    """Point the app at the mock before any app module is imported (they read settings at import)."""
+    os.environ.update({
+        "FIREWORKS_BASE_URL": mock_url,
+        "FIREWORKS_API_KEY": "bench",
+        "LLM_CACHE_ENABLED": "0",
+        "QUESTION_BANK_ENABLED": "0",
+        "LLM_RATE_LIMIT_ENABLED": "0",
+        "LLM_HEDGE_ENABLED": "0",
+        "METRICS_PORT": "0",
+        "METRICS_FILE": "",
+    })
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def _summarize(samples: list[dict]) -> dict:
+    out = {"n": len(samples)}
+    for field in ("seconds", "ttft", "chars_per_sec"):
+        values = [s[field] for s in samples if s.get(field) is not None]
+        if values:
+            out[field] = {
+                "p50": round(_percentile(values, 0.5), 4),
+                "p95": round(_percentile(values, 0.95), 4),
+                "mean": round(statistics.fmean(values), 4),
+            }
+    out["output_chars"] = samples[-1].get("chars") if samples else 0
+    return out
+
+
+def _timed_stream(stream) -> dict:
+    started = time.perf_counter()
+    ttft = None
+    chars = 0
+    for chunk in stream:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        chars += len(chunk)
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "ttft": ttft, "chars": chars, "chars_per_sec": chars / seconds if seconds else None}
+
+
+def _timed_call(fn, size=len) -> dict:
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    chars = size(result)
+    return {"seconds": seconds, "chars": chars, "chars_per_sec": chars / seconds if seconds else None}
+
+
+def _scenarios() -> dict:
+    # Imported lazily: the environment must point at the mock first
+    from core.solver import solve_problem_stream
+    from core.notes_generator import generate_notes_stream, MAP_REDUCE_MIN_CHARS
+    from core.quizzer import create_quiz_json
+    from components.pdf_handler import generate_pdf_from_text
+
+    long_text = NOTES_TEXT * (MAP_REDUCE_MIN_CHARS // len(NOTES_TEXT) + 2)
+    notes_small = "\n\n".join(f"## Section {i}\n\n" + NOTES_TEXT[:600] for i in range(6))
+    notes_large = "\n\n".join(f"## Section {i}\n\n" + NOTES_TEXT[:1500] + "\n\n```python\nprint('x')\n```" for i in range(40))
+    counter = iter(range(10**9))
+
+    def _unique(text: str) -> str:
+        # Distinct prompts per iteration so request coalescing never merges iterations
+        return f"{text} (run {next(counter)})"
+
+    def _quiz_size(result: dict) -> int:
+        return len(json.dumps(result))
+
+    return {
+        "solver_stream": lambda: _timed_stream(solve_problem_stream(_unique(SOLVER_PROMPT))),
+        "notes_stream": lambda: _timed_stream(generate_notes_stream(_unique(NOTES_TEXT), "long")),
+        "notes_map_reduce": lambda: _timed_stream(generate_notes_stream(_unique(long_text), "long")),
+        "quiz_10": lambda: _timed_call(lambda: create_quiz_json(_unique(QUIZ_TOPIC), "medium", 10), _quiz_size),
+        "quiz_50": lambda: _timed_call(lambda: create_quiz_json(_unique(QUIZ_TOPIC), "medium", 50), _quiz_size),
+        "pdf_export_small": lambda: _timed_call(lambda: generate_pdf_from_text(notes_small, title="Bench")),
+        "pdf_export_large": lambda: _timed_call(lambda: generate_pdf_from_text(notes_large, title="Bench")),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def run(args) -> dict:
+    profiles = dict(Profile.parse(spec) for spec in args.model_profile)
+    responder = Responder(load_recordings(args.recordings) if args.recordings else None, args.max_output_tokens)
+    mock = MockFireworks(0, args.ttft_ms, args.tokens_per_sec, args.tokens_per_chunk, profiles, responder).start()
+    _configure_env(mock.url)
+    random.seed(args.seed)
+    try:
+        scenarios = _scenarios()
+        selected = args.scenario or list(scenarios)
+        results = {}
+        for name in selected:
+            fn = scenarios[name]
+            for _ in range(args.warmup):
+                fn()
+            samples = [fn() for _ in range(args.iterations)]
+            results[name] = _summarize(samples)
+            print(_format_row(name, results[name]), flush=True)
+    finally:
+        mock.stop()
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "mock": {
+            "ttft_ms": args.ttft_ms,
+            "tokens_per_sec": args.tokens_per_sec,
+            "tokens_per_chunk": args.tokens_per_chunk,
+            "max_output_tokens": args.max_output_tokens,
+        },
+        "iterations": args.iterations,
+        "results": results,
+    }
+
+
+def _format_row(name: str, r: dict) -> str:
+    sec = r.get("seconds", {})
+    ttft = r.get("ttft", {})
+    rate = r.get("chars_per_sec", {})
+    ttft_text = f"{ttft['p50'] * 1000:8.1f}ms" if ttft else f"{'-':>10}"
+    return (
+        f"{name:<18} p50 {sec.get('p50', 0):8.3f}s  p95 {sec.get('p95', 0):8.3f}s  "
+        f"ttft p50 {ttft_text}  {rate.get('p50', 0):10.0f} chars/s"
+    )
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, r in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "seconds" not in old:
+            print(f"  {name:<18} (no baseline)")
+            continue
+        new_p50, old_p50 = r["seconds"]["p50"], old["seconds"]["p50"]
+        change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0.0
+        print(f"  {name:<18} {old_p50:8.3f}s -> {new_p50:8.3f}s  ({change:+.1f}%)")
+    if current.get("mock") != baseline.get("mock"):
+        print("  note: mock settings differ between runs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BrainDrainAI offline benchmarks")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-sec", type=float, default=400, help="0 = unlimited")
+    parser.add_argument("--tokens-per-chunk", type=int, default=4)
+    parser.add_argument("--max-output-tokens", type=int, default=800)
+    parser.add_argument("--model-profile", action="append", default=[], help="model=ttft_ms:tokens_per_sec")
+    parser.add_argument("--recordings", help="JSON list of recorded streams to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="result file (default: bench/results/<commit>-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    report = run(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            compare(report, json.load(fh))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Streaming redraw benchmark: per-chunk container.markdown versus the throttled StreamRenderer.
+
+    python -m bench.stream_render                       # 6500-token note at 400 tokens/sec
+    python -m bench.stream_render --tokens 2000 --tokens-per-sec 0
+
+Both variants run inside a real Streamlit script run (AppTest), so every redraw goes through
+element serialization and the forward-message queue. Reported per variant: redraws, characters
+sent to the browser, script-thread CPU and wall time.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from bench.run_bench import RESULTS_DIR, NOTES_TEXT, _git_commit
+
+
+def _script(variant: str, tokens: int, tokens_per_sec: float, chars_per_token: int, source_text: str):
+    # Runs as the AppTest page script: everything it needs is imported here
+    import time
+
+    import streamlit as st
+    from components.stream_renderer import StreamRenderer
+
+    words = source_text.split()
+    pieces = []
+    for i in range(tokens):
+        word = words[i % len(words)]
+        pieces.append(("\n\n" if i % 90 == 89 else " ") + word[:chars_per_token])
+
+    def stream():
+        delay = 1.0 / tokens_per_sec if tokens_per_sec else 0.0
+        started = time.perf_counter()
+        for i, piece in enumerate(pieces):
+            if delay:
+                wait = started + i * delay - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            yield piece
+
+    container = st.empty()
+    cpu = time.thread_time()
+    wall = time.perf_counter()
+    if variant == "per_chunk":
+        text = ""
+        sent = 0
+        for chunk in stream():
+            text += chunk
+            container.markdown(text)
+            sent += len(text)
+        result = {"flushes": len(pieces), "bytes_sent": sent}
+    else:
+        renderer = StreamRenderer(container, "bench")
+        for chunk in stream():
+            renderer.write(chunk)
+        renderer.close()
+        result = {"flushes": renderer.flushes, "bytes_sent": renderer.bytes_sent}
+    result["cpu_seconds"] = time.thread_time() - cpu
+    result["wall_seconds"] = time.perf_counter() - wall
+    st.session_state["bench_result"] = result
+
+
+def _run(variant: str, args) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    script_args = (variant, args.tokens, args.tokens_per_sec, args.chars_per_token, NOTES_TEXT)
+    timeout = args.tokens / args.tokens_per_sec + 120 if args.tokens_per_sec else 600
+    at = AppTest.from_function(_script, args=script_args, default_timeout=timeout)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at.session_state["bench_result"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming redraw benchmark (per-chunk vs throttled)")
+    parser.add_argument("--tokens", type=int, default=6500)
+    parser.add_argument("--tokens-per-sec", type=float, default=400, help="0 = as fast as possible")
+    parser.add_argument("--chars-per-token", type=int, default=5)
+    parser.add_argument("--out", help="result file (default: bench/results/stream-render-<commit>-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = {}
+    for variant in ("per_chunk", "throttled"):
+        r = _run(variant, args)
+        results[variant] = {k: round(v, 4) if isinstance(v, float) else v for k, v in r.items()}
+        print(
+            f"{variant:<10} {r['flushes']:6d} redraws  {r['bytes_sent'] / 1e6:9.2f} M chars sent  "
+            f"cpu {r['cpu_seconds']:7.3f}s  wall {r['wall_seconds']:7.3f}s",
+            flush=True,
+        )
+    base, new = results["per_chunk"], results["throttled"]
+    if base["bytes_sent"] and base["cpu_seconds"]:
+        print(f"reduction: {1 - new['bytes_sent'] / base['bytes_sent']:.1%} chars sent, "
+              f"{1 - new['cpu_seconds'] / base['cpu_seconds']:.1%} script CPU")
+
+    report = {"commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "settings": {k: v for k, v in vars(args).items() if k != "out"}, "results": results}
+    out = args.out or os.path.join(RESULTS_DIR, f"stream-render-{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,341 @@
+import contextvars
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
 import streamlit as st
 from core.solver import solve_problem_stream
 from core.notes_generator import generate_notes_stream
-from core.quizzer import create_quiz_json
-from components.pdf_handler import generate_pdf_from_text, handle_pdf_upload
+from core.quizzer import create_quiz_json_stream, mark_quiz_seen
+from components.pdf_handler import handle_pdf_upload
+from components.stream_renderer import render_stream
+from utils.pdf_export import PDF_EXPORT_INCREMENTAL, StreamingPdfExport, export_pdf_bytes
+from utils.jobs import jobs
+from utils.retrieval import retrieve_context, text_digest
+from utils.scheduler import queue_status
+from utils.context_packer import packing_status
+from utils.cancellation import cancel_scope
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+PDF_SOLVER_TASK = "Explain the key concepts in my uploaded study material and solve any problems it contains."
+
+NOTES_PDF_TITLE = "BrainDrain Notes"
+
+# Chat history: the latest messages render in full, older ones collapse into lazily loaded expanders
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "6"))
+# Collapsed messages listed before a "show earlier" button; each click reveals this many more
+CHAT_HISTORY_COLLAPSED = int(os.getenv("CHAT_HISTORY_COLLAPSED", "20"))
+CHAT_RENDER_CACHE = int(os.getenv("CHAT_RENDER_CACHE", "512"))
+
+# How often the quiz view refreshes while later questions are still generating
+QUIZ_POLL_SECONDS = 1.0
+# A quiz whose first question has not arrived by then is given up (covers the model queue timeout and a failover)
+QUIZ_START_TIMEOUT_SECONDS = float(os.getenv("QUIZ_START_TIMEOUT_SECONDS", "150"))
+QUIZ_START_TIMEOUT_MESSAGE = "❌ The quiz could not start: the model is too busy right now. Please try again in a minute."
+# How often notes still generating from an earlier run are redrawn
+JOB_POLL_SECONDS = 0.5
+
+# Speculative prefetch: the next quiz on the same topic starts generating once this share of the
+# current one has been reached, so a follow-up quiz is ready without waiting
+QUIZ_PREFETCH_ENABLED = os.getenv("QUIZ_PREFETCH_ENABLED", "1") not in {"0", "false", "False", ""}
+QUIZ_PREFETCH_AT = float(os.getenv("QUIZ_PREFETCH_AT", "0.5"))
+
+
+def _start_quiz(source: str, difficulty: str, num_questions: int, session_id: str | None = None,
+                speculative: bool = False) -> dict:
+    """Stream a quiz as a background job; questions are appended to the returned dict as they arrive.
+
+    The dict has the create_quiz_json shape plus "target" (requested count), "done", "job" (the
+    job id) and the request itself ("source", "difficulty"). A speculative quiz marks its
+    questions seen only once "adopted" is set.
+    """
+    data = {"quiz": [], "target": int(num_questions), "done": False, "source": source, "difficulty": difficulty}
+
+    def _produce():
+        return create_quiz_json_stream(source, difficulty, num_questions, session_id=session_id, speculative=speculative)
+
+    def _finished(job):
+        if data.get("adopted"):
+            mark_quiz_seen(source, difficulty, data["quiz"], session_id)
+        data["done"] = True
+
+    # A prefetch runs outside this context so it never drives the queue indicator of whatever the user
+    # does next; a requested quiz runs in a copy of it so the first shards still report their queue position
+    job = jobs.submit(
+        "quiz", _produce, meta={"source_chars": len(source), "speculative": speculative},
+        context=None if speculative else contextvars.copy_context(),
+    )
+    # The job appends questions to this same list
+    data["quiz"] = job.items
+    data["job"] = job.id
+    job.add_done_callback(_finished)
+    return data
+
+
+@contextmanager
+def _queue_indicator():
+    """Show the caller's position in the model queue while requests made inside this block wait for a slot."""
+    placeholder = st.empty()
+    ctx = get_script_run_ctx()
+    active = True
+
+    def _show(position: int):
+        # May be called from stream pump / worker threads, and after this run finished (quiz shards)
+        if not active:
+            return
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        if position > 0:
+            placeholder.caption(f"⏳ High demand right now — you are #{position} in the queue for a model slot.")
+        else:
+            placeholder.empty()
+
+    try:
+        with queue_status(_show):
+            yield
+    finally:
+        active = False
+        placeholder.empty()
+
+
+@contextmanager
+def _packing_notice():
+    """Tell the user when requests made inside this block had part of their input left out to fit the model."""
+    placeholder = st.empty()
+    ctx = get_script_run_ctx()
+    active = True
+    dropped = {"tokens": 0}
+
+    def _show(report: dict):
+        if not active:
+            return
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        dropped["tokens"] += report["dropped_tokens"]
+        placeholder.caption(
+            f"✂️ About {dropped['tokens']:,} tokens of your input were left out to fit the model's context."
+        )
+
+    try:
+        with packing_status(_show):
+            yield
+    finally:
+        active = False
+
+
+@contextmanager
+def _cancel_on_exit():
+    """Cancel LLM calls made inside this block if the run is interrupted before they finish.
+
+    A new message, a mode switch or a closed tab stops the script run with an exception; the
+    upstream streams it abandoned are then closed instead of generating into the void.
+    Background jobs (notes, quizzes) carry their own token and are not affected.
+    """
+    with cancel_scope() as token:
+        try:
+            yield token
+        except BaseException:
+            token.cancel()
+            raise
+
+
+@lru_cache(maxsize=CHAT_RENDER_CACHE)
+def _message_view(role: str, content: str) -> tuple[str, str]:
+    """Expander label and a stable key suffix for one message, computed once per distinct message."""
+    icon = "🧑" if role == "user" else "🤖"
+    first = next((line.strip().lstrip("#>-* ").strip() for line in content.splitlines() if line.strip()), "")
+    preview = first if len(first) <= 80 else first[:77].rstrip() + "…"
+    words = len(content.split())
+    label = f"{icon} {preview or '(empty)'} · {words:,} words"
+    return label, f"{hash((role, content)) & 0xFFFFFFFF:08x}"
+
+
+def _render_history(messages: list[dict]):
+    """Render the chat history windowed: the last CHAT_HISTORY_WINDOW messages in full, older ones
+    as collapsed expanders whose Markdown is only sent when opened, and the oldest behind a button.
+    """
+    recent_start = max(0, len(messages) - max(0, CHAT_HISTORY_WINDOW))
+    older = messages[:recent_start]
+    if older:
+        shown = min(len(older), st.session_state.get("history_collapsed", CHAT_HISTORY_COLLAPSED))
+        hidden = len(older) - shown
+        if hidden and st.button(f"🕘 Show {min(hidden, CHAT_HISTORY_COLLAPSED)} earlier messages ({hidden} hidden)",
+                                key="history_more"):
+            st.session_state.history_collapsed = shown + CHAT_HISTORY_COLLAPSED
+            st.rerun()
+        for i in range(hidden, len(older)):
+            msg = older[i]
+            label, suffix = _message_view(msg["role"], msg["content"])
+            expander = st.expander(label, key=f"history_{i}_{suffix}", on_change="rerun")
+            if expander.open:
+                expander.markdown(msg["content"])
+    for msg in messages[recent_start:]:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+
+def _start_notes_job(source: str):
+    """Generate notes as a background job that outlives this script run; tracked until it lands in the history."""
+    job = jobs.submit(
+        "notes", lambda: generate_notes_stream(source, "long"), meta={"source_chars": len(source)},
+        context=contextvars.copy_context(),
+    )
+    st.session_state.setdefault("notes_jobs", []).append(job.id)
+    # Also in the URL, so a reconnecting tab (new session) can pick the job up again
+    st.query_params["job"] = job.id
+    return job
+
+
+def _forget_notes_job(job_id: str) -> None:
+    pending = st.session_state.get("notes_jobs", [])
+    if job_id in pending:
+        pending.remove(job_id)
+    if st.query_params.get("job") == job_id:
+        del st.query_params["job"]
+
+
+def _notes_job_message(job) -> str:
+    text = job.text
+    if job.status == "interrupted":
+        text += "\n\n⚠️ The server restarted while these notes were being written; this is the part that was saved."
+    elif job.status == "error" and not text:
+        text = f"❌ AI unavailable: {job.error}"
+    return text
+
+
+def _pending_notes_jobs() -> list:
+    """Notes jobs from earlier runs whose result is not in the history yet; finished ones are recorded now."""
+    pending = st.session_state.setdefault("notes_jobs", [])
+    url_job = st.query_params.get("job")
+    if url_job and url_job not in pending:
+        pending.append(url_job)
+    running = []
+    for job_id in list(pending):
+        job = jobs.get(job_id)
+        if job is None or job.kind != "notes":
+            _forget_notes_job(job_id)
+        elif job.done:
+            st.session_state.messages.append({"role": "assistant", "content": _notes_job_message(job)})
+            _forget_notes_job(job_id)
+        else:
+            running.append(job)
+    return running
+
+
+def _notes_jobs_view(job_ids: list[str]):
+    """Notes still generating after the run that started them ended; redrawn as a polling fragment."""
+    running = [job for job in map(jobs.get, job_ids) if job is not None and not job.done]
+    if len(running) < len(job_ids):
+        # One finished: a full run records it in the history and stops polling
+        st.rerun()
+    for job in running:
+        with st.chat_message("assistant"):
+            st.caption("⏳ Still writing your notes — this continues in the background.")
+            st.markdown(job.text)
+
+
+def _stream_notes(stream, container) -> str:
+    """Render a notes stream and, when enabled, lay out its PDF export alongside it."""
+    export = StreamingPdfExport(NOTES_PDF_TITLE) if PDF_EXPORT_INCREMENTAL else None
+    response_text = render_stream(stream, container, "notes", on_chunk=export.feed if export is not None else None)
+    if export is not None:
+        # Cached under the notes' hash, so the download below picks up this build
+        export.finish()
+    return response_text
+
+
+def _notes_download_button(notes: str):
+    """Download button whose PDF is built (or fetched from the export cache) only when clicked."""
+    st.download_button(
+        label="📥 Download notes (PDF)",
+        data=lambda: export_pdf_bytes(notes, NOTES_PDF_TITLE),
+        file_name="braindrain_notes.pdf",
+        mime="application/pdf",
+        help="Save your generated notes as a PDF",
+        on_click="ignore",
+    )
+
+
+def _quiz_session_id() -> str:
+    """Per-browser-session id, so the question bank never serves a session the same question twice."""
+    if "quiz_session_id" not in st.session_state:
+        st.session_state.quiz_session_id = uuid.uuid4().hex
+    return st.session_state.quiz_session_id
+
+
+def _prefetch_next_quiz(quiz: dict) -> None:
+    """Start generating the follow-up quiz (same topic, difficulty and size) in the background, once per quiz."""
+    if not QUIZ_PREFETCH_ENABLED or quiz.get("next_started") or "source" not in quiz:
+        return
+    quiz["next_started"] = True
+    _cancel_prefetch()
+    st.session_state.quiz_next = _start_quiz(
+        quiz["source"], quiz["difficulty"], quiz["target"], _quiz_session_id(), speculative=True
+    )
+
+
+def _cancel_prefetch() -> None:
+    nxt = st.session_state.pop("quiz_next", None)
+    job = jobs.get(nxt.get("job")) if nxt is not None else None
+    if job is not None:
+        # Closing the quiz stream closes its upstream requests
+        job.cancel()
+
+
+def _adopt_prefetched(source: str, difficulty: str, num_questions: int) -> dict | None:
+    """Take over the prefetched quiz when it is for this exact request; any other prefetch is cancelled."""
+    nxt = st.session_state.get("quiz_next")
+    if nxt is None:
+        return None
+    if (nxt["source"], nxt["difficulty"], nxt["target"]) != (source, difficulty, int(num_questions)):
+        _cancel_prefetch()
+        return None
+    st.session_state.pop("quiz_next", None)
+    nxt["adopted"] = True
+    # Questions that arrive later are marked by the generating thread when it finishes
+    mark_quiz_seen(source, difficulty, list(nxt["quiz"]), _quiz_session_id())
+    return nxt
+
+
+def _reset_quiz_state(data: dict | None) -> None:
+    st.session_state.quiz = data
+    st.session_state.quiz_index = 0
+    st.session_state.quiz_score = 0
+    st.session_state.quiz_answered = False
+    st.session_state.quiz_selected_idx = -1
+    st.session_state.quiz_difficulty = data["difficulty"] if data else None
+    st.session_state.quiz_total = data["target"] if data else 0
+
+
+def _begin_quiz(source: str, difficulty: str, num_questions: int) -> bool | None:
+    """Start a streamed quiz (or take over a matching prefetched one), reset the interactive state,
+    and block only until question 1 is ready.
+
+    Returns True when the whole quiz was already generated, and None (after cancelling the quiz)
+    when question 1 did not arrive within QUIZ_START_TIMEOUT_SECONDS.
+    """
+    data = _adopt_prefetched(source, difficulty, num_questions)
+    if data is None:
+        data = _start_quiz(source, difficulty, num_questions, _quiz_session_id())
+    job = jobs.get(data.get("job"))
+    if job is not None and not job.wait(QUIZ_START_TIMEOUT_SECONDS, items=1):
+        job.cancel()
+        _reset_quiz_state(None)
+        return None
+    _reset_quiz_state(data)
+    # The job's done callback may run just after its last item: report what the job itself says
+    return job.done if job is not None else data["done"]
 
 
 def chat_ui(selected_mode):
     """Main chat interface with history and mode-specific behavior."""
 
     st.subheader(f"💬 BrainDrain Chat — Mode: {selected_mode}")
+    if selected_mode != "Quizzer":
+        # Leaving Quizzer: a speculative next quiz is no longer wanted
+        _cancel_prefetch()
 
     # Optional PDF upload to feed chat and modes
     if "pdf_text" not in st.session_state:
@@ -18,6 +345,8 @@ def chat_ui(selected_mode):
     pdf_text = handle_pdf_upload(key="chat_pdf_uploader")
     if pdf_text:
         st.session_state.pdf_text = pdf_text
+        # Retrieval index is keyed by this hash and built once per document/page selection
+        st.session_state.pdf_text_digest = text_digest(pdf_text)
         if not st.session_state.pdf_announced:
             snippet = pdf_text[:800]
             with st.chat_message("user"):
@@ -47,10 +376,13 @@ def chat_ui(selected_mode):
         st.session_state.quiz_difficulty = None
         st.session_state.quiz_total = 0
 
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"]) 
+    # Notes generations that outlived an earlier run: finished ones join the history, running ones are followed
+    running_notes = _pending_notes_jobs()
+
+    # Display chat history (windowed; older messages load on demand)
+    _render_history(st.session_state.messages)
+    if running_notes:
+        st.fragment(_notes_jobs_view, run_every=JOB_POLL_SECONDS)([job.id for job in running_notes])
 
     # User input box
     if prompt := st.chat_input("Type your message (topic or passage for Quizzer)..."):
@@ -60,41 +392,34 @@ def chat_ui(selected_mode):
 
         # Generate response based on mode
         with st.chat_message("assistant"):
-            with st.spinner("BrainDrain is thinking..."):
+            with st.spinner("BrainDrain is thinking..."), _queue_indicator(), _packing_notice(), _cancel_on_exit():
                 container = st.empty()
                 response_text = ""
 
                 if selected_mode == "Solver":
-                    stream = solve_problem_stream(prompt)
-                    for chunk in stream:
-                        response_text += chunk
-                        container.markdown(response_text)
+                    context = None
+                    if st.session_state.pdf_text:
+                        context = retrieve_context(
+                            st.session_state.pdf_text, prompt, digest=st.session_state.get("pdf_text_digest")
+                        )
+                    stream = solve_problem_stream(prompt, context_chunks=context)
+                    response_text = render_stream(stream, container, "solver")
                 elif selected_mode == "Notes Generator":
-                    # Force long notes generation
-                    stream = generate_notes_stream(prompt, "long")
-                    for chunk in stream:
-                        response_text += chunk
-                        container.markdown(response_text)
+                    # Force long notes generation; a rerun mid-stream only detaches this view from the job
+                    job = _start_notes_job(prompt)
+                    response_text = _stream_notes(job.follow(), container)
+                    _forget_notes_job(job.id)
                     # Notes download option (PDF)
-                    pdf_bytes = generate_pdf_from_text(response_text, title="BrainDrain Notes")
-                    st.download_button(
-                        label="📥 Download notes (PDF)",
-                        data=pdf_bytes,
-                        file_name="braindrain_notes.pdf",
-                        mime="application/pdf",
-                        help="Save your generated notes as a PDF"
-                    )
+                    _notes_download_button(response_text)
                 elif selected_mode == "Quizzer":
-                    # Build a structured quiz and store in session for interactive flow
-                    data = create_quiz_json(prompt, (difficulty or "Medium"), int(num_questions or 10))
-                    st.session_state.quiz = data
-                    st.session_state.quiz_index = 0
-                    st.session_state.quiz_score = 0
-                    st.session_state.quiz_answered = False
-                    st.session_state.quiz_selected_idx = -1
-                    st.session_state.quiz_difficulty = (difficulty or "Medium")
-                    st.session_state.quiz_total = len(data.get("quiz", []))
-                    response_text = "✅ Quiz generated. Scroll down to start answering."
+                    # Stream a structured quiz into session state; answering starts at question 1
+                    started = _begin_quiz(prompt, (difficulty or "Medium"), int(num_questions or 10))
+                    if started is None:
+                        response_text = QUIZ_START_TIMEOUT_MESSAGE
+                    elif started:
+                        response_text = "✅ Quiz generated. Scroll down to start answering."
+                    else:
+                        response_text = "✅ Question 1 is ready — scroll down to start. More questions are on the way."
                     container.markdown(response_text)
                 else:
                     response_text = "⚠️ Unknown mode selected."
@@ -114,38 +439,29 @@ def chat_ui(selected_mode):
             with st.chat_message("user"):
                 st.markdown("Using uploaded PDF content")
             with st.chat_message("assistant"):
-                with st.spinner("BrainDrain is reading your PDF..."):
+                with st.spinner("BrainDrain is reading your PDF..."), _queue_indicator(), _packing_notice(), _cancel_on_exit():
                     container = st.empty()
                     response_text = ""
 
                     if selected_mode == "Solver":
-                        stream = solve_problem_stream(source)
-                        for chunk in stream:
-                            response_text += chunk
-                            container.markdown(response_text)
+                        # Only the most salient chunks go to the Solver, not the whole document
+                        context = retrieve_context(source, "", digest=st.session_state.get("pdf_text_digest"))
+                        stream = solve_problem_stream(PDF_SOLVER_TASK, context_chunks=context)
+                        response_text = render_stream(stream, container, "solver")
                     elif selected_mode == "Notes Generator":
                         # Force long notes generation from PDF
-                        stream = generate_notes_stream(source, "long")
-                        for chunk in stream:
-                            response_text += chunk
-                            container.markdown(response_text)
-                        pdf_bytes = generate_pdf_from_text(response_text, title="BrainDrain Notes")
-                        st.download_button(
-                            label="📥 Download notes (PDF)",
-                            data=pdf_bytes,
-                            file_name="braindrain_notes.pdf",
-                            mime="application/pdf",
-                        )
+                        job = _start_notes_job(source)
+                        response_text = _stream_notes(job.follow(), container)
+                        _forget_notes_job(job.id)
+                        _notes_download_button(response_text)
                     elif selected_mode == "Quizzer":
-                        data = create_quiz_json(source, (difficulty or "Medium"), int(num_questions or 10))
-                        st.session_state.quiz = data
-                        st.session_state.quiz_index = 0
-                        st.session_state.quiz_score = 0
-                        st.session_state.quiz_answered = False
-                        st.session_state.quiz_selected_idx = -1
-                        st.session_state.quiz_difficulty = (difficulty or "Medium")
-                        st.session_state.quiz_total = len(data.get("quiz", []))
-                        response_text = "✅ Quiz generated from PDF. Scroll down to start."
+                        started = _begin_quiz(source, (difficulty or "Medium"), int(num_questions or 10))
+                        if started is None:
+                            response_text = QUIZ_START_TIMEOUT_MESSAGE
+                        elif started:
+                            response_text = "✅ Quiz generated from PDF. Scroll down to start."
+                        else:
+                            response_text = "✅ Question 1 from your PDF is ready — scroll down to start."
                         container.markdown(response_text)
                     else:
                         response_text = "⚠️ Unknown mode selected."
@@ -156,67 +472,107 @@ def chat_ui(selected_mode):
             else:
                 st.session_state.messages.append({"role": "assistant", "content": "Quiz ready from PDF."})
 
-    # Interactive Quiz Flow
+    # Interactive Quiz Flow (refreshes itself while later questions are still generating)
     if selected_mode == "Quizzer" and st.session_state.quiz:
-        quiz = st.session_state.quiz
-        questions = quiz.get("quiz", [])
-        if not questions:
-            st.warning("No questions generated. Try another topic or reduce the question count.")
-            return
+        generating = not st.session_state.quiz.get("done", True)
+        st.fragment(_quiz_flow, run_every=QUIZ_POLL_SECONDS if generating else None)(generating)
+
+
+def _quiz_flow(generating: bool):
+    """Interactive quiz: one question at a time with Submit/Next, score and restart.
 
-        idx = st.session_state.quiz_index
-        total = len(questions)
-
-        # Progress and difficulty badge
-        st.progress(int((idx / max(total, 1)) * 100))
-        st.caption(f"Score: {st.session_state.quiz_score} / {total}")
-
-        if idx >= total:
-            st.success(f"Final Score: {st.session_state.quiz_score} / {total}")
-            if st.button("Restart quiz"):
-                st.session_state.quiz = None
-                st.session_state.quiz_index = 0
-                st.session_state.quiz_score = 0
-                st.session_state.quiz_answered = False
-                st.session_state.quiz_selected_idx = -1
-                st.session_state.quiz_difficulty = None
-                st.session_state.quiz_total = 0
+    Rendered as a fragment; while `generating`, it polls so newly streamed questions show up.
+    """
+    quiz = st.session_state.quiz
+    if not quiz:
+        return
+    done = quiz.get("done", True)
+    if generating and done:
+        # Generation finished: rerun the app so this view stops polling
+        st.rerun()
+    questions = quiz.get("quiz", [])
+    if not questions:
+        st.warning("No questions generated. Try another topic or reduce the question count.")
+        return
+
+    idx = st.session_state.quiz_index
+    total = len(questions) if done else max(quiz.get("target", 0), len(questions))
+
+    # Progress and difficulty badge
+    st.progress(int((idx / max(total, 1)) * 100))
+    st.caption(f"Score: {st.session_state.quiz_score} / {total}")
+
+    if not done:
+        st.caption(f"⏳ {len(questions)} of {total} questions ready — the rest are generating.")
+        if idx >= len(questions):
+            st.info(f"⏳ Generating question {idx + 1}...")
             return
 
-        q = questions[idx]
-        st.markdown(f"**Question {idx + 1} of {total}**")
-        st.markdown(q.get("question", ""))
-        options = q.get("options", ["", "", "", ""])[:4]
+    # Partway through a fully generated quiz: start on the follow-up one while the user answers
+    if done and idx + 1 >= total * QUIZ_PREFETCH_AT:
+        _prefetch_next_quiz(quiz)
 
-        # Show radio only if not answered; otherwise show locked selection
-        if not st.session_state.quiz_answered:
-            choice = st.radio("Select an option:", options, key=f"quiz_choice_{idx}")
-        else:
-            selected_idx = st.session_state.quiz_selected_idx
-            selected_val = options[selected_idx] if 0 <= selected_idx < len(options) else ""
-            st.info(f"Your answer: {selected_val}")
-
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Submit answer", key=f"submit_{idx}") and not st.session_state.quiz_answered:
-                correct_idx = int(q.get("answer_index", 0))
-                try:
-                    selected_idx = options.index(st.session_state.get(f"quiz_choice_{idx}", options[0]))
-                except ValueError:
-                    selected_idx = -1
-                st.session_state.quiz_selected_idx = selected_idx
-                if selected_idx == correct_idx:
-                    st.success("Correct ✅")
-                    st.session_state.quiz_score += 1
-                else:
-                    st.error(f"Incorrect ❌. Correct: {options[correct_idx]}")
-                explanation = q.get("explanation", "")
-                if explanation:
-                    st.info(f"Explanation: {explanation}")
-                # Lock the question: prevent re-submission or changing answer
-                st.session_state.quiz_answered = True
-        with col2:
-            if st.button("Next question", key=f"next_{idx}") and st.session_state.quiz_answered:
-                st.session_state.quiz_index += 1
-                st.session_state.quiz_answered = False
-                st.session_state.quiz_selected_idx = -1
+    if idx >= total:
+        st.success(f"Final Score: {st.session_state.quiz_score} / {total}")
+        nxt = st.session_state.get("quiz_next")
+        if nxt is not None and st.button(f"Next {nxt['target']} questions on this topic", key="quiz_next_batch"):
+            data = _adopt_prefetched(nxt["source"], nxt["difficulty"], nxt["target"])
+            _reset_quiz_state(data)
+            # Full rerun: the new quiz may still be generating, which needs the polling fragment
+            st.rerun()
+        if st.button("Restart quiz"):
+            _reset_quiz_state(None)
+        return
+
+    q = questions[idx]
+    st.markdown(f"**Question {idx + 1} of {total}**")
+    st.markdown(q.get("question", ""))
+    options = q.get("options", ["", "", "", ""])[:4]
+
+    # Show radio only if not answered; otherwise show locked selection
+    if not st.session_state.quiz_answered:
+        choice = st.radio("Select an option:", options, key=f"quiz_choice_{idx}")
+    else:
+        selected_idx = st.session_state.quiz_selected_idx
+        selected_val = options[selected_idx] if 0 <= selected_idx < len(options) else ""
+        st.info(f"Your answer: {selected_val}")
+        # Keep the verdict visible across the polling reruns of this fragment
+        feedback = st.session_state.get("quiz_feedback")
+        if feedback and feedback.get("index") == idx:
+            if feedback["correct"]:
+                st.success("Correct ✅")
+            else:
+                st.error(f"Incorrect ❌. Correct: {feedback['answer']}")
+            if feedback["explanation"]:
+                st.info(f"Explanation: {feedback['explanation']}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Submit answer", key=f"submit_{idx}") and not st.session_state.quiz_answered:
+            correct_idx = int(q.get("answer_index", 0))
+            try:
+                selected_idx = options.index(st.session_state.get(f"quiz_choice_{idx}", options[0]))
+            except ValueError:
+                selected_idx = -1
+            st.session_state.quiz_selected_idx = selected_idx
+            if selected_idx == correct_idx:
+                st.success("Correct ✅")
+                st.session_state.quiz_score += 1
+            else:
+                st.error(f"Incorrect ❌. Correct: {options[correct_idx]}")
+            explanation = q.get("explanation", "")
+            if explanation:
+                st.info(f"Explanation: {explanation}")
+            st.session_state.quiz_feedback = {
+                "index": idx,
+                "correct": selected_idx == correct_idx,
+                "answer": options[correct_idx],
+                "explanation": explanation,
+            }
+            # Lock the question: prevent re-submission or changing answer
+            st.session_state.quiz_answered = True
+    with col2:
+        if st.button("Next question", key=f"next_{idx}") and st.session_state.quiz_answered:
+            st.session_state.quiz_index += 1
+            st.session_state.quiz_answered = False
+            st.session_state.quiz_selected_idx = -1
@@ -65,6 +65,7 @@ def sidebar_ui():
     with col1:
         if st.button("🆕 New Chat", key="top_new_chat"):
             st.session_state.messages = []
+            st.session_state.pop("history_collapsed", None)
             st.sidebar.success("Started a new chat!")
     with col2:
         if st.button("ℹ️ How it works", key="top_how_it_works"):
@@ -0,0 +1,102 @@
+import os
+import time
+
+from utils.metrics import record_stream_render
+
+# Streaming redraw cadence: the growing response is re-sent at most this often...
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "75"))
+# ...unless this many new characters are waiting (0 = time cadence only)
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "1500"))
+
+
+class StreamRenderer:
+    """Buffers streamed chunks and redraws a placeholder on a time/size cadence instead of per token.
+
+    Every redraw re-sends the whole response, so drawing per chunk costs O(n^2) bytes over a
+    response; with a fixed cadence it is bounded by (duration / interval) redraws. The first
+    chunk is drawn immediately so time to first text is unchanged, and close() always draws
+    the final text.
+    """
+
+    def __init__(self, container, mode: str | None = None, interval_ms: float = STREAM_FLUSH_MS,
+                 flush_chars: int = STREAM_FLUSH_CHARS):
+        self.container = container
+        self.mode = mode
+        self.interval = max(0.0, interval_ms) / 1000.0
+        self.flush_chars = flush_chars
+        self._parts: list[str] = []
+        self._chars = 0
+        self._pending = 0
+        self._last_flush: float | None = None
+        self.chunks = 0
+        self.flushes = 0
+        self.bytes_sent = 0
+        # What redrawing on every chunk would have sent, for comparison
+        self.unthrottled_bytes = 0
+        self.render_seconds = 0.0
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def write(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self._chars += len(chunk)
+        self._pending += len(chunk)
+        self.chunks += 1
+        # Approximates UTF-8 size by characters so the bookkeeping itself stays O(1) per chunk
+        self.unthrottled_bytes += self._chars
+        now = time.monotonic()
+        if (
+            self._last_flush is None
+            or now - self._last_flush >= self.interval
+            or (self.flush_chars and self._pending >= self.flush_chars)
+        ):
+            self.flush(now)
+
+    def flush(self, now: float | None = None) -> None:
+        started = time.thread_time()
+        text = self.text
+        self.container.markdown(text)
+        self.render_seconds += time.thread_time() - started
+        self._last_flush = now if now is not None else time.monotonic()
+        self._pending = 0
+        self.flushes += 1
+        self.bytes_sent += len(text)
+
+    def close(self) -> str:
+        """Draw whatever is still buffered, record the stats, and return the full text."""
+        if self._pending or not self.flushes:
+            self.flush()
+        record_stream_render(self.mode, self.bytes_sent, self.unthrottled_bytes, self.flushes, self.render_seconds)
+        return self.text
+
+    def stats(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "flushes": self.flushes,
+            "bytes_sent": self.bytes_sent,
+            "unthrottled_bytes": self.unthrottled_bytes,
+            "render_seconds": round(self.render_seconds, 4),
+        }
+
+
+def render_stream(stream, container, mode: str | None = None, on_chunk=None) -> str:
+    """Consume a text stream into `container` through a StreamRenderer; returns the full text."""
+    renderer = StreamRenderer(container, mode)
+    try:
+        for chunk in stream:
+            renderer.write(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+    finally:
+        text = renderer.close()
+        # An interrupted run (rerun, stop) closes the stream now rather than whenever it is collected
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return text
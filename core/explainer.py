@@ -1,4 +1,5 @@
 from utils.fireworks_helper import generate_response, stream_response
+from utils.context_packer import packable
 
 def explain_concept(concept: str) -> str:
     """Explain a concept in simple terms, detect irrelevant instructions."""
@@ -11,7 +12,7 @@ explain it with key points, examples, and analogies.
 If it sounds like an instruction (e.g., 'make a quiz', 'summarize this'), 
 gently respond with: "It looks like you might want to use the Quizzer or Summarizer mode instead."
 
-Topic: {concept}
+Topic: {packable(concept)}
 """
     return generate_response(prompt.strip())
 
@@ -27,6 +28,6 @@ explain it with key points, examples, and analogies.
 If it sounds like an instruction (e.g., 'make a quiz', 'summarize this'), 
 gently respond with: "It looks like you might want to use the Quizzer or Summarizer mode instead."
 
-Topic: {concept}
+Topic: {packable(concept)}
 """
     return stream_response(prompt.strip())
@@ -1,6 +1,11 @@
 from utils.fireworks_helper import generate_response, stream_response
 from utils.fireworks_helper import generate_response_with_model, stream_response_with_model
+from utils.fireworks_helper import agenerate_response_with_model, submit_async
+from utils.retrieval import chunk_text
+from utils.context_packer import packable
+import asyncio
 import os
+import re
 
 NOTES_MODEL = "accounts/fireworks/models/mixtral-8x22b-instruct"
 
@@ -8,9 +13,18 @@ NOTES_MODEL = "accounts/fireworks/models/mixtral-8x22b-instruct"
 SHORT_MAX_TOKENS = int(os.getenv("NOTES_MAX_TOKENS_SHORT", "2200"))
 LONG_MAX_TOKENS = int(os.getenv("NOTES_MAX_TOKENS_LONG", "6500"))
 
+# Map-reduce mode for long inputs: chunked partial notes generated concurrently, then merged
+MAP_REDUCE_MIN_CHARS = int(os.getenv("NOTES_MAP_REDUCE_MIN_CHARS", "24000"))
+MAP_CHUNK_CHARS = int(os.getenv("NOTES_MAP_CHUNK_CHARS", "12000"))
+MAP_WORKERS = int(os.getenv("NOTES_MAP_WORKERS", "4"))
+MAP_MAX_TOKENS = int(os.getenv("NOTES_MAP_MAX_TOKENS", "2200"))
+REDUCE_MAX_TOKENS = int(os.getenv("NOTES_REDUCE_MAX_TOKENS", "900"))
+
 
 def generate_notes(text: str, length: str = "long") -> str:
     """Generate study notes from input text. Long-only (very detailed)."""
+    if len(text or "") > MAP_REDUCE_MIN_CHARS:
+        return "".join(generate_notes_map_reduce_stream(text))
     # Force long mode regardless of input
     style = "long"
     temperature = 0.3
@@ -39,18 +53,21 @@ Output format:
 - Maintain clarity: avoid rambling; keep explanations precise and rich.
 
 Input Text:
-{text}
+{packable(text)}
 """
     return generate_response_with_model(
         NOTES_MODEL,
         prompt.strip(),
         temperature=temperature,
         max_tokens=LONG_MAX_TOKENS,
+        mode="notes",
     )
 
 
 def generate_notes_stream(text: str, length: str = "long"):
     """Stream study notes generation for responsiveness (long-only)."""
+    if len(text or "") > MAP_REDUCE_MIN_CHARS:
+        return generate_notes_map_reduce_stream(text)
     style = "long"
     temperature = 0.3
 
@@ -78,11 +95,136 @@ Output format:
 - Maintain clarity: avoid rambling; keep explanations precise and rich.
 
 Input Text:
-{text}
+{packable(text)}
 """
     return stream_response_with_model(
         NOTES_MODEL,
         prompt.strip(),
         temperature=temperature,
         max_tokens=LONG_MAX_TOKENS,
-    )
\ No newline at end of file
+        mode="notes",
+    )
+
+
+# --- Map-reduce for long documents --------------------------------------------
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+def _map_prompt(chunk: str, part: int, total: int) -> str:
+    return f"""
+I am BrainDrainAI — your AI study assistant. You are writing part {part} of {total} of detailed study notes
+for a long document. Cover ONLY the excerpt below; other parts are handled separately.
+
+Requirements:
+- Organize the excerpt into 2–4 sections with `##` headings named after the concepts they cover.
+- Under each section, write 1–3 paragraphs with definitions, intuition, worked examples and pitfalls.
+- Present formulas with variable definitions; for code, include annotated snippets.
+- Do NOT add a title, introduction, or conclusion for the whole document.
+
+Output format:
+- Markdown only, starting directly with the first `##` heading.
+
+Excerpt ({part}/{total}):
+{packable(chunk)}
+""".strip()
+
+
+def _split_sections(markdown: str) -> list[tuple[int, str, str]]:
+    """Split partial notes into (level, heading, body) at Markdown headings; text before the first heading gets level 0."""
+    sections: list[tuple[int, str, list[str]]] = [(0, "", [])]
+    for line in markdown.splitlines():
+        m = _HEADING_RE.match(line.strip())
+        if m:
+            sections.append((len(m.group(1)), m.group(2).strip(), []))
+        else:
+            sections[-1][2].append(line)
+    out = []
+    for level, heading, body in sections:
+        text = "\n".join(body).strip()
+        if heading or text:
+            out.append((level, heading, text))
+    return out
+
+
+def _merge_sections(partial: str, seen: set[str]) -> str:
+    """Reduce step for one partial: keep it under `##` sections and mark repeats of earlier sections as continued."""
+    out = []
+    for level, heading, body in _split_sections(partial):
+        if not heading:
+            out.append(body)
+            continue
+        level = max(2, level)
+        if level == 2:
+            key = " ".join(heading.lower().split())
+            if key in seen:
+                heading = f"{heading} (continued)"
+            seen.add(key)
+        out.append(f"{'#' * level} {heading}\n\n{body}".rstrip())
+    return "\n\n".join(out)
+
+
+def _reduce_prompt(headings: list[str]) -> str:
+    outline = "\n".join(f"- {h}" for h in headings)
+    return f"""
+I am BrainDrainAI — your AI study assistant. Below is the section outline of detailed study notes
+generated from a long document. Write a final `## Summary & Key Takeaways` section: one short paragraph
+tying the topics together, then 5–10 bullet points with the most important ideas to remember.
+Output Markdown only, starting with the `##` heading.
+
+Section outline:
+{outline}
+""".strip()
+
+
+def generate_notes_map_reduce_stream(text: str):
+    """Stream notes for a long document via map-reduce.
+
+    Map: the document is chunked and partial notes are generated concurrently on the shared
+    async client (at most NOTES_MAP_WORKERS calls in flight). Reduce: partials are merged in document order into one
+    sectioned Markdown document, each part streamed as soon as it and all earlier parts are done,
+    followed by a short streamed summary built from the merged outline.
+    """
+    chunks = chunk_text(text, MAP_CHUNK_CHARS, overlap=300)
+    total = len(chunks)
+    if not total:
+        return
+    slots = asyncio.Semaphore(max(1, min(MAP_WORKERS, total)))
+
+    async def _map(i: int, chunk: str) -> str:
+        async with slots:
+            return await agenerate_response_with_model(
+                NOTES_MODEL,
+                _map_prompt(chunk, i + 1, total),
+                temperature=0.3,
+                max_tokens=MAP_MAX_TOKENS,
+                mode="notes",
+            )
+
+    futures = [submit_async(_map(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        seen: set[str] = set()
+        headings: list[str] = []
+        for i, fut in enumerate(futures):
+            partial = (fut.result() or "").strip()
+            if not partial or partial.startswith("❌"):
+                yield f"\n\n> ⚠️ Notes for part {i + 1} of {total} could not be generated.\n\n"
+                continue
+            merged = _merge_sections(partial, seen)
+            for level, heading, _ in _split_sections(partial):
+                if heading and level <= 2 and heading not in headings:
+                    headings.append(heading)
+            yield ("\n\n" if i else "") + merged
+        if headings:
+            yield "\n\n"
+            yield from stream_response_with_model(
+                NOTES_MODEL,
+                _reduce_prompt(headings),
+                temperature=0.3,
+                max_tokens=REDUCE_MAX_TOKENS,
+                mode="notes",
+            )
+    finally:
+        # Abandoned stream (rerun, new message): cancel map calls still pending or in flight
+        for fut in futures:
+            fut.cancel()
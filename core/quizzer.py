@@ -1,8 +1,20 @@
 from utils.fireworks_helper import generate_response, stream_response
 from utils.fireworks_helper import generate_response_with_model, stream_response_with_model
+from utils.fireworks_helper import agenerate_response_with_model, run_async
+from utils.cancellation import CancelToken, cancel_scope, current_cancel_token
+from utils.model_router import fallback_model
+from utils.context_packer import packable
+from utils.metrics import record_quiz_bank, record_quiz_bank_added
+from utils.question_bank import normalize_topic, question_bank
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import json
+import os
+import queue
 import re
 import random
+import threading
 QUIZ_MODEL = "accounts/fireworks/models/qwen3-8b"
 
 # --- Sanitizers -------------------------------------------------------------
@@ -107,9 +119,9 @@ def generate_quiz(text: str) -> str:
  - True/False
  - Fill in the Blanks
  - Descriptive
- Content: {text}
+ Content: {packable(text)}
  """
-    return generate_response_with_model(QUIZ_MODEL, prompt.strip(), max_tokens=1200)
+    return generate_response_with_model(QUIZ_MODEL, prompt.strip(), max_tokens=1200, mode="quizzer")
 
 # --- Streaming --------------------------------------------------------------
 
@@ -127,9 +139,9 @@ The types of questions can be:
 - True/False
 - Fill in the Blanks
 - Descriptive
-Content: {text}
+Content: {packable(text)}
 """
-    return stream_response_with_model(QUIZ_MODEL, prompt.strip(), max_tokens=1000)
+    return stream_response_with_model(QUIZ_MODEL, prompt.strip(), max_tokens=1000, mode="quizzer")
 
 # --- JSON quiz for UI -------------------------------------------------------
 
@@ -157,30 +169,7 @@ def _difficulty_examples(difficulty: str) -> str:
     return examples.get(difficulty, "")
 
 
-def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions: int = 10) -> dict:
-    """Create a structured quiz as JSON for interactive use.
-
-    Returns a dict with shape:
-    {
-      "quiz": [
-        {"question": str, "options": [str, str, str, str], "answer_index": int, "explanation": str}
-      ]
-    }
-    """
-    difficulty = (difficulty or "easy").lower()
-    if difficulty not in {"easy", "medium", "hard", "god level", "god"}:
-        difficulty = "easy"
-    if difficulty == "god":
-        difficulty = "god level"
-    num_questions = int(num_questions or 10)
-    num_questions = num_questions if num_questions in {10, 20, 30, 50} else 10
-
-    # Dynamic generation settings
-    temp_map = {"easy": 0.2, "medium": 0.4, "hard": 0.6, "god level": 0.8}
-    tok_map = {10: 1200, 20: 2000, 30: 2800, 50: 3800}
-    temperature = temp_map.get(difficulty, 0.3)
-    max_toks = tok_map.get(num_questions, 1200)
-
+def _quiz_prompt(topic_or_text: str, difficulty: str, num_questions: int, focus: str | None = None) -> str:
     schema = {
         "quiz": [
             {
@@ -193,10 +182,13 @@ def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions
     }
 
     examples = _difficulty_examples(difficulty)
+    focus_rule = (
+        f"\n Focus for this batch: {focus}. Other batches cover other areas; stay within this focus.\n" if focus else ""
+    )
 
-    prompt = f"""
+    return f"""
  I am BrainDrainAI — your AI study assistant. Create a {difficulty} quiz with exactly {num_questions} questions from the user's topic or passage.
- 
+ {focus_rule}
  Strict output rules:
  - OUTPUT MUST BE VALID JSON ONLY. NO extra text or markdown.
  - Use this exact schema: {schema}
@@ -216,17 +208,14 @@ def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions
  - Mix skills: recall, understanding, application, synthesis (appropriately scaled by difficulty).
  
  Topic or Text Input:
- {topic_or_text}
- """
+ {packable(topic_or_text)}
+ """.strip()
 
-    # Get raw model output safely
-    try:
-        raw = generate_response_with_model(QUIZ_MODEL, prompt.strip(), temperature=temperature, max_tokens=max_toks)
-    except Exception:
-        return {"quiz": []}
 
+def _parse_quiz_output(raw: str) -> dict:
+    """Best-effort JSON extraction from model output (code fences, surrounding prose)."""
     # Extract JSON if wrapped in code fences
-    text_out = raw.strip()
+    text_out = (raw or "").strip()
     if "```" in text_out:
         start = text_out.find("```json")
         if start != -1:
@@ -252,25 +241,126 @@ def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions
 
     if not isinstance(data, dict):
         data = {"quiz": []}
+    return data
+
+
+# Distinct areas handed to parallel shards so batches do not ask the same questions
+_SHARD_FOCUSES = [
+    "core definitions, terminology and fundamental concepts",
+    "mechanisms, processes and how things work internally",
+    "applications, use-cases and real-world scenarios",
+    "calculations, problem solving and step-by-step analysis",
+    "comparisons, trade-offs, limitations and common misconceptions",
+]
+
+QUIZ_BATCH_SIZE = int(os.getenv("QUIZ_BATCH_SIZE", "10"))
+QUIZ_MAX_PARALLEL = int(os.getenv("QUIZ_MAX_PARALLEL", "5"))
+# Extra questions per shard to absorb cross-shard duplicates
+QUIZ_SHARD_OVERSAMPLE = int(os.getenv("QUIZ_SHARD_OVERSAMPLE", "2"))
+
+# Question bank top-ups: once a session has fewer unseen banked questions than this for a
+# topic, this many more are generated in the background (0 = never top up)
+QUIZ_BANK_REFILL_BELOW = int(os.getenv("QUIZ_BANK_REFILL_BELOW", "20"))
+QUIZ_BANK_TOPUP_QUESTIONS = int(os.getenv("QUIZ_BANK_TOPUP_QUESTIONS", "20"))
+
+
+def _shard_plan(num_questions: int, focus_offset: int = 0) -> list[tuple[int, str | None]]:
+    """Split a request into (target, focus) batches; small requests stay a single unfocused call."""
+    batch = max(1, QUIZ_BATCH_SIZE)
+    if num_questions <= batch:
+        return [(num_questions, None)]
+    shards = -(-num_questions // batch)
+    base, extra = divmod(num_questions, shards)
+    return [
+        (base + (1 if i < extra else 0), _SHARD_FOCUSES[(i + focus_offset) % len(_SHARD_FOCUSES)])
+        for i in range(shards)
+    ]
+
+
+def _shard_max_tokens(count: int) -> int:
+    # Same budget per question as the single-call token map (~110 tokens each plus overhead)
+    return 200 + 110 * count
+
+
+def _generate_shard(topic_or_text: str, difficulty: str, count: int, focus: str | None, temperature: float, max_toks: int,
+                    mode: str = "quizzer", cache: bool = True) -> list:
+    raw = generate_response_with_model(
+        QUIZ_MODEL,
+        _quiz_prompt(topic_or_text, difficulty, count, focus),
+        temperature=temperature,
+        max_tokens=max_toks,
+        mode=mode,
+        cache=cache,
+    )
+    return _sanitize_quiz_dict(_parse_quiz_output(raw)).get("quiz", [])
+
+
+_QUIZ_SCHEMA = {
+    "quiz": [
+        {
+            "question": "",
+            "options": ["", "", "", ""],
+            "answer_index": 0,
+            "explanation": ""
+        }
+    ]
+}
+
 
-    data_sanitized = _sanitize_quiz_dict(data)
-    if not data_sanitized.get("quiz"):
-        # Fallback attempt with stricter prompt and alternative model
-        strict_prompt = f"""
+def _quiz_settings(difficulty: str, num_questions: int) -> tuple[str, int, float, int]:
+    """Normalize inputs and pick generation settings: (difficulty, num_questions, temperature, max_tokens)."""
+    difficulty = (difficulty or "easy").lower()
+    if difficulty not in {"easy", "medium", "hard", "god level", "god"}:
+        difficulty = "easy"
+    if difficulty == "god":
+        difficulty = "god level"
+    num_questions = int(num_questions or 10)
+    num_questions = num_questions if num_questions in {10, 20, 30, 50} else 10
+
+    # Dynamic generation settings
+    temp_map = {"easy": 0.2, "medium": 0.4, "hard": 0.6, "god level": 0.8}
+    tok_map = {10: 1200, 20: 2000, 30: 2800, 50: 3800}
+    temperature = temp_map.get(difficulty, 0.3)
+    max_toks = tok_map.get(num_questions, 1200)
+    return difficulty, num_questions, temperature, max_toks
+
+
+class QuizGenerationError(RuntimeError):
+    """Neither the model nor the question bank produced any questions (raised when placeholders are off)."""
+
+
+_NO_QUESTIONS = "❌ AI unavailable: the model returned no usable quiz questions."
+
+
+def _fallback_quiz(topic_or_text: str, difficulty: str, num_questions: int, max_toks: int, cache: bool = True,
+                   placeholders: bool = True) -> tuple[list, bool]:
+    """Second attempt with a stricter prompt on the healthiest fallback model; synthetic quiz if that fails too.
+
+    Returns (questions, generated): generated is False for the synthetic quiz, which is never banked.
+    Without `placeholders` a failed attempt raises QuizGenerationError instead.
+    """
+    schema = _QUIZ_SCHEMA
+    # Fallback attempt with stricter prompt and alternative model
+    strict_prompt = f"""
     Return ONLY valid JSON matching this exact schema (no markdown): {schema}
     Create a {difficulty} quiz with exactly {num_questions} questions.
     Topic or Text Input:
-    {topic_or_text}
+    {packable(topic_or_text)}
     """
+    raw2 = ""
+    try:
+        raw2 = generate_response_with_model(fallback_model(QUIZ_MODEL), strict_prompt.strip(), temperature=0.2, max_tokens=max_toks, mode="quizzer",
+                                            cache=cache)
         try:
-            raw2 = generate_response_with_model("accounts/fireworks/models/deepseek-v3p1", strict_prompt.strip(), temperature=0.2, max_tokens=max_toks)
-            try:
-                parsed2 = json.loads(raw2)
-            except Exception:
-                s = raw2.find("{"); e = raw2.rfind("}")
-                parsed2 = json.loads(raw2[s:e+1]) if s != -1 and e != -1 else {"quiz": []}
-            data_sanitized = _sanitize_quiz_dict(parsed2)
+            parsed2 = json.loads(raw2)
         except Exception:
+            s = raw2.find("{"); e = raw2.rfind("}")
+            parsed2 = json.loads(raw2[s:e+1]) if s != -1 and e != -1 else {"quiz": []}
+        quiz = _sanitize_quiz_dict(parsed2).get("quiz", [])
+        if quiz or placeholders:
+            return quiz, True
+    except Exception:
+        if placeholders:
             # Last-resort synthetic quiz to avoid empty UI
             base = str(topic_or_text).strip() or "General Knowledge"
             gen = []
@@ -284,97 +374,504 @@ def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions
                 ]
                 # Cycle correct index to avoid always 'A'
                 gen.append({"question": stem, "options": opts, "answer_index": (i % 4), "explanation": f"The correct option matches the stem; others are distractors."})
-            data_sanitized = {"quiz": gen}
+            return gen, False
+    # No placeholders: surface the upstream error (outage, queue timeout) so the caller can report it
+    raise QuizGenerationError(raw2 if raw2.startswith("❌") else _NO_QUESTIONS)
 
-    # Post-process: deduplicate, validate, and fill to exactly num_questions
-    def _norm(s: str) -> str:
-        return " ".join(str(s).lower().split())
 
-    quiz = data_sanitized.get("quiz", [])
-    seen = set()
+# --- Post-processing -----------------------------------------------------------
+
+def _norm_stem(s: str) -> str:
+    return " ".join(str(s).lower().split())
+
+
+def _clean_question(q: dict) -> dict | None:
+    """Validate one question; None when it has no stem."""
+    stem = str(q.get("question", "")).strip()
+    if not stem:
+        return None
+    opts = [str(o).strip() for o in (q.get("options") or [])][:4]
+    while len(opts) < 4:
+        opts.append("")
+    exp = str(q.get("explanation", q.get("rationale", "")).strip())
+    ans = _coerce_answer_index(q.get("answer_index", q.get("answer")), opts, exp)
+    return {
+        "question": stem,
+        "options": opts,
+        "answer_index": ans,
+        "explanation": exp,
+    }
+
+
+def _synthesize(base: str, needed: int):
+    templates = [
+        "Which statement best describes {t}?",
+        "Which is a core property of {t}?",
+        "Which is a typical use-case for {t}?",
+        "Which is NOT true about {t}?",
+        "Which example best illustrates {t} in practice?",
+        "Which benefit is associated with {t}?",
+        "Which limitation often applies to {t}?",
+        "Which step comes first when applying {t}?",
+        "Which pitfall occurs when using {t} incorrectly?",
+        "Which comparison correctly contrasts {t} with an alternative?",
+    ]
+    gen = []
+    base_s = str(base).strip() or "General Knowledge"
+    i = 0
+    while len(gen) < needed:
+        tmpl = templates[i % len(templates)]
+        stem = tmpl.format(t=base_s) + f" [{i+1}]"
+        options = [
+            f"A concise definition of {base_s}",
+            f"An unrelated concept to {base_s}",
+            f"A property of {base_s}",
+            f"An application of {base_s}",
+        ]
+        correct = (i % 4)
+        exp = "The correct option matches the stem; others are distractors."
+        gen.append({
+            "question": stem,
+            "options": options,
+            "answer_index": correct,
+            "explanation": exp,
+        })
+        i += 1
+    return gen
+
+
+# Randomize option order per question while preserving the correct index
+def _shuffle_question(q: dict) -> dict:
+    opts = q.get("options", [])[:4]
+    ans = int(q.get("answer_index", 0))
+    # Pair original indices with options and shuffle
+    pairs = list(enumerate(opts))
+    random.shuffle(pairs)
+    new_opts = [o for (_, o) in pairs]
+    # Find new index of the originally correct option
+    new_ans = next((i for i, (orig_idx, _) in enumerate(pairs) if orig_idx == ans), 0)
+    return {
+        "question": q.get("question", ""),
+        "options": new_opts,
+        "answer_index": new_ans,
+        "explanation": q.get("explanation", ""),
+    }
+
+
+async def _agenerate_shards(topic_or_text: str, difficulty: str, plan: list, temperature: float, mode: str = "quizzer",
+                            cache: bool = True) -> list:
+    """Generate every planned batch concurrently on the shared async client (at most QUIZ_MAX_PARALLEL at once)."""
+    slots = asyncio.Semaphore(max(1, min(QUIZ_MAX_PARALLEL, len(plan))))
+
+    async def _one(count: int, focus: str | None) -> list:
+        async with slots:
+            raw = await agenerate_response_with_model(
+                QUIZ_MODEL,
+                _quiz_prompt(topic_or_text, difficulty, count, focus),
+                temperature=temperature,
+                max_tokens=_shard_max_tokens(count),
+                mode=mode,
+                cache=cache,
+            )
+        return _sanitize_quiz_dict(_parse_quiz_output(raw)).get("quiz", [])
+
+    return await asyncio.gather(*[_one(target + QUIZ_SHARD_OVERSAMPLE, focus) for target, focus in plan])
+
+
+def _generate_questions(topic_or_text: str, difficulty: str, num_questions: int, temperature: float, max_toks: int,
+                        mode: str = "quizzer", focus_offset: int = 0, cache: bool = True) -> list:
+    """Raw model questions for a request; large requests fan out to parallel shards (raises on failure)."""
+    plan = _shard_plan(num_questions, focus_offset)
+    if len(plan) == 1:
+        shard_results = [_generate_shard(topic_or_text, difficulty, num_questions, None, temperature, max_toks, mode, cache)]
+    else:
+        shard_results = run_async(_agenerate_shards(topic_or_text, difficulty, plan, temperature, mode, cache))
+    # Each shard's first `target` questions come first, in shard order; oversampled extras only
+    # fill gaps left by cross-shard duplicates
+    primary = [q for (target, _), shard in zip(plan, shard_results) for q in shard[:target]]
+    extras = [q for (target, _), shard in zip(plan, shard_results) for q in shard[target:]]
+    return primary + extras
+
+
+def _unique_questions(quiz: list, seen: set) -> list:
+    """Validate questions and drop stems already in `seen` (which is updated)."""
     cleaned = []
     for q in quiz:
-        stem = str(q.get("question", "")).strip()
-        if not stem:
+        item = _clean_question(q)
+        if item is None:
             continue
-        key = _norm(stem)
+        key = _norm_stem(item["question"])
         if key in seen:
             continue
-        opts = [str(o).strip() for o in (q.get("options") or [])][:4]
-        while len(opts) < 4:
-            opts.append("")
-        exp = str(q.get("explanation", q.get("rationale", "")).strip())
-        ans = _coerce_answer_index(q.get("answer_index", q.get("answer")), opts, exp)
-        cleaned.append({
-            "question": stem,
-            "options": opts,
-            "answer_index": ans,
-            "explanation": exp,
-        })
+        cleaned.append(item)
         seen.add(key)
+    return cleaned
 
-    def _synthesize(base: str, needed: int):
-        templates = [
-            "Which statement best describes {t}?",
-            "Which is a core property of {t}?",
-            "Which is a typical use-case for {t}?",
-            "Which is NOT true about {t}?",
-            "Which example best illustrates {t} in practice?",
-            "Which benefit is associated with {t}?",
-            "Which limitation often applies to {t}?",
-            "Which step comes first when applying {t}?",
-            "Which pitfall occurs when using {t} incorrectly?",
-            "Which comparison correctly contrasts {t} with an alternative?",
-        ]
-        gen = []
-        base_s = str(base).strip() or "General Knowledge"
-        i = 0
-        while len(gen) < needed:
-            tmpl = templates[i % len(templates)]
-            stem = tmpl.format(t=base_s) + f" [{i+1}]"
-            options = [
-                f"A concise definition of {base_s}",
-                f"An unrelated concept to {base_s}",
-                f"A property of {base_s}",
-                f"An application of {base_s}",
-            ]
-            correct = (i % 4)
-            exp = "The correct option matches the stem; others are distractors."
-            gen.append({
-                "question": stem,
-                "options": options,
-                "answer_index": correct,
-                "explanation": exp,
-            })
-            i += 1
-        return gen
+
+# --- Question bank -----------------------------------------------------------------
+
+_topup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-topup")
+_topups: set = set()
+# (topic, difficulty) pairs whose last top-up added nothing new; not topped up again until a
+# request adds new questions for them
+_topups_exhausted: set = set()
+_topups_lock = threading.Lock()
+
+
+def _bank_questions(topic: str, difficulty: str, session_id: str | None, questions: list, served: int) -> None:
+    """Store generated questions; the ones served to this session are marked seen."""
+    if not questions:
+        return
+    added = question_bank.add(topic, difficulty, questions)
+    record_quiz_bank_added("request", added)
+    if added:
+        with _topups_lock:
+            _topups_exhausted.discard((topic, difficulty))
+    question_bank.mark_seen(topic, difficulty, session_id, questions[:served])
+
+
+def _topup(topic_or_text: str, topic: str, difficulty: str) -> None:
+    try:
+        _, _, temperature, _ = _quiz_settings(difficulty, QUIZ_BATCH_SIZE)
+        count = QUIZ_BANK_TOPUP_QUESTIONS
+        # Start at a random focus area so successive top-ups cover different parts of the topic; the
+        # response cache is skipped since a cached reply would only return questions already banked
+        quiz = _generate_questions(
+            topic_or_text, difficulty, count, temperature, _shard_max_tokens(count),
+            mode="quiz_topup", focus_offset=random.randrange(len(_SHARD_FOCUSES)), cache=False,
+        )
+        added = question_bank.add(topic, difficulty, _unique_questions(quiz, set()))
+        record_quiz_bank_added("topup", added)
+        if quiz and not added:
+            # The model only repeats what is banked: stop topping up this topic
+            with _topups_lock:
+                _topups_exhausted.add((topic, difficulty))
+    except Exception:
+        pass
+    finally:
+        with _topups_lock:
+            _topups.discard((topic, difficulty))
+
+
+def _schedule_topup(topic_or_text: str, topic: str, difficulty: str, session_id: str | None) -> None:
+    """Generate more questions in the background once this session's unseen stock for the topic runs low."""
+    if not question_bank.enabled or QUIZ_BANK_TOPUP_QUESTIONS <= 0:
+        return
+    if question_bank.unseen_count(topic, difficulty, session_id) >= QUIZ_BANK_REFILL_BELOW:
+        return
+    with _topups_lock:
+        if (topic, difficulty) in _topups or (topic, difficulty) in _topups_exhausted:
+            return
+        _topups.add((topic, difficulty))
+    # Submitted without the caller's context: top-ups never show up in the UI's queue indicator
+    _topup_pool.submit(_topup, topic_or_text, topic, difficulty)
+
+
+def _use_response_cache(topic: str, difficulty: str, session_id: str | None) -> bool:
+    """Whether generating this quiz may reuse a cached model reply.
+
+    A cached reply repeats questions generated (and banked) before, so it is only used when there is
+    no session to serve unseen questions to and the bank holds nothing on the topic yet.
+    """
+    return session_id is None and question_bank.unseen_count(topic, difficulty) == 0
+
+
+def _take_banked(topic: str, difficulty: str, num_questions: int, session_id: str | None, mark: bool = True) -> list | None:
+    """A full quiz of questions this session has not seen, or None when the bank is short."""
+    banked = question_bank.take(topic, difficulty, num_questions, session_id, mark=mark)
+    record_quiz_bank("hit" if banked is not None else "miss")
+    return banked
+
+
+def create_quiz_json(topic_or_text: str, difficulty: str = "easy", num_questions: int = 10, session_id: str | None = None,
+                     placeholders: bool = True) -> dict:
+    """Create a structured quiz as JSON for interactive use.
+
+    When the question bank holds enough questions on this topic and difficulty that `session_id`
+    has not seen yet, the quiz is sampled from it with no model call. Otherwise requests larger
+    than QUIZ_BATCH_SIZE are split into concurrent batches, each focused on a different area of
+    the topic, and merged through the same dedup/validation pipeline; generated questions are
+    banked. Either way the bank is topped up in the background when it runs low.
+
+    If the model falls short, banked questions and then placeholder ones fill the quiz. Without
+    `placeholders` a short quiz is returned as is, and QuizGenerationError is raised when neither
+    the model nor the bank produced a single question.
+
+    Returns a dict with shape:
+    {
+      "quiz": [
+        {"question": str, "options": [str, str, str, str], "answer_index": int, "explanation": str}
+      ]
+    }
+    """
+    difficulty, num_questions, temperature, max_toks = _quiz_settings(difficulty, num_questions)
+    topic = normalize_topic(topic_or_text)
+
+    banked = _take_banked(topic, difficulty, num_questions, session_id)
+    if banked is not None:
+        _schedule_topup(topic_or_text, topic, difficulty, session_id)
+        return {"quiz": [_shuffle_question(q) for q in banked]}
+
+    # Get raw model output safely; large requests fan out to parallel shards
+    cache = _use_response_cache(topic, difficulty, session_id)
+    failure = None
+    try:
+        quiz = _generate_questions(topic_or_text, difficulty, num_questions, temperature, max_toks, cache=cache)
+    except Exception as e:
+        if placeholders:
+            return {"quiz": []}
+        quiz, failure = [], QuizGenerationError(f"❌ AI unavailable: {e}")
+    generated = bool(quiz)
+    if not quiz and failure is None:
+        try:
+            quiz, generated = _fallback_quiz(topic_or_text, difficulty, num_questions, max_toks, cache, placeholders)
+        except QuizGenerationError as e:
+            failure = e
+
+    # Post-process: deduplicate, validate, and fill to exactly num_questions
+    seen = set()
+    cleaned = _unique_questions(quiz, seen)
+    if generated:
+        _bank_questions(topic, difficulty, session_id, cleaned, num_questions)
 
     if len(cleaned) < num_questions:
+        # Banked questions on the topic before placeholder ones
+        fill = question_bank.take(topic, difficulty, num_questions - len(cleaned), session_id, minimum=1) or []
+        cleaned += _unique_questions(fill, seen)
+    if not cleaned and not placeholders:
+        raise failure or QuizGenerationError(_NO_QUESTIONS)
+    if len(cleaned) < num_questions and placeholders:
         fill = _synthesize(topic_or_text, num_questions - len(cleaned))
         for q in fill:
-            key = _norm(q["question"])
+            key = _norm_stem(q["question"])
             if key in seen:
                 continue
             cleaned.append(q)
             seen.add(key)
 
-    # Randomize option order per question while preserving the correct index
-    def _shuffle_question(q: dict) -> dict:
-        opts = q.get("options", [])[:4]
-        ans = int(q.get("answer_index", 0))
-        # Pair original indices with options and shuffle
-        pairs = list(enumerate(opts))
-        random.shuffle(pairs)
-        new_opts = [o for (_, o) in pairs]
-        # Find new index of the originally correct option
-        new_ans = next((i for i, (orig_idx, _) in enumerate(pairs) if orig_idx == ans), 0)
-        return {
-            "question": q.get("question", ""),
-            "options": new_opts,
-            "answer_index": new_ans,
-            "explanation": q.get("explanation", ""),
-        }
-
+    _schedule_topup(topic_or_text, topic, difficulty, session_id)
     final = cleaned[:num_questions]
     final = [_shuffle_question(q) for q in final]
     return {"quiz": final}
+
+
+# --- Streaming JSON quiz ---------------------------------------------------------
+
+def _iter_json_objects(chunks):
+    """Incrementally parse streamed JSON and yield each object that is a direct element of an array.
+
+    Works for both {"quiz": [{...}, ...]} and bare [{...}, ...] outputs, tolerates code fences and
+    prose around the JSON, and yields each question as soon as its closing brace arrives.
+    """
+    buf: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    obj_start = None  # index into buf where the current array element object started
+    for chunk in chunks:
+        for ch in chunk:
+            if obj_start is not None:
+                buf.append(ch)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch in "[{":
+                if ch == "{" and obj_start is None and stack and stack[-1] == "[":
+                    obj_start = len(stack)
+                    buf = ["{"]
+                stack.append(ch)
+            elif ch in "]}":
+                if stack:
+                    stack.pop()
+                if ch == "}" and obj_start is not None and len(stack) == obj_start:
+                    try:
+                        obj = json.loads("".join(buf))
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        yield obj
+                    obj_start = None
+                    buf = []
+
+
+def _stream_shard(topic_or_text: str, difficulty: str, count: int, focus: str | None, temperature: float, max_toks: int,
+                  mode: str = "quizzer", cache: bool = True):
+    stream = stream_response_with_model(
+        QUIZ_MODEL,
+        _quiz_prompt(topic_or_text, difficulty, count, focus),
+        temperature=temperature,
+        max_tokens=max_toks,
+        mode=mode,
+        cache=cache,
+    )
+    for obj in _iter_json_objects(stream):
+        yield from _sanitize_quiz_dict({"quiz": [obj]})["quiz"]
+
+
+def create_quiz_json_stream(topic_or_text: str, difficulty: str = "easy", num_questions: int = 10,
+                            session_id: str | None = None, speculative: bool = False, placeholders: bool = True):
+    """Streaming variant of create_quiz_json: yield each sanitized, shuffled question as soon as it is parsed.
+
+    A full set of unseen banked questions is yielded at once. Otherwise batches of a sharded
+    request stream concurrently and questions are yielded in arrival order; they are banked when
+    the stream ends (also when the consumer stops early). If the model falls short, banked
+    questions and then the same fallback and synthetic fill as create_quiz_json top it up, so
+    exactly num_questions questions are yielded in total. Without `placeholders` the synthetic fill
+    is skipped and QuizGenerationError is raised when not a single question could be yielded.
+
+    A `speculative` quiz (prefetched before the user asked for it) runs at prefetch priority,
+    bypasses the response cache and singleflight (so it is not a copy of the quiz just served) and
+    marks nothing as seen; call mark_quiz_seen once it is actually shown.
+    """
+    difficulty, num_questions, temperature, max_toks = _quiz_settings(difficulty, num_questions)
+    topic = normalize_topic(topic_or_text)
+    mode = "quiz_prefetch" if speculative else "quizzer"
+
+    banked = _take_banked(topic, difficulty, num_questions, session_id, mark=not speculative)
+    if banked is not None:
+        _schedule_topup(topic_or_text, topic, difficulty, session_id)
+        for q in banked:
+            yield _shuffle_question(q)
+        return
+
+    cache = not speculative and _use_response_cache(topic, difficulty, session_id)
+    plan = _shard_plan(num_questions)
+    if len(plan) == 1:
+        sources = [(topic_or_text, difficulty, num_questions, None, temperature, max_toks, mode, cache)]
+    else:
+        sources = [
+            (topic_or_text, difficulty, target + QUIZ_SHARD_OVERSAMPLE, focus, temperature,
+             _shard_max_tokens(target + QUIZ_SHARD_OVERSAMPLE), mode, cache)
+            for target, focus in plan
+        ]
+
+    seen = set()
+    emitted = 0
+    # Model-written questions, in the order they were yielded; banked when the stream ends
+    generated = []
+
+    def _accept(q: dict) -> dict | None:
+        item = _clean_question(q)
+        if item is None:
+            return None
+        key = _norm_stem(item["question"])
+        if key in seen:
+            return None
+        seen.add(key)
+        return item
+
+    try:
+        if len(sources) == 1:
+            arrivals = _stream_shard(*sources[0])
+        else:
+            arrivals = _merge_streams([_stream_shard(*src) for src in sources])
+        try:
+            for q in arrivals:
+                item = _accept(q)
+                if item is None:
+                    continue
+                generated.append(item)
+                yield _shuffle_question(item)
+                emitted += 1
+                if emitted >= num_questions:
+                    return
+        finally:
+            close = getattr(arrivals, "close", None)
+            if close:
+                close()
+
+        failure = None
+        if emitted == 0:
+            try:
+                fallback, from_model = _fallback_quiz(topic_or_text, difficulty, num_questions, max_toks, cache, placeholders)
+            except QuizGenerationError as e:
+                fallback, from_model, failure = [], False, e
+            for q in fallback:
+                item = _accept(q)
+                if item is None:
+                    continue
+                if from_model:
+                    generated.append(item)
+                yield _shuffle_question(item)
+                emitted += 1
+                if emitted >= num_questions:
+                    return
+        if emitted < num_questions:
+            # Banked questions on the topic before placeholder ones
+            fill = question_bank.take(topic, difficulty, num_questions - emitted, session_id, minimum=1, mark=not speculative)
+            for q in fill or []:
+                item = _accept(q)
+                if item is None:
+                    continue
+                yield _shuffle_question(item)
+                emitted += 1
+        if emitted == 0 and not placeholders:
+            raise failure or QuizGenerationError(_NO_QUESTIONS)
+        if emitted < num_questions and placeholders:
+            for q in _synthesize(topic_or_text, num_questions - emitted):
+                item = _accept(q)
+                if item is not None:
+                    yield _shuffle_question(item)
+    finally:
+        _bank_questions(topic, difficulty, session_id, generated, 0 if speculative else len(generated))
+        _schedule_topup(topic_or_text, topic, difficulty, session_id)
+
+
+def mark_quiz_seen(topic_or_text: str, difficulty: str, questions: list, session_id: str | None) -> None:
+    """Record the questions of a speculative quiz as served to `session_id` once the user starts it."""
+    difficulty = _quiz_settings(difficulty, QUIZ_BATCH_SIZE)[0]
+    question_bank.mark_seen(normalize_topic(topic_or_text), difficulty, session_id, questions)
+
+
+def _merge_streams(generators: list):
+    """Drain several generators on worker threads (bounded by QUIZ_MAX_PARALLEL) and yield items as they arrive.
+
+    Each generator runs under its own cancel token, a child of the caller's: closing the merged
+    stream cancels every upstream call right away instead of after its next item.
+    """
+    out: queue.Queue = queue.Queue()
+    done = object()
+    stop = threading.Event()
+    parent = current_cancel_token()
+    tokens = [CancelToken() for _ in generators]
+    unlink = [parent.on_cancel(token.cancel) for token in tokens] if parent is not None else []
+
+    def _pump(gen, token: CancelToken):
+        with cancel_scope(token):
+            try:
+                for item in gen:
+                    if stop.is_set():
+                        break
+                    out.put(item)
+            except Exception:
+                pass
+            finally:
+                gen.close()
+                out.put(done)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(QUIZ_MAX_PARALLEL, len(generators))), thread_name_prefix="quiz-stream")
+    for gen, token in zip(generators, tokens):
+        # Each worker runs in a copy of the caller's context so queue-position updates still reach the UI
+        pool.submit(contextvars.copy_context().run, _pump, gen, token)
+    remaining = len(generators)
+    try:
+        while remaining:
+            item = out.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        for token in tokens:
+            token.cancel()
+        for fn in unlink:
+            fn()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,21 +1,52 @@
 from utils.fireworks_helper import generate_response, stream_response
 from utils.fireworks_helper import generate_response_with_model, stream_response_with_model
+from utils.fireworks_helper import agenerate_response_with_model, astream_response_with_model
+from utils.context_packer import packable
 SOLVER_MODEL = "accounts/fireworks/models/deepseek-v3p1"
 
 
-def solve_problem(prompt: str) -> str:
-    """Answer a user's study problem or doubt."""
+def _context_block(context_chunks: list[str] | None) -> str:
+    if not context_chunks:
+        return ""
+    excerpts = "\n\n---\n\n".join(packable(chunk) for chunk in context_chunks)
+    return (
+        "Relevant excerpts from the user's uploaded study material "
+        "(use them when they help; say so if they do not cover the question):\n\n"
+        f"{excerpts}\n\n"
+    )
+
+
+def solve_problem(prompt: str, context_chunks: list[str] | None = None) -> str:
+    """Answer a user's study problem or doubt, optionally grounded in retrieved document chunks."""
+    system = (
+        "I am BrainDrainAI — your AI study assistant. Read the user's problem or doubt and provide a helpful solution."
+    )
+    full_prompt = f"{system}\n\n{_context_block(context_chunks)}User: {packable(prompt)}"
+    return generate_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000, mode="solver")
+
+
+def solve_problem_stream(prompt: str, context_chunks: list[str] | None = None):
+    """Stream solution tokens for responsiveness, optionally grounded in retrieved document chunks."""
+    system = (
+        "I am BrainDrainAI — your AI study assistant. Read the user's problem or doubt and provide a helpful solution."
+    )
+    full_prompt = f"{system}\n\n{_context_block(context_chunks)}User: {packable(prompt)}"
+    return stream_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000, mode="solver")
+
+
+async def asolve_problem(prompt: str, context_chunks: list[str] | None = None) -> str:
+    """Async variant of solve_problem (shared async client, bounded concurrency)."""
     system = (
         "I am BrainDrainAI — your AI study assistant. Read the user's problem or doubt and provide a helpful solution."
     )
-    full_prompt = f"{system}\n\nUser: {prompt}"
-    return generate_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000)
+    full_prompt = f"{system}\n\n{_context_block(context_chunks)}User: {packable(prompt)}"
+    return await agenerate_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000, mode="solver")
 
 
-def solve_problem_stream(prompt: str):
-    """Stream solution tokens for responsiveness."""
+def asolve_problem_stream(prompt: str, context_chunks: list[str] | None = None):
+    """Async variant of solve_problem_stream; returns an async iterator of text chunks."""
     system = (
         "I am BrainDrainAI — your AI study assistant. Read the user's problem or doubt and provide a helpful solution."
     )
-    full_prompt = f"{system}\n\nUser: {prompt}"
-    return stream_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000)
\ No newline at end of file
+    full_prompt = f"{system}\n\n{_context_block(context_chunks)}User: {packable(prompt)}"
+    return astream_response_with_model(SOLVER_MODEL, full_prompt, max_tokens=3000, mode="solver")
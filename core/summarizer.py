@@ -1,4 +1,5 @@
 from utils.fireworks_helper import generate_response, stream_response
+from utils.context_packer import packable
 
 def summarize_text(text: str) -> str:
     """Summarize long notes or text."""
@@ -13,7 +14,7 @@ Otherwise, summarize it into clear, bullet-point sections:
 - Important Points
 - Summary
 
-Text: {text}
+Text: {packable(text)}
 """
     return generate_response(prompt.strip())
 
@@ -31,6 +32,6 @@ Otherwise, summarize it into clear, bullet-point sections:
 - Important Points
 - Summary
 
-Text: {text}
+Text: {packable(text)}
 """
     return stream_response(prompt.strip())
@@ -7,6 +7,7 @@ from core.summarizer import summarize_text
 from core.quizzer import generate_quiz
 from components.hero import hero_ui
 from components.theme import inject_global_theme
+from utils.metrics import start_exporters
 
 st.set_page_config(
     page_title="BrainDrainAI - AI Study Assistant",
@@ -66,6 +67,9 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Prometheus /metrics listener and/or metrics file (once per process)
+start_exporters()
+
 # Sidebar
 selected_mode = sidebar_ui()
 
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+
+import pytest
+
+# Settings are read at import: keep tests off the network, disk caches and background limits
+os.environ.update({
+    "FIREWORKS_API_KEY": "test",
+    "LLM_CACHE_DB": "",
+    "QUESTION_BANK_DB": "",
+    "LLM_RATE_LIMIT_ENABLED": "0",
+    "LLM_HEDGE_ENABLED": "0",
+    "METRICS_PORT": "0",
+    "METRICS_FILE": "",
+})
+
+from core import quizzer  # noqa: E402
+from utils import fireworks_helper, llm_cache  # noqa: E402
+from utils.question_bank import QuestionBank  # noqa: E402
+
+
+class FakeModel:
+    """Stands in for the upstream call behind the cache and singleflight: every call writes new questions."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failure: str | None = None
+        self._lock = threading.Lock()
+
+    def reply(self) -> str:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.failure:
+            raise RuntimeError(self.failure)
+        return json.dumps({"quiz": [
+            {
+                "question": f"Call {call}: which statement about item {i} holds?",
+                "options": [f"Option {i}.{k}" for k in range(4)],
+                "answer_index": i % 4,
+                "explanation": f"Option {i}.{i % 4} is the right one.",
+            }
+            for i in range(12)
+        ]})
+
+    def complete(self, *args, **kwargs) -> str:
+        return self.reply()
+
+    def stream(self, *args, **kwargs):
+        text = self.reply()
+        for pos in range(0, len(text), 200):
+            yield text[pos:pos + 200]
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(fireworks_helper, "_routed_completion", model.complete)
+    monkeypatch.setattr(fireworks_helper, "_routed_stream", model.stream)
+    return model
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    """A fresh in-memory response cache, enabled."""
+    cache = llm_cache.ResponseCache(3600, 64)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(fireworks_helper, "response_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def question_bank(monkeypatch, tmp_path):
+    """A fresh question bank for the quizzer, with background top-ups off."""
+    bank = QuestionBank(str(tmp_path / "question_bank.sqlite3"))
+    monkeypatch.setattr(quizzer, "question_bank", bank)
+    monkeypatch.setattr(quizzer, "QUIZ_BANK_TOPUP_QUESTIONS", 0)
+    return bank
@@ -0,0 +1,68 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api
+
+
+@pytest.fixture
+def api_url():
+    server = api.make_server("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url: str, body: dict):
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, dict(response.headers), response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read().decode("utf-8")
+
+
+def _events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_quiz_serves_model_questions(api_url, fake_model, response_cache, question_bank):
+    status, _, body = _post(f"{api_url}/v1/quiz", {"topic": "DBMS", "num_questions": 10})
+
+    assert status == 200
+    assert len(json.loads(body)["quiz"]) == 10
+
+
+def test_quiz_model_failure_is_a_bad_gateway_not_placeholders(api_url, fake_model, response_cache, question_bank):
+    fake_model.failure = "Connection error."
+    status, _, body = _post(f"{api_url}/v1/quiz", {"topic": "DBMS", "num_questions": 10})
+
+    assert status == 502
+    assert "Connection error." in json.loads(body)["error"]
+
+
+def test_quiz_queue_timeout_is_service_unavailable(api_url, fake_model, response_cache, question_bank):
+    fake_model.failure = "Timed out after waiting in the model queue (quizzer)."
+    status, headers, _ = _post(f"{api_url}/v1/quiz", {"topic": "DBMS", "num_questions": 10})
+
+    assert status == 503
+    assert headers["Retry-After"] == "2"
+
+
+def test_quiz_stream_model_failure_ends_with_an_error_event(api_url, fake_model, response_cache, question_bank):
+    fake_model.failure = "Connection error."
+    status, _, body = _post(f"{api_url}/v1/quiz", {"topic": "DBMS", "num_questions": 10, "stream": True})
+
+    assert status == 200
+    events = _events(body)
+    assert [event for event, _ in events] == ["error"]
+    assert events[0][1]["status"] == 502
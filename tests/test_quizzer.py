@@ -0,0 +1,32 @@
+from core.quizzer import create_quiz_json, create_quiz_json_stream
+
+
+def _stems(questions: list) -> set:
+    return {q["question"] for q in questions}
+
+
+def test_same_session_asking_twice_gets_unseen_questions(fake_model, response_cache, question_bank):
+    first = create_quiz_json("DBMS", "medium", 10, session_id="s1")["quiz"]
+    second = create_quiz_json("DBMS", "medium", 10, session_id="s1")["quiz"]
+
+    assert len(first) == len(second) == 10
+    assert not _stems(first) & _stems(second)
+    assert fake_model.calls == 2
+
+
+def test_same_session_asking_twice_gets_unseen_questions_streaming(fake_model, response_cache, question_bank):
+    first = list(create_quiz_json_stream("DBMS", "medium", 10, session_id="s1"))
+    second = list(create_quiz_json_stream("DBMS", "medium", 10, session_id="s1"))
+
+    assert len(first) == len(second) == 10
+    assert not _stems(first) & _stems(second)
+    assert fake_model.calls == 2
+
+
+def test_anonymous_first_quiz_on_a_topic_uses_the_response_cache(fake_model, response_cache, question_bank, monkeypatch):
+    # Nothing banked and no session: a cached reply cannot repeat anything this caller has seen
+    monkeypatch.setattr(question_bank, "db_path", "")
+    create_quiz_json("DBMS", "medium", 10)
+    create_quiz_json("DBMS", "medium", 10)
+
+    assert fake_model.calls == 1
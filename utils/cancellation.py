@@ -0,0 +1,75 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+
+class Cancelled(RuntimeError):
+    """Raised when a request is cancelled before it went upstream."""
+
+
+class CancelToken:
+    """Set once by whoever abandons a generation; LLM calls made under it stop and close their streams.
+
+    Callbacks registered with on_cancel run exactly once, on the thread that cancels, so they must
+    only wake things up (put an event on a queue, notify a condition), never block.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Call `fn` when the token is cancelled (now, if it already is); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._remove(fn)
+        fn()
+        return lambda: None
+
+    def _remove(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            try:
+                self._callbacks.remove(fn)
+            except ValueError:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled("Request cancelled.")
+
+
+_cancel_token: contextvars.ContextVar = contextvars.ContextVar("llm_cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: CancelToken | None = None):
+    """Run the block under `token` (a new one when omitted): LLM calls made inside it honour its cancellation."""
+    token = token or CancelToken()
+    reset = _cancel_token.set(token)
+    try:
+        yield token
+    finally:
+        _cancel_token.reset(reset)
+
+
+def current_cancel_token() -> CancelToken | None:
+    return _cancel_token.get()
@@ -0,0 +1,183 @@
+import contextvars
+import os
+import re
+from contextlib import contextmanager
+from typing import Callable
+
+# Context packing: fit every request's prompt plus max_tokens into the target model's window
+LLM_CONTEXT_PACKING = os.getenv("LLM_CONTEXT_PACKING", "1") not in {"0", "false", "False", ""}
+# Share of the window actually planned for, since token counts are estimated
+LLM_CONTEXT_SAFETY = float(os.getenv("LLM_CONTEXT_SAFETY", "0.92"))
+# Optional cost cap on input tokens per request (0 = only the model's window)
+LLM_MAX_INPUT_TOKENS = int(os.getenv("LLM_MAX_INPUT_TOKENS", "0"))
+LLM_DEFAULT_CONTEXT_TOKENS = int(os.getenv("LLM_DEFAULT_CONTEXT_TOKENS", "32768"))
+# max_tokens is only lowered below the requested value when the fixed prompt leaves no room, and never below this
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "256"))
+
+_MODELS = "accounts/fireworks/models/"
+DEFAULT_CONTEXT_LIMITS = {
+    _MODELS + "deepseek-v3p1": 163840,
+    _MODELS + "mixtral-8x22b-instruct": 65536,
+    _MODELS + "qwen3-8b": 40960,
+}
+
+# Characters per token on English prose, by model family (tokenizers differ by ~10%)
+CHARS_PER_TOKEN = {"deepseek": 3.6, "qwen": 3.7, "mixtral": 3.3, "llama": 3.8}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+
+def _parse_limits(spec: str) -> dict:
+    """Parse "model=tokens,model2=tokens" into a context limit map."""
+    out = {}
+    for entry in spec.split(","):
+        model, _, tokens = entry.partition("=")
+        if model.strip() and tokens.strip().isdigit():
+            out[model.strip()] = int(tokens)
+    return out
+
+
+LLM_CONTEXT_LIMITS = {**DEFAULT_CONTEXT_LIMITS, **_parse_limits(os.getenv("LLM_CONTEXT_LIMITS", ""))}
+
+# Prompt builders mark user/document text with these so packing trims content, never instructions
+_OPEN, _CLOSE = "\x02", "\x03"
+_REGION_RE = re.compile("\x02(.*?)\x03", re.S)
+
+
+def packable(text: str) -> str:
+    """Mark `text` inside a prompt as content that may be trimmed to fit the model's context."""
+    clean = (text or "").replace(_OPEN, "").replace(_CLOSE, "")
+    return f"{_OPEN}{clean}{_CLOSE}"
+
+
+def chars_per_token(model: str | None) -> float:
+    name = (model or "").lower()
+    return next((ratio for family, ratio in CHARS_PER_TOKEN.items() if family in name), DEFAULT_CHARS_PER_TOKEN)
+
+
+def estimate_tokens(text: str, model: str | None = None) -> int:
+    """Fast token estimate: characters over the family's chars/token, plus extra for non-ASCII text.
+
+    Non-ASCII characters (accents, CJK, symbols) tokenize far denser than English, so every
+    extra UTF-8 byte adds half a token. Both lengths are computed in C, so this stays cheap
+    on megabyte-sized prompts.
+    """
+    if not text:
+        return 0
+    extra = len(text.encode("utf-8")) - len(text)
+    return int(len(text) / chars_per_token(model) + extra * 0.5) + 1
+
+
+def context_limit(model: str) -> int:
+    return LLM_CONTEXT_LIMITS.get(model, LLM_DEFAULT_CONTEXT_TOKENS)
+
+
+def input_budget(model: str, max_tokens: int | None) -> int:
+    """Tokens available to the prompt once room for the completion is reserved."""
+    budget = int(context_limit(model) * LLM_CONTEXT_SAFETY) - (max_tokens or 0)
+    if LLM_MAX_INPUT_TOKENS:
+        budget = min(budget, LLM_MAX_INPUT_TOKENS)
+    return budget
+
+
+# --- Reporting --------------------------------------------------------------
+
+_pack_observer: contextvars.ContextVar = contextvars.ContextVar("llm_pack_observer", default=None)
+
+
+@contextmanager
+def packing_status(callback: Callable[[dict], None]):
+    """Report every trimmed request made inside this block to `callback(report)`."""
+    token = _pack_observer.set(callback)
+    try:
+        yield
+    finally:
+        _pack_observer.reset(token)
+
+
+def current_pack_observer():
+    return _pack_observer.get()
+
+
+# --- Packing ----------------------------------------------------------------
+
+def _omitted(chars: int) -> str:
+    return f"\n\n[… {chars:,} characters omitted to fit the model's context …]\n\n"
+
+
+def _trim(text: str, keep_chars: int) -> str:
+    """Keep the head and tail of `text` (about 2:1), cut at whitespace, with a note about the gap."""
+    if keep_chars >= len(text):
+        return text
+    if keep_chars <= 0:
+        return _omitted(len(text)).strip()
+    head = int(keep_chars * 2 / 3)
+    tail = keep_chars - head
+    cut = text.rfind("\n", int(head * 0.8), head + 1)
+    if cut < 0:
+        cut = text.rfind(" ", int(head * 0.8), head + 1)
+    head = cut if cut > 0 else head
+    start = len(text) - tail
+    nxt = text.find("\n", start, start + max(1, tail // 5))
+    if nxt < 0:
+        nxt = text.find(" ", start, start + max(1, tail // 5))
+    start = nxt + 1 if nxt >= 0 else start
+    return text[:head].rstrip() + _omitted(start - head) + text[start:].lstrip()
+
+
+def _allocate(sizes: list[int], available: int) -> list[int]:
+    """Split `available` tokens across regions: small regions stay whole, large ones share the rest evenly."""
+    alloc = [0] * len(sizes)
+    remaining = max(0, available)
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = remaining // (len(order) - n)
+        alloc[i] = min(sizes[i], share)
+        remaining -= alloc[i]
+    return alloc
+
+
+def pack_prompt(prompt: str, model: str, max_tokens: int | None, system: str = "") -> tuple[str, int | None, dict | None]:
+    """Fit `prompt` (with `system`) and `max_tokens` into `model`'s context.
+
+    Marked regions (see packable) are trimmed first; an unmarked prompt is trimmed in the
+    middle as a whole. Returns (prompt without markers, max_tokens, report or None when nothing
+    was dropped). The report has original/packed token estimates and dropped tokens/characters.
+    """
+    regions = _REGION_RE.findall(prompt) if _OPEN in prompt else []
+    plain = _REGION_RE.sub(lambda m: m.group(1), prompt) if regions else prompt
+    if not LLM_CONTEXT_PACKING:
+        return plain, max_tokens, None
+
+    ratio = chars_per_token(model)
+    fixed = estimate_tokens(system, model)
+    original = fixed + estimate_tokens(plain, model)
+    budget = input_budget(model, max_tokens)
+    if original <= budget:
+        return plain, max_tokens, None
+
+    if regions:
+        fixed += estimate_tokens(_REGION_RE.sub("", prompt), model)
+        sizes = [estimate_tokens(r, model) for r in regions]
+        # Each omission note costs a few tokens of its own
+        alloc = _allocate(sizes, budget - fixed - 16 * len(regions))
+        trimmed = iter([
+            _trim(r, int(a * ratio)) if a < s else r for r, s, a in zip(regions, sizes, alloc)
+        ])
+        packed = _REGION_RE.sub(lambda m: next(trimmed), prompt)
+    else:
+        packed = _trim(plain, int((budget - fixed - 16) * ratio))
+
+    packed_tokens = estimate_tokens(system, model) + estimate_tokens(packed, model)
+    # Instructions alone may not leave room for the full completion: lower max_tokens as a last resort
+    room = int(context_limit(model) * LLM_CONTEXT_SAFETY) - packed_tokens
+    if max_tokens and room < max_tokens:
+        max_tokens = max(LLM_MIN_OUTPUT_TOKENS, room)
+    report = {
+        "model": model,
+        "original_tokens": original,
+        "packed_tokens": packed_tokens,
+        "dropped_tokens": max(0, original - packed_tokens),
+        "dropped_chars": max(0, len(plain) - len(packed)),
+        "max_tokens": max_tokens,
+    }
+    return packed, max_tokens, report
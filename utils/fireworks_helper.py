@@ -1,6 +1,11 @@
 import os
-import json
-from typing import Iterable
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import AsyncIterator, Awaitable, Iterable
 
 # Load env vars from .env if present
 try:
@@ -9,6 +14,15 @@ try:
 except Exception:
     pass
 
+# Imported after .env is loaded: these read their settings at import time
+from utils.llm_cache import cache_key, cacheable_key, response_cache
+from utils.singleflight import SingleFlight, StreamGroup
+from utils.scheduler import QueueTimeout, current_observer, estimate_request_tokens, scheduler
+from utils.model_router import LLM_STALL_SECONDS, router
+from utils.metrics import CallMetrics, record_cache_hit, record_context_trim, registry
+from utils.context_packer import current_pack_observer, pack_prompt
+from utils.cancellation import Cancelled, current_cancel_token
+
 # Optional: read Streamlit secrets if available
 try:
     import streamlit as st
@@ -20,6 +34,10 @@ try:
     from fireworks.client import Fireworks
 except Exception:
     Fireworks = None
+try:
+    from fireworks.client import AsyncFireworks
+except Exception:
+    AsyncFireworks = None
 
 PREFERRED_MODEL = os.getenv("FIREWORKS_PREFERRED_MODEL", "accounts/fireworks/models/deepseek-v3p1")
 
@@ -31,6 +49,23 @@ SYSTEM_PROMPT = (
 
 client = None
 
+# Cache hits are replayed in small chunks so the UI still streams them
+LLM_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("LLM_CACHE_REPLAY_CHUNK_CHARS", "64"))
+LLM_CACHE_REPLAY_DELAY_MS = float(os.getenv("LLM_CACHE_REPLAY_DELAY_MS", "2"))
+
+# Concurrent identical requests share one upstream call (streams fan out to every caller)
+LLM_SINGLEFLIGHT = os.getenv("LLM_SINGLEFLIGHT", "1") not in {"0", "false", "False", ""}
+_inflight_calls = SingleFlight()
+_inflight_streams = StreamGroup()
+
+# Async API: one event loop thread shared by the process, one pooled async client bound to it,
+# and a global cap on concurrent upstream async calls
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+async_client = None
+_loop = None
+_loop_lock = threading.Lock()
+_async_slots = None
+
 
 def _get_api_key() -> str | None:
     """Find API key from env, .env, or Streamlit secrets."""
@@ -59,25 +94,369 @@ def _get_client():
     return client
 
 
-def _chat_completion(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None) -> str:
-    messages = [
+def _messages(prompt: str) -> list:
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": prompt},
     ]
+
+
+def _pack(model: str, prompt: str, max_tokens: int | None, mode: str | None) -> tuple[str, int | None]:
+    """Fit the prompt and max_tokens into the model's context; trims are counted and reported."""
+    prompt, max_tokens, report = pack_prompt(prompt, model, max_tokens, SYSTEM_PROMPT)
+    if report is not None:
+        record_context_trim(model, mode, report["dropped_tokens"])
+        observer = current_pack_observer()
+        if observer is not None:
+            observer(report)
+    return prompt, max_tokens
+
+
+def _fit(model: str, messages: list, max_tokens: int | None, mode: str | None) -> tuple[list, int | None]:
+    """Re-pack an already packed request for a fallback model with a smaller context."""
+    prompt, fitted, report = pack_prompt(messages[-1]["content"], model, max_tokens, SYSTEM_PROMPT)
+    if report is None:
+        return messages, max_tokens
+    record_context_trim(model, mode, report["dropped_tokens"])
+    return _messages(prompt), fitted
+
+
+def _chat_completion(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                     cache: bool = True) -> str:
+    """One completion (raises on failure); `cache=False` skips the response cache and singleflight."""
+    prompt, max_tokens = _pack(model, prompt, max_tokens, mode)
+    messages = _messages(prompt)
+    key = cacheable_key(model, messages, temperature, max_tokens) if cache else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record_cache_hit(model, mode, "complete")
+            return cached
+    observer = current_observer()
+    cancel = current_cancel_token()
+
+    def _call() -> str:
+        # Only the request that actually goes upstream waits for a scheduler slot
+        tokens = estimate_request_tokens(prompt, max_tokens)
+        text = _routed_completion(model, messages, temperature, max_tokens, mode, tokens, observer, cancel)
+        if key is not None and text:
+            response_cache.put(key, model, text)
+        return text
+
+    if not (LLM_SINGLEFLIGHT and cache):
+        return _call()
+    try:
+        return _inflight_calls.do(key or cache_key(model, messages, temperature, max_tokens), _call, cancel=cancel)
+    except Cancelled:
+        if cancel is not None and cancel.cancelled:
+            raise
+        # The coalesced caller that went upstream was cancelled, not this one: make the call ourselves
+        return _call()
+
+
+def _replay_chunks(text: str) -> Iterable[str]:
+    """Re-chunk a cached response at word boundaries."""
+    size = max(1, LLM_CACHE_REPLAY_CHUNK_CHARS)
+    pos = 0
+    while pos < len(text):
+        end = min(pos + size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", pos + 1, end)
+            if space != -1:
+                end = space + 1
+        yield text[pos:end]
+        pos = end
+
+
+def _replay(text: str) -> Iterable[str]:
+    """Replay a cached response in paced chunks so a cache hit still streams to the UI."""
+    delay = LLM_CACHE_REPLAY_DELAY_MS / 1000.0
+    for i, piece in enumerate(_replay_chunks(text)):
+        if delay and i:
+            time.sleep(delay)
+        yield piece
+
+
+def _stream_chat(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                 cache: bool = True) -> Iterable[str]:
+    """Stream text deltas for one request (raises on failure); serves and fills the response cache unless `cache=False`."""
+    prompt, max_tokens = _pack(model, prompt, max_tokens, mode)
+    messages = _messages(prompt)
+    key = cacheable_key(model, messages, temperature, max_tokens) if cache else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record_cache_hit(model, mode, "stream")
+            yield from _replay(cached)
+            return
+    # Captured here: the upstream may run on a singleflight pump thread
+    observer = current_observer()
+
+    def _upstream() -> Iterable[str]:
+        # This caller's token, or the shared flight's token (cancelled once every subscriber has left)
+        cancel = current_cancel_token()
+        tokens = estimate_request_tokens(prompt, max_tokens)
+        parts = []
+        for text in _routed_stream(model, messages, temperature, max_tokens, mode, tokens, observer, cancel):
+            parts.append(text)
+            yield text
+        # Only complete streams are cached: an abandoned generator never reaches this point and a
+        # cancelled one ends early
+        if key is not None and parts and not (cancel is not None and cancel.cancelled):
+            response_cache.put(key, model, "".join(parts))
+
+    if not (LLM_SINGLEFLIGHT and cache):
+        yield from _upstream()
+        return
+    key = key or cache_key(model, messages, temperature, max_tokens)
+    yield from _inflight_streams.stream(key, _upstream, cancel=current_cancel_token())
+
+
+# --- Routing: fallback models, stall failover and hedging ---------------------
+
+def _routed_completion(model: str, messages: list, temperature: float, max_tokens: int | None, mode: str | None, tokens: int, observer,
+                       cancel=None) -> str:
+    """Whole-response call on the first candidate model that succeeds.
+
+    With hedging on, the race runs on the shared loop, where the losing request can be cancelled.
+    """
+    candidates = router.candidates(model)
+    if len(candidates) > 1 and router.hedge_delay(candidates[0], streaming=False) is not None:
+        return run_async(_arouted_completion(candidates, messages, temperature, max_tokens, mode, tokens))
     c = _get_client()
-    resp = c.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    return resp.choices[0].message.content
+    last_error = None
+    for i, candidate in enumerate(candidates):
+        if i:
+            router.record_failover()
+        scheduler.acquire(mode or "", tokens, observer=observer, cancel=cancel)
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        started = time.monotonic()
+        request, limit = _fit(candidate, messages, max_tokens, mode)
+        call = CallMetrics(candidate, mode, "complete", request[-1]["content"], limit)
+        try:
+            resp = c.chat.completions.create(
+                model=candidate,
+                messages=request,
+                temperature=temperature,
+                max_tokens=limit,
+            )
+        except Exception as e:
+            call.fail(e)
+            router.record_error(candidate)
+            last_error = e
+            continue
+        router.record_success(candidate, time.monotonic() - started, streaming=False)
+        text = resp.choices[0].message.content
+        call.on_text(text or "")
+        call.finish(getattr(resp, "usage", None))
+        return text
+    raise last_error
+
+
+class _Attempt:
+    """One upstream stream in a routed request, drained by its own thread."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.stop = threading.Event()
+        self.stream = None
+        self.sent: float | None = None
+        self.metrics: CallMetrics | None = None
+
+    def cancel(self) -> None:
+        self.stop.set()
+        stream = self.stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+def _routed_stream(model: str, messages: list, temperature: float, max_tokens: int | None, mode: str | None, tokens: int, observer,
+                   cancel=None) -> Iterable[str]:
+    """Stream from whichever candidate model produces a first token.
+
+    Before the first token, an error or a stall longer than LLM_STALL_SECONDS moves on to the next
+    fallback model; with hedging on, the fallback is also started once the primary is slower than
+    its recent p95 time to first token. The first attempt to produce text wins and every other
+    attempt is closed. After that the winner is streamed as-is. Cancelling `cancel` ends the
+    stream right away and closes every upstream connection.
+    """
+    c = _get_client()
+    candidates = router.candidates(model)
+    remaining = list(candidates)
+    hedge_delay = router.hedge_delay(candidates[0], streaming=True)
+    events: queue.Queue = queue.Queue()
+    attempts: list[_Attempt] = []
+    live: set = set()
+
+    def _pump(a: _Attempt) -> None:
+        try:
+            scheduler.acquire(mode or "", tokens, observer=observer, cancel=cancel)
+            if a.stop.is_set():
+                return
+            request, limit = _fit(a.model, messages, max_tokens, mode)
+            a.metrics = CallMetrics(a.model, mode, "stream", request[-1]["content"], limit)
+            a.sent = time.monotonic()
+            # Wakes the router so stall and hedge deadlines start from the actual send time
+            events.put((a, "sent", None))
+            a.stream = c.chat.completions.create(
+                model=a.model,
+                messages=request,
+                temperature=temperature,
+                max_tokens=limit,
+                stream=True,
+            )
+            usage = None
+            for chunk in a.stream:
+                if a.stop.is_set():
+                    break
+                # Usage, when reported, arrives on the final chunk
+                usage = getattr(chunk, "usage", None) or usage
+                text = _yield_text_from_chunk(chunk)
+                if text:
+                    a.metrics.on_text(text)
+                    events.put((a, "text", text))
+            if a.stop.is_set():
+                a.metrics.fail(cancelled=True)
+                return
+            a.metrics.finish(usage)
+            events.put((a, "end", None))
+        except BaseException as e:
+            if a.metrics is not None:
+                a.metrics.fail(e, cancelled=a.stop.is_set())
+            events.put((a, "error", e))
+
+    def _start() -> None:
+        a = _Attempt(remaining.pop(0))
+        attempts.append(a)
+        live.add(a)
+        threading.Thread(target=_pump, args=(a,), name="llm-route", daemon=True).start()
+
+    winner = None
+    hedged = False
+    last_error: BaseException | None = None
+    # Wakes the loop below the moment the caller gives up, wherever the attempts are
+    unregister = cancel.on_cancel(lambda: events.put((None, "cancel", None))) if cancel is not None else None
+    _start()
+    try:
+        while True:
+            timeout = None
+            if winner is None and remaining:
+                now = time.monotonic()
+                deadlines = [a.sent + LLM_STALL_SECONDS for a in live if a.sent is not None]
+                primary = attempts[0]
+                if hedge_delay is not None and not hedged and primary in live and primary.sent is not None:
+                    deadlines.append(primary.sent + hedge_delay)
+                if deadlines:
+                    timeout = max(0.0, min(deadlines) - now)
+            try:
+                a, kind, payload = events.get(timeout=timeout)
+                if kind == "cancel" or (cancel is not None and cancel.cancelled):
+                    return
+            except queue.Empty:
+                now = time.monotonic()
+                for a in list(live):
+                    if a.sent is not None and now - a.sent >= LLM_STALL_SECONDS:
+                        last_error = TimeoutError(f"{a.model} produced no output for {LLM_STALL_SECONDS:.0f}s")
+                        a.metrics.fail(last_error)
+                        a.cancel()
+                        live.discard(a)
+                        router.record_error(a.model, stalled=True)
+                if (
+                    hedge_delay is not None and not hedged and remaining and attempts[0] in live
+                    and attempts[0].sent is not None and now - attempts[0].sent >= hedge_delay
+                ):
+                    hedged = True
+                    router.record_hedge()
+                    _start()
+                if not live:
+                    if not remaining:
+                        raise last_error
+                    router.record_failover()
+                    _start()
+                continue
+            if a not in live or kind == "sent":
+                continue
+            if kind == "text":
+                if winner is None:
+                    winner = a
+                    router.record_success(a.model, time.monotonic() - a.sent, streaming=True)
+                    if hedged and a is not attempts[0]:
+                        router.record_hedge(won=True)
+                    for other in live - {a}:
+                        other.cancel()
+                    live.intersection_update({a})
+                yield payload
+            elif kind == "end":
+                if winner is None:
+                    router.record_success(a.model, time.monotonic() - a.sent, streaming=True)
+                return
+            else:
+                live.discard(a)
+                if winner is not None or isinstance(payload, QueueTimeout):
+                    raise payload
+                router.record_error(a.model)
+                last_error = payload
+                if not live:
+                    if not remaining:
+                        raise last_error
+                    router.record_failover()
+                    _start()
+    finally:
+        if unregister is not None:
+            unregister()
+        for a in attempts:
+            a.cancel()
+
+
+def router_stats() -> dict:
+    """Per-model rolling health plus failover and hedge counters."""
+    return router.stats()
+
+
+def _collect_gauges() -> list[str]:
+    """Point-in-time scheduler, router and coalescing numbers for the metrics exporters."""
+    queue_stats = scheduler.stats()
+    routing = router.stats()
+    flights = singleflight_stats()
+    lines = [
+        "# TYPE braindrain_llm_queue_waiting gauge",
+        *[f'braindrain_llm_queue_waiting{{mode="{m}"}} {n}' for m, n in sorted(queue_stats["waiting"].items())],
+        "# TYPE braindrain_llm_queue_admitted_total counter",
+        f"braindrain_llm_queue_admitted_total {queue_stats['admitted']}",
+        "# TYPE braindrain_llm_queue_timeouts_total counter",
+        f"braindrain_llm_queue_timeouts_total {queue_stats['timeouts']}",
+        "# TYPE braindrain_llm_failovers_total counter",
+        f"braindrain_llm_failovers_total {routing['failovers']}",
+        "# TYPE braindrain_llm_hedges_total counter",
+        f"braindrain_llm_hedges_total {routing['hedges']}",
+        "# TYPE braindrain_llm_hedge_wins_total counter",
+        f"braindrain_llm_hedge_wins_total {routing['hedge_wins']}",
+        "# TYPE braindrain_llm_coalesced_total counter",
+    ]
+    for kind, counts in flights.items():
+        lines.append(f'braindrain_llm_coalesced_total{{kind="{kind}"}} {counts["coalesced"]}')
+    return lines
+
 
+registry.add_collector(_collect_gauges)
 
-def generate_response(prompt: str, temperature: float = 0.7, max_tokens: int | None = None) -> str:
+
+def singleflight_stats() -> dict:
+    """Upstream calls started vs. requests that joined an identical in-flight call."""
+    return {
+        "calls": {"upstream": _inflight_calls.leaders, "coalesced": _inflight_calls.coalesced},
+        "streams": {"upstream": _inflight_streams.leaders, "coalesced": _inflight_streams.coalesced},
+    }
+
+
+def generate_response(prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None) -> str:
     """Generate response using the default preferred model."""
     try:
-        return _chat_completion(PREFERRED_MODEL, prompt, temperature=temperature, max_tokens=max_tokens)
+        return _chat_completion(PREFERRED_MODEL, prompt, temperature=temperature, max_tokens=max_tokens, mode=mode)
     except Exception as e:
         return f"❌ AI unavailable: {e}"
 
@@ -105,52 +484,330 @@ def _yield_text_from_chunk(chunk) -> str | None:
         return None
 
 
-def stream_response(prompt: str, temperature: float = 0.7, max_tokens: int | None = None) -> Iterable[str]:
+def stream_response(prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None) -> Iterable[str]:
     """Stream response using the default preferred model (v2-style streaming)."""
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": prompt},
-    ]
     try:
-        c = _get_client()
-        # Use v2 streaming: create(..., stream=True) and iterate chunks
-        for chunk in c.chat.completions.create(
-            model=PREFERRED_MODEL,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stream=True,
-        ):
-            text = _yield_text_from_chunk(chunk)
-            if text:
-                yield text
+        yield from _stream_chat(PREFERRED_MODEL, prompt, temperature=temperature, max_tokens=max_tokens, mode=mode)
     except Exception as e:
         yield f"❌ AI streaming unavailable: {e}"
 
 
-def generate_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None) -> str:
+def generate_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                                 cache: bool = True) -> str:
     try:
-        return _chat_completion(model, prompt, temperature=temperature, max_tokens=max_tokens)
+        return _chat_completion(model, prompt, temperature=temperature, max_tokens=max_tokens, mode=mode, cache=cache)
     except Exception as e:
         return f"❌ AI unavailable: {e}"
 
 
-def stream_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None) -> Iterable[str]:
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": prompt},
-    ]
+def stream_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                               cache: bool = True) -> Iterable[str]:
+    try:
+        yield from _stream_chat(model, prompt, temperature=temperature, max_tokens=max_tokens, mode=mode, cache=cache)
+    except Exception as e:
+        yield f"❌ AI streaming unavailable: {e}"
+
+
+# --- Async API ------------------------------------------------------------------
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start (once) and return the shared event loop running on a daemon thread."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-async-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def _in_context(ctx: contextvars.Context, coro: Awaitable):
+    # Carry the submitter's context variables (e.g. the queue observer) into the loop's task
+    for var, value in ctx.items():
+        var.set(value)
+    return await coro
+
+
+def submit_async(coro: Awaitable) -> Future:
+    """Schedule a coroutine on the shared loop from any thread; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), _get_loop())
+
+
+def run_async(coro: Awaitable):
+    """Run a coroutine on the shared loop and block the calling (non-loop) thread for its result.
+
+    Cancelling the caller's cancel token cancels the coroutine, closing its in-flight requests.
+    """
+    future = submit_async(coro)
+    cancel = current_cancel_token()
+    unregister = cancel.on_cancel(future.cancel) if cancel is not None else None
+    try:
+        return future.result()
+    except CancelledError:
+        raise Cancelled("Request cancelled.") from None
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+def _get_async_client():
+    """Lazily create the async client. Must be called on the shared loop, which owns its connection pool."""
+    global async_client
+    if async_client is not None:
+        return async_client
+    if AsyncFireworks is None:
+        raise RuntimeError("Fireworks async client not available. Please install/upgrade 'fireworks-ai'.")
+    api_key = _get_api_key()
+    if not api_key:
+        raise RuntimeError(
+            "FIREWORKS_API_KEY not configured. Add it to your .env or Streamlit secrets."
+        )
+    async_client = AsyncFireworks(api_key=api_key)
+    return async_client
+
+
+def _slots() -> asyncio.Semaphore:
+    global _async_slots
+    if _async_slots is None:
+        _async_slots = asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY))
+    return _async_slots
+
+
+async def _on_shared_loop(coro):
+    """Await `coro` on the shared loop, hopping over from a foreign loop when needed."""
+    if asyncio.get_running_loop() is _get_loop():
+        return await coro
+    return await asyncio.wrap_future(submit_async(coro))
+
+
+async def _arouted_completion(candidates: list[str], messages: list, temperature: float, max_tokens: int | None, mode: str | None, tokens: int) -> str:
+    """Whole-response call with failover; with hedging on, the next candidate is started once the
+    primary is slower than its p95 latency and whichever finishes first wins (the other is cancelled)."""
+    remaining = list(candidates)
+    hedge_delay = router.hedge_delay(candidates[0], streaming=False) if len(candidates) > 1 else None
+    pending: dict = {}
+    primary_sent = asyncio.Event()
+
+    async def _attempt(candidate: str) -> tuple[float, str]:
+        await scheduler.aacquire(mode or "", tokens)
+        async with _slots():
+            started = time.monotonic()
+            if candidate == candidates[0]:
+                primary_sent.set()
+            request, limit = _fit(candidate, messages, max_tokens, mode)
+            call = CallMetrics(candidate, mode, "complete", request[-1]["content"], limit)
+            try:
+                resp = await _get_async_client().chat.completions.create(
+                    model=candidate,
+                    messages=request,
+                    temperature=temperature,
+                    max_tokens=limit,
+                )
+            except asyncio.CancelledError:
+                call.fail(cancelled=True)
+                raise
+            except Exception as e:
+                call.fail(e)
+                raise
+        text = resp.choices[0].message.content
+        call.on_text(text or "")
+        call.finish(getattr(resp, "usage", None))
+        return time.monotonic() - started, text
+
+    def _start() -> None:
+        candidate = remaining.pop(0)
+        pending[asyncio.ensure_future(_attempt(candidate))] = candidate
+
+    async def _hedge_timer() -> None:
+        # Counted from the primary's send time, so time spent queued never triggers a hedge
+        await primary_sent.wait()
+        await asyncio.sleep(hedge_delay)
+
+    timer = asyncio.ensure_future(_hedge_timer()) if hedge_delay is not None else None
+    hedged = False
+    last_error: BaseException | None = None
+    _start()
+    try:
+        while pending:
+            waiting = set(pending)
+            if timer is not None and not hedged:
+                waiting.add(timer)
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if timer in done:
+                done.discard(timer)
+                hedged = True
+                if remaining and len(pending) == 1:
+                    router.record_hedge()
+                    _start()
+            for task in done:
+                candidate = pending.pop(task)
+                try:
+                    seconds, text = task.result()
+                except QueueTimeout:
+                    raise
+                except Exception as e:
+                    router.record_error(candidate)
+                    last_error = e
+                    continue
+                router.record_success(candidate, seconds, streaming=False)
+                if hedged and candidate != candidates[0]:
+                    router.record_hedge(won=True)
+                return text
+            if not pending and remaining:
+                router.record_failover()
+                _start()
+        raise last_error
+    finally:
+        if timer is not None:
+            timer.cancel()
+        for task in pending:
+            task.cancel()
+
+
+async def _afirst_text(chunks) -> str:
+    """First non-empty text delta of an async stream ("" when the stream ends without text)."""
+    async for chunk in chunks:
+        text = _yield_text_from_chunk(chunk)
+        if text:
+            return text
+    return ""
+
+
+async def _achat_completion(model: str, prompt: str, temperature: float, max_tokens: int | None, mode: str | None,
+                            cache: bool = True) -> str:
+    prompt, max_tokens = _pack(model, prompt, max_tokens, mode)
+    messages = _messages(prompt)
+    key = cacheable_key(model, messages, temperature, max_tokens) if cache else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record_cache_hit(model, mode, "complete")
+            return cached
+    tokens = estimate_request_tokens(prompt, max_tokens)
+    text = await _arouted_completion(router.candidates(model), messages, temperature, max_tokens, mode, tokens)
+    if key is not None and text:
+        response_cache.put(key, model, text)
+    return text
+
+
+async def _astream_chat(model: str, prompt: str, temperature: float, max_tokens: int | None, mode: str | None,
+                        cache: bool = True) -> AsyncIterator[str]:
+    prompt, max_tokens = _pack(model, prompt, max_tokens, mode)
+    messages = _messages(prompt)
+    key = cacheable_key(model, messages, temperature, max_tokens) if cache else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record_cache_hit(model, mode, "stream")
+            for piece in _replay_chunks(cached):
+                yield piece
+                await asyncio.sleep(LLM_CACHE_REPLAY_DELAY_MS / 1000.0)
+            return
+    tokens = estimate_request_tokens(prompt, max_tokens)
+    candidates = router.candidates(model)
+    cancel = current_cancel_token()
+    parts = []
+    for i, candidate in enumerate(candidates):
+        if i:
+            router.record_failover()
+        await scheduler.aacquire(mode or "", tokens)
+        async with _slots():
+            started = time.monotonic()
+            request, limit = _fit(candidate, messages, max_tokens, mode)
+            call = CallMetrics(candidate, mode, "stream", request[-1]["content"], limit)
+            stream = None
+            try:
+                stream = await _get_async_client().chat.completions.create(
+                    model=candidate,
+                    messages=request,
+                    temperature=temperature,
+                    max_tokens=limit,
+                    stream=True,
+                )
+                chunks = stream.__aiter__()
+                # Fail over before the first token only; once text has been yielded the stream is committed
+                last = i == len(candidates) - 1
+                first = await asyncio.wait_for(_afirst_text(chunks), None if last else LLM_STALL_SECONDS)
+            except Exception as e:
+                if stream is not None:
+                    await stream.close()
+                call.fail(e)
+                router.record_error(candidate, stalled=isinstance(e, asyncio.TimeoutError))
+                if i == len(candidates) - 1:
+                    raise
+                continue
+            router.record_success(candidate, time.monotonic() - started, streaming=True)
+            usage = None
+            try:
+                if first:
+                    call.on_text(first)
+                    parts.append(first)
+                    yield first
+                async for chunk in chunks:
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    usage = getattr(chunk, "usage", None) or usage
+                    text = _yield_text_from_chunk(chunk)
+                    if text:
+                        call.on_text(text)
+                        parts.append(text)
+                        yield text
+                if cancel is None or not cancel.cancelled:
+                    call.finish(usage)
+            except Exception as e:
+                call.fail(e)
+                raise
+            finally:
+                # Stopped early by the consumer: counted as cancelled (no-op when already finished)
+                call.fail(cancelled=True)
+                # Release the pooled connection even when the consumer stops early
+                await stream.close()
+        break
+    if key is not None and parts and not (cancel is not None and cancel.cancelled):
+        response_cache.put(key, model, "".join(parts))
+
+
+async def agenerate_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                                        cache: bool = True) -> str:
+    """Async counterpart of generate_response_with_model; usable from any event loop."""
     try:
-        c = _get_client()
-        for chunk in c.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stream=True,
-        ):
-            text = _yield_text_from_chunk(chunk)
-            if text:
+        return await _on_shared_loop(_achat_completion(model, prompt, temperature, max_tokens, mode, cache))
+    except Exception as e:
+        return f"❌ AI unavailable: {e}"
+
+
+async def astream_response_with_model(model: str, prompt: str, temperature: float = 0.7, max_tokens: int | None = None, mode: str | None = None,
+                                      cache: bool = True) -> AsyncIterator[str]:
+    """Async counterpart of stream_response_with_model; usable from any event loop."""
+    try:
+        if asyncio.get_running_loop() is _get_loop():
+            async for text in _astream_chat(model, prompt, temperature, max_tokens, mode, cache):
                 yield text
+            return
+        # Foreign loop: drive the stream on the shared loop and hand chunks across
+        caller = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        end = object()
+
+        async def _produce():
+            try:
+                async for text in _astream_chat(model, prompt, temperature, max_tokens, mode, cache):
+                    caller.call_soon_threadsafe(chunks.put_nowait, text)
+            except BaseException as e:
+                caller.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                caller.call_soon_threadsafe(chunks.put_nowait, end)
+
+        producer = submit_async(_produce())
+        try:
+            while True:
+                item = await chunks.get()
+                if item is end:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
     except Exception as e:
         yield f"❌ AI streaming unavailable: {e}"
@@ -0,0 +1,293 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+from utils.cancellation import CancelToken, cancel_scope
+from utils.metrics import registry
+
+# Background jobs: long generations run here instead of in the Streamlit script, so reruns,
+# mode switches and reconnects do not abort them
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "16"))
+# Partial output is written here while a job runs (empty = memory only)
+JOBS_DIR = os.getenv("JOBS_DIR", ".cache/jobs")
+JOBS_PERSIST_SECONDS = float(os.getenv("JOBS_PERSIST_SECONDS", "2"))
+# Finished jobs stay reattachable this long
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "3600"))
+
+FINAL_STATES = {"done", "error", "cancelled", "interrupted"}
+
+
+class Job:
+    """One background generation: the items its producer yielded so far, and its status.
+
+    Status goes queued -> running -> done | error | cancelled. A job loaded from disk that was
+    still running when its process stopped is "interrupted" and keeps its partial output.
+    """
+
+    def __init__(self, kind: str, meta: dict | None = None, job_id: str | None = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.meta = dict(meta or {})
+        self.items: list = []
+        self.status = "queued"
+        self.error: str | None = None
+        self.created = self.updated = time.time()
+        # LLM calls made by the producer run under this token, so cancelling closes their streams at once
+        self.token = CancelToken()
+        self._cond = threading.Condition()
+        self._callbacks: list[Callable[["Job"], None]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self.token.cancelled
+
+    @property
+    def text(self) -> str:
+        """Text jobs: everything streamed so far."""
+        return "".join(item for item in self.items if isinstance(item, str))
+
+    def cancel(self) -> None:
+        """Stop the job: its upstream LLM streams are closed right away and its producer after that."""
+        self.token.cancel()
+
+    def _append(self, item) -> None:
+        with self._cond:
+            self.items.append(item)
+            self.updated = time.time()
+            self._cond.notify_all()
+
+    def _finish(self, status: str, error: str | None = None) -> None:
+        with self._cond:
+            self.status = status
+            self.error = error
+            self.updated = time.time()
+            self._cond.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                pass
+
+    def add_done_callback(self, fn: Callable[["Job"], None]) -> None:
+        """Call `fn(job)` once the job finishes (immediately when it already has)."""
+        with self._cond:
+            if not self.done:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def follow(self, start: int = 0, poll_seconds: float = 0.5) -> Iterator:
+        """Yield the job's items from `start` on, waiting for new ones until the job finishes.
+
+        Text jobs yield what was already streamed as one chunk first, so a reattached view
+        catches up in a single draw.
+        """
+        pos = start
+        while True:
+            with self._cond:
+                while pos >= len(self.items) and not self.done:
+                    self._cond.wait(poll_seconds)
+                new = self.items[pos:]
+                finished = self.done
+            pos += len(new)
+            if new and all(isinstance(item, str) for item in new):
+                yield "".join(new)
+            else:
+                yield from new
+            if finished and pos >= len(self.items):
+                return
+
+    def wait(self, timeout: float | None = None, items: int | None = None) -> bool:
+        """Wait until the job finishes (or, with `items`, has that many items); False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done or (items is not None and len(self.items) >= items), timeout)
+
+    def to_dict(self) -> dict:
+        with self._cond:
+            items = list(self.items)
+        if items and all(isinstance(item, str) for item in items):
+            items = ["".join(items)]
+        return {
+            "id": self.id, "kind": self.kind, "meta": self.meta, "status": self.status, "error": self.error,
+            "items": items, "created": self.created, "updated": self.updated,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        job = cls(data.get("kind", ""), data.get("meta"), data.get("id"))
+        job.items = list(data.get("items") or [])
+        job.status = data.get("status", "interrupted")
+        job.error = data.get("error")
+        job.created = data.get("created", job.created)
+        job.updated = data.get("updated", job.updated)
+        if not job.done:
+            # Its process stopped mid-generation: only the persisted partial output is left
+            job.status = "interrupted"
+        return job
+
+
+class JobRunner:
+    """Runs producers (callables returning an iterable of items) on a thread pool, with a registry
+    of jobs by id. Partial output is written to `directory` every `persist_seconds`, so a job can
+    still be shown after a server restart.
+    """
+
+    def __init__(self, workers: int = JOBS_WORKERS, directory: str = JOBS_DIR,
+                 persist_seconds: float = JOBS_PERSIST_SECONDS, ttl: float = JOBS_TTL_SECONDS):
+        self.workers = max(1, workers)
+        self.directory = directory
+        self.persist_seconds = persist_seconds
+        self.ttl = ttl
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self._submitted = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            return self._pool
+
+    # --- Persistence ---
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _persist(self, job: Job) -> None:
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(job.id)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(job.to_dict(), fh, ensure_ascii=False)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            # Unwritable directory or unserializable items: the job still runs, memory-only
+            pass
+
+    def _load(self, job_id: str) -> Job | None:
+        if not self.directory or not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id), encoding="utf-8") as fh:
+                return Job.from_dict(json.load(fh))
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self, now: float) -> None:
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items() if job.done and now - job.updated > self.ttl]
+            for job_id in stale:
+                del self._jobs[job_id]
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # --- Public API ---
+
+    def submit(self, kind: str, producer: Callable[[], Iterable], meta: dict | None = None,
+               context: contextvars.Context | None = None) -> Job:
+        """Start `producer()` in the background and return its Job right away.
+
+        `context` (e.g. contextvars.copy_context()) lets the producer report queue position and
+        context packing to whoever set those observers.
+        """
+        job = Job(kind, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._submitted += 1
+            prune = self._submitted % 32 == 1
+        if prune:
+            self._prune(time.time())
+        run = context.run if context is not None else (lambda fn, *args: fn(*args))
+        self._get_pool().submit(run, self._run, job, producer)
+        return job
+
+    def _run(self, job: Job, producer: Callable[[], Iterable]) -> None:
+        if job.cancel_requested:
+            job._finish("cancelled")
+            self._persist(job)
+            return
+        job.status = "running"
+        self._persist(job)
+        persisted = time.monotonic()
+        items = None
+        status, error = "done", None
+        try:
+            with cancel_scope(job.token):
+                items = iter(producer())
+                for item in items:
+                    if job.cancel_requested:
+                        break
+                    job._append(item)
+                    if time.monotonic() - persisted >= self.persist_seconds:
+                        self._persist(job)
+                        persisted = time.monotonic()
+            if job.cancel_requested:
+                status = "cancelled"
+        except Exception as e:
+            status, error = ("cancelled", None) if job.cancel_requested else ("error", str(e))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            job._finish(status, error)
+            self._persist(job)
+
+    def get(self, job_id: str | None) -> Job | None:
+        """A job by id: a live one, or the persisted record of one from an earlier process."""
+        if not job_id:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        job = self._load(job_id)
+        if job is not None:
+            with self._lock:
+                job = self._jobs.setdefault(job_id, job)
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: dict[str, dict[str, int]] = {}
+        for job in jobs:
+            by_status = counts.setdefault(job.kind, {})
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return counts
+
+
+jobs = JobRunner()
+
+
+def _collect_jobs() -> list[str]:
+    lines = ["# TYPE braindrain_jobs gauge"]
+    for kind, by_status in sorted(jobs.stats().items()):
+        lines += [f'braindrain_jobs{{kind="{kind}",status="{status}"}} {n}' for status, n in sorted(by_status.items())]
+    return lines
+
+
+registry.add_collector(_collect_jobs)
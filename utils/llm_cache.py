@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Response cache settings
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in {"0", "false", "False", ""}
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+# SQLite tier; set to an empty string for memory-only caching
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", ".cache/llm_cache.sqlite3")
+LLM_CACHE_DISK_MAX_MB = float(os.getenv("LLM_CACHE_DISK_MAX_MB", "256"))
+# Calls sampled above this temperature are meant to vary, so they bypass the cache
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.5"))
+
+
+def cache_key(model: str, messages: list, temperature: float, max_tokens: int | None) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Completed model responses keyed by request: an in-memory LRU in front of a SQLite table.
+
+    Entries expire after `ttl` seconds in both tiers. The memory tier holds at most `max_entries`
+    responses; the SQLite tier is trimmed least-recently-used first once it exceeds `disk_max_bytes`.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, db_path: str = "", disk_max_bytes: int = 0):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.db_path = db_path
+        self.disk_max_bytes = disk_max_bytes
+        self._mem: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+    # --- SQLite tier ---
+
+    def _conn(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER,"
+                    " created REAL, expires REAL, accessed REAL)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+                db.commit()
+                self._db = db
+            except sqlite3.Error:
+                # Unwritable location: run memory-only rather than failing requests
+                self.db_path = ""
+                return None
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> tuple[float, str] | None:
+        with self._db_lock:
+            db = self._conn()
+            if db is None:
+                return None
+            try:
+                row = db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+                    return None
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+                return row[1], row[0]
+            except sqlite3.Error:
+                return None
+
+    def _disk_put(self, key: str, model: str, value: str, now: float, expires: float) -> None:
+        with self._db_lock:
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, value, size, created, expires, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, value, len(value.encode("utf-8")), now, expires, now),
+                )
+                self._writes += 1
+                # Amortize eviction: expired rows and size trimming every 32 writes
+                if self._writes % 32 == 1:
+                    self._evict_disk(db, now)
+                db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _evict_disk(self, db, now: float) -> None:
+        db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        if self.disk_max_bytes <= 0:
+            return
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        excess = total - self.disk_max_bytes
+        freed = 0
+        stale = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    # --- Public API ---
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    return entry[1]
+                del self._mem[key]
+        entry = self._disk_get(key, now)
+        if entry is None:
+            return None
+        self._remember(key, entry)
+        return entry[1]
+
+    def put(self, key: str, model: str, value: str) -> None:
+        if not value:
+            return
+        now = time.time()
+        expires = now + self.ttl
+        self._remember(key, (expires, value))
+        self._disk_put(key, model, value, now, expires)
+
+    def _remember(self, key: str, entry: tuple[float, str]) -> None:
+        with self._lock:
+            self._mem[key] = entry
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        with self._db_lock:
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+
+response_cache = ResponseCache(
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_DB,
+    int(LLM_CACHE_DISK_MAX_MB * 1024 * 1024),
+)
+
+
+def cacheable_key(model: str, messages: list, temperature: float, max_tokens: int | None) -> str | None:
+    """Cache key for a request, or None when caching is disabled or the call opts out (high temperature)."""
+    if not LLM_CACHE_ENABLED or temperature is None or temperature > LLM_CACHE_MAX_TEMPERATURE:
+        return None
+    return cache_key(model, messages, temperature, max_tokens)
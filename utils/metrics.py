@@ -0,0 +1,312 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Export settings: an HTTP /metrics endpoint, a periodically rewritten file, or both
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in {"0", "false", "False", ""}
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL_SECONDS = float(os.getenv("METRICS_FILE_INTERVAL_SECONDS", "15"))
+
+PREFIX = "braindrain_"
+
+logger = logging.getLogger(__name__)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120)
+GAP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), then sum
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _num(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {running}")
+        return lines
+
+
+class Registry:
+    """Holds the metrics plus collectors that render point-in-time gauges from other modules' stats."""
+
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: list[Callable[[], list[str]]] = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], list[str]]) -> None:
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for fn in self.collectors:
+            try:
+                lines += fn()
+            except Exception:
+                pass
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_CALL = ("model", "mode", "kind")
+_MODEL_MODE = ("model", "mode")
+requests_total = registry.add(Counter("llm_requests_total", "LLM calls by outcome (ok, error, cancelled, cached).", _CALL + ("outcome",)))
+errors_total = registry.add(Counter("llm_errors_total", "Failed LLM calls by exception type.", _MODEL_MODE + ("error",)))
+ttft_seconds = registry.add(Histogram("llm_ttft_seconds", "Time from sending a streaming request to its first text.", _MODEL_MODE))
+inter_token_seconds = registry.add(Histogram("llm_inter_token_seconds", "Gap between consecutive streamed text chunks.", _MODEL_MODE, GAP_BUCKETS))
+duration_seconds = registry.add(Histogram("llm_duration_seconds", "Total time of a completed LLM call.", _CALL))
+tokens_per_second = registry.add(Histogram("llm_output_tokens_per_second", "Generation speed (after the first token for streams).", _MODEL_MODE, RATE_BUCKETS))
+output_tokens = registry.add(Histogram("llm_output_tokens", "Completion tokens per call.", _MODEL_MODE, TOKEN_BUCKETS))
+tokens_total = registry.add(Counter("llm_tokens_total", "Tokens used, from API usage when reported and estimated otherwise.", _MODEL_MODE + ("type",)))
+tokens_saved = registry.add(Counter("llm_tokens_saved_total", "Estimated completion tokens not generated because a call was cancelled (max_tokens minus output so far).", _MODEL_MODE))
+# Assumed completion budget of calls made without max_tokens (matches the scheduler's estimate)
+DEFAULT_MAX_TOKENS = 1024
+
+
+def _usage_value(usage, name: str) -> int | None:
+    if usage is None:
+        return None
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value) if isinstance(value, (int, float)) else None
+
+
+class CallMetrics:
+    """Timing for one upstream call; feed it each text delta, then finish() or fail() exactly once."""
+
+    def __init__(self, model: str, mode: str | None, kind: str, prompt: str = "", max_tokens: int | None = None):
+        self.model = model
+        self.mode = mode or "other"
+        self.kind = kind
+        self.prompt_chars = len(prompt)
+        self.max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+        self.started = time.monotonic()
+        self.first: float | None = None
+        self.last: float | None = None
+        self.chars = 0
+        self.done = False
+        self._lock = threading.Lock()
+
+    def _close(self) -> bool:
+        """Mark the call finished; False when it already was (the router and a pump thread may race)."""
+        with self._lock:
+            if self.done:
+                return False
+            self.done = True
+            return True
+
+    def on_text(self, text: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        now = time.monotonic()
+        if self.first is None:
+            self.first = now
+            if self.kind == "stream":
+                ttft_seconds.observe(now - self.started, self.model, self.mode)
+        else:
+            inter_token_seconds.observe(now - self.last, self.model, self.mode)
+        self.last = now
+        self.chars += len(text)
+
+    def finish(self, usage=None) -> None:
+        if not METRICS_ENABLED or not self._close():
+            return
+        now = time.monotonic()
+        completion = _usage_value(usage, "completion_tokens")
+        if completion is None:
+            completion = self.chars // 4
+        prompt = _usage_value(usage, "prompt_tokens")
+        if prompt is None:
+            prompt = self.prompt_chars // 4
+        requests_total.inc(self.model, self.mode, self.kind, "ok")
+        duration_seconds.observe(now - self.started, self.model, self.mode, self.kind)
+        output_tokens.observe(completion, self.model, self.mode)
+        tokens_total.inc(self.model, self.mode, "completion", amount=completion)
+        tokens_total.inc(self.model, self.mode, "prompt", amount=prompt)
+        # Streams: decode speed after the first token; whole responses: overall speed
+        elapsed = (self.last - self.first) if self.kind == "stream" and self.first is not None else now - self.started
+        if completion > 1 and elapsed > 0:
+            tokens_per_second.observe(completion / elapsed, self.model, self.mode)
+
+    def fail(self, error: BaseException | None = None, cancelled: bool = False) -> None:
+        if not METRICS_ENABLED or not self._close():
+            return
+        requests_total.inc(self.model, self.mode, self.kind, "cancelled" if cancelled else "error")
+        if cancelled:
+            tokens_saved.inc(self.model, self.mode, amount=max(0, self.max_tokens - self.chars // 4))
+        else:
+            errors_total.inc(self.model, self.mode, type(error).__name__ if error is not None else "Error")
+
+
+def record_cache_hit(model: str, mode: str | None, kind: str) -> None:
+    if METRICS_ENABLED:
+        requests_total.inc(model, mode or "other", kind, "cached")
+
+
+context_trimmed_total = registry.add(Counter("llm_context_trimmed_total", "Requests whose input was trimmed to fit the model's context.", _MODEL_MODE))
+context_dropped_tokens = registry.add(Counter("llm_context_dropped_tokens_total", "Estimated input tokens dropped by context packing.", _MODEL_MODE))
+
+
+def record_context_trim(model: str, mode: str | None, dropped_tokens: int) -> None:
+    if METRICS_ENABLED:
+        context_trimmed_total.inc(model, mode or "other")
+        context_dropped_tokens.inc(model, mode or "other", amount=dropped_tokens)
+
+
+quiz_bank_requests = registry.add(Counter("quiz_bank_requests_total", "Quiz requests served from the question bank (hit) or generated (miss).", ("outcome",)))
+quiz_bank_added = registry.add(Counter("quiz_bank_questions_added_total", "New questions stored in the question bank, by source (request, topup).", ("source",)))
+
+
+def record_quiz_bank(outcome: str) -> None:
+    if METRICS_ENABLED:
+        quiz_bank_requests.inc(outcome)
+
+
+def record_quiz_bank_added(source: str, count: int) -> None:
+    if METRICS_ENABLED and count:
+        quiz_bank_added.inc(source, amount=count)
+
+
+ui_stream_bytes = registry.add(Counter("ui_stream_bytes_total", "Characters of streamed responses sent to the browser (sent) versus redrawing per chunk (unthrottled).", ("mode", "kind")))
+ui_stream_flushes = registry.add(Counter("ui_stream_flushes_total", "Redraws of streaming chat responses.", ("mode",)))
+ui_stream_render_seconds = registry.add(Histogram("ui_stream_render_seconds", "Script-thread CPU spent redrawing one streamed response.", ("mode",), GAP_BUCKETS))
+
+
+def record_stream_render(mode: str | None, sent: int, unthrottled: int, flushes: int, cpu_seconds: float) -> None:
+    if not METRICS_ENABLED:
+        return
+    mode = mode or "other"
+    ui_stream_bytes.inc(mode, "sent", amount=sent)
+    ui_stream_bytes.inc(mode, "unthrottled", amount=unthrottled)
+    ui_stream_flushes.inc(mode, amount=flushes)
+    ui_stream_render_seconds.observe(cpu_seconds, mode)
+
+
+# --- Exporters --------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in {"/metrics", "/"}:
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_metrics_file(path: str) -> None:
+    """Write the current metrics to `path` atomically (for node-exporter textfile style scraping)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(registry.render())
+    os.replace(tmp, path)
+
+
+def _file_writer(path: str) -> None:
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError:
+            pass
+        time.sleep(max(1.0, METRICS_FILE_INTERVAL_SECONDS))
+
+
+_started = False
+_start_lock = threading.Lock()
+metrics_server = None
+
+
+def start_exporters() -> None:
+    """Start the configured exporters once per process (safe to call on every Streamlit rerun).
+
+    Called by the Streamlit entry point only: importing the helpers (benchmarks, the headless API,
+    which serves /metrics on its own port) never opens a listener.
+    """
+    global _started, metrics_server
+    with _start_lock:
+        if _started or not METRICS_ENABLED:
+            return
+        _started = True
+        if METRICS_PORT:
+            try:
+                metrics_server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _Handler)
+                metrics_server.daemon_threads = True
+                threading.Thread(target=metrics_server.serve_forever, name="metrics-http", daemon=True).start()
+            except OSError as e:
+                logger.warning("could not serve metrics on port %s: %s", METRICS_PORT, e)
+        if METRICS_FILE:
+            threading.Thread(target=_file_writer, args=(METRICS_FILE,), name="metrics-file", daemon=True).start()
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import deque
+
+# Per-model health tracking and fallback routing
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "1") not in {"0", "false", "False", ""}
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "100"))
+# A model whose recent error rate is above this is tried after its healthy fallbacks
+LLM_ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5"))
+# A stream that has not produced its first token after this long is abandoned for the next model
+LLM_STALL_SECONDS = float(os.getenv("LLM_STALL_SECONDS", "30"))
+# Hedging: start a second request on the fallback model once the primary is slower than its p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") not in {"0", "false", "False", ""}
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "1.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+_MODELS = "accounts/fireworks/models/"
+DEFAULT_FALLBACKS = {
+    _MODELS + "qwen3-8b": [_MODELS + "deepseek-v3p1"],
+    _MODELS + "mixtral-8x22b-instruct": [_MODELS + "deepseek-v3p1"],
+    _MODELS + "deepseek-v3p1": [_MODELS + "mixtral-8x22b-instruct"],
+}
+
+
+def _parse_fallbacks(spec: str) -> dict:
+    """Parse "model=fallback1|fallback2,model2=fallback" into a fallback map."""
+    out = {}
+    for entry in spec.split(","):
+        model, _, chain = entry.partition("=")
+        model = model.strip()
+        if model:
+            out[model] = [m.strip() for m in chain.split("|") if m.strip()]
+    return out
+
+
+LLM_FALLBACKS = {**DEFAULT_FALLBACKS, **_parse_fallbacks(os.getenv("LLM_FALLBACKS", ""))}
+
+
+def _p95(values) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class ModelStats:
+    """Rolling window of one model's outcomes: time to first token (streams), latency (whole responses), errors."""
+
+    def __init__(self, window: int):
+        self.ttft: deque = deque(maxlen=window)
+        self.latency: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.stalls = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "stalls": self.stalls,
+            "error_rate": round(self.error_rate(), 3),
+            "p95_ttft": _p95(self.ttft),
+            "p95_latency": _p95(self.latency),
+        }
+
+
+class ModelRouter:
+    """Orders candidate models by health and decides when to fail over or hedge.
+
+    The helper that owns the HTTP calls reports every attempt here; the router itself never
+    talks to the API.
+    """
+
+    def __init__(self, fallbacks: dict, window: int = LLM_ROUTER_WINDOW):
+        self.fallbacks = fallbacks
+        self.window = max(1, window)
+        self._stats: dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _model(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self.window)
+        return stats
+
+    def _unhealthy(self, model: str) -> bool:
+        stats = self._stats.get(model)
+        return (
+            stats is not None
+            and len(stats.outcomes) >= LLM_ROUTER_MIN_SAMPLES
+            and stats.error_rate() > LLM_ROUTER_MAX_ERROR_RATE
+        )
+
+    def candidates(self, model: str) -> list[str]:
+        """The requested model followed by its fallbacks, with models that are currently failing moved last."""
+        chain = [model] + [m for m in self.fallbacks.get(model, []) if m != model]
+        if not LLM_ROUTER_ENABLED:
+            return chain[:1]
+        with self._lock:
+            return [m for m in chain if not self._unhealthy(m)] + [m for m in chain if self._unhealthy(m)]
+
+    def hedge_delay(self, model: str, streaming: bool) -> float | None:
+        """Seconds to wait on `model` before starting a hedged request, or None when hedging is off or unknown."""
+        if not (LLM_ROUTER_ENABLED and LLM_HEDGE_ENABLED):
+            return None
+        with self._lock:
+            stats = self._stats.get(model)
+            samples = (stats.ttft if streaming else stats.latency) if stats is not None else ()
+            if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            return max(LLM_HEDGE_MIN_SECONDS, _p95(samples))
+
+    def record_success(self, model: str, seconds: float, streaming: bool) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats.requests += 1
+            stats.outcomes.append(1)
+            (stats.ttft if streaming else stats.latency).append(seconds)
+
+    def record_error(self, model: str, stalled: bool = False) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats.requests += 1
+            stats.errors += 1
+            stats.stalls += int(stalled)
+            stats.outcomes.append(0)
+
+    def record_failover(self) -> None:
+        with self._lock:
+            self.failovers += 1
+
+    def record_hedge(self, won: bool | None = None) -> None:
+        """Count a hedge when it starts (won=None) and again when it beats the primary (won=True)."""
+        with self._lock:
+            if won is None:
+                self.hedges += 1
+            elif won:
+                self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": {m: s.snapshot() for m, s in self._stats.items()},
+                "failovers": self.failovers,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+
+router = ModelRouter(LLM_FALLBACKS)
+
+
+def fallback_model(model: str) -> str:
+    """Best alternative to `model` right now (the model itself when it has no fallback)."""
+    chain = router.candidates(model) if LLM_ROUTER_ENABLED else [model] + LLM_FALLBACKS.get(model, [])
+    return next((m for m in chain if m != model), model)
@@ -0,0 +1,536 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfgen import canvas
+
+# Notes-to-PDF export: built on a small worker pool and cached by a hash of the notes
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "2"))
+PDF_EXPORT_CACHE_ENTRIES = int(os.getenv("PDF_EXPORT_CACHE_ENTRIES", "32"))
+# Lay out notes while they stream so the download is ready the moment generation ends
+PDF_EXPORT_INCREMENTAL = os.getenv("PDF_EXPORT_INCREMENTAL", "1") not in {"0", "false", "False", ""}
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+BULLET_RE = re.compile(r"^(\s*)([-*•])\s+(.*)$")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+TABLE_ROW_RE = re.compile(r"^\s*\|.*\|\s*$")
+TABLE_RULE_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+# --- Font metrics -----------------------------------------------------------
+
+# Word widths are memoized per font; the memo is dropped when it grows past this many words
+WORD_CACHE_MAX = 50_000
+
+
+class FontMetrics:
+    """Glyph advance widths (1/1000 em) of one standard PDF font, plus memoized word widths.
+
+    The table is built once from the font's WinAnsi widths, so measuring a word is a few
+    dict lookups instead of reportlab's per-call encoding and font-substitution pass.
+    Characters outside the encoding are measured by reportlab once and remembered.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.widths: dict[str, float] = {}
+        for code, width in enumerate(pdfmetrics.getFont(name).widths):
+            try:
+                self.widths[bytes([code]).decode("cp1252")] = width
+            except UnicodeDecodeError:
+                continue
+        self.space = self.widths[" "]
+        self._words: dict[str, float] = {}
+
+    def _char(self, ch: str) -> float:
+        width = self.widths[ch] = pdfmetrics.stringWidth(ch, self.name, 1000)
+        return width
+
+    def word_width(self, word: str) -> float:
+        """Width of `word` in 1/1000 em."""
+        width = self._words.get(word)
+        if width is None:
+            get = self.widths.get
+            width = 0.0
+            for ch in word:
+                w = get(ch)
+                width += w if w is not None else self._char(ch)
+            if len(self._words) >= WORD_CACHE_MAX:
+                self._words.clear()
+            self._words[word] = width
+        return width
+
+    def string_width(self, text: str, size: float) -> float:
+        get = self.widths.get
+        total = 0.0
+        for ch in text:
+            w = get(ch)
+            total += w if w is not None else self._char(ch)
+        return total * size / 1000.0
+
+    def wrap(self, text: str, size: float, max_width: float) -> list[str]:
+        """Greedy word wrap with the same rules as reportlab's simpleSplit, on cumulative widths."""
+        limit = max_width * 1000.0 / size
+        space = self.space
+        lines: list[str] = []
+        current: list[str] = []
+        used = -space
+        for word in text.split():
+            width = self.word_width(word)
+            if used + space + width <= limit or not current:
+                current.append(word)
+                used += space + width
+            else:
+                lines.append(" ".join(current))
+                current = [word]
+                used = width
+        if current:
+            lines.append(" ".join(current))
+        return lines
+
+
+_metrics: dict[str, FontMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def font_metrics(name: str) -> FontMetrics:
+    with _metrics_lock:
+        metrics = _metrics.get(name)
+        if metrics is None:
+            metrics = _metrics[name] = FontMetrics(name)
+        return metrics
+
+
+def wrap_text(text: str, font: str, size: float, max_width: float) -> list[str]:
+    """Drop-in for reportlab's simpleSplit(text, font, size, max_width) on single lines."""
+    return font_metrics(font).wrap(text, size, max_width)
+
+
+# --- Layout -----------------------------------------------------------------
+
+class _FlateCanvas(canvas.Canvas):
+    """Canvas whose page streams are binary Flate instead of Flate + ASCII85.
+
+    The base-85 pass is pure Python without reportlab's C accelerator and inflates every page by
+    a quarter. reportlab only offers this as the process-wide rl_config.useA85, so each page gets
+    its content stream here instead; other PDFs made in the process keep reportlab's default.
+    """
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if page.compression and not page.Contents:
+            stream = pdfdoc.PDFStream(content=page.stream, filters=[pdfdoc.PDFZCompress])
+            stream.__Comment__ = "page stream"
+            page.Contents = stream
+
+
+class NotesPdfWriter:
+    """Lays out markdown-style notes one line at a time.
+
+    Handles headings, bullets, paragraphs, fenced code blocks and pipe tables. Code blocks
+    and tables are buffered until they end; everything else depends only on the current page
+    position, so feeding lines as they arrive produces the same document as rendering the
+    finished text in one go.
+    """
+
+    CODE_FONT = "Courier"
+    CODE_SIZE = 9.5
+    CODE_LEADING = 12
+    TABLE_SIZE = 10
+    TABLE_LEADING = 13
+    TABLE_PAD = 4
+
+    def __init__(self, title: str = "BrainDrain Notes", wrap: Callable[[str, str, float, float], list[str]] = wrap_text):
+        self.title = title
+        self.wrap = wrap
+        self.buffer = io.BytesIO()
+        self.c = _FlateCanvas(self.buffer, pagesize=letter)
+        self.width, self.height = letter
+
+        self.left_margin = 54
+        self.right_margin = 54
+        self.top_margin = 54
+        self.bottom_margin = 54
+        self.usable_width = self.width - self.left_margin - self.right_margin
+
+        self.base_font = "Helvetica"
+        self.base_size = 12
+        self.line_height = 16
+
+        self.lines = 0
+        self.page_num = 1
+        self._code: list[str] | None = None
+        self._table: list[str] = []
+        self._draw_header()
+        self.c.setFont(self.base_font, self.base_size)
+        self.y = self.height - self.top_margin - 24
+
+    def _draw_header(self):
+        c = self.c
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(self.left_margin, self.height - self.top_margin + 6, self.title)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(self.width - self.right_margin, self.height - self.top_margin + 6, f"Page {self.page_num}")
+        c.setLineWidth(0.5)
+        c.line(self.left_margin, self.height - self.top_margin, self.width - self.right_margin, self.height - self.top_margin)
+
+    def _new_page(self):
+        self.page_num += 1
+        self.c.showPage()
+        self._draw_header()
+        self.c.setFont(self.base_font, self.base_size)
+        self.y = self.height - self.top_margin - 24
+
+    def _draw_lines(self, lines: list[str], x: float, font: str, size: float, leading: float) -> None:
+        """Draw wrapped lines top-down, one text object per page instead of one per line."""
+        i = 0
+        while i < len(lines):
+            if self.y <= self.bottom_margin:
+                self._new_page()
+            text = self.c.beginText(x, self.y)
+            text.setFont(font, size, leading)
+            while i < len(lines) and self.y > self.bottom_margin:
+                text.textLine(lines[i])
+                self.y -= leading
+                i += 1
+            self.c.drawText(text)
+
+    def add_line(self, raw_line: str) -> None:
+        self.lines += 1
+        line = raw_line.replace("\t", "    ").rstrip()
+
+        # Fenced code block: collect until the closing fence
+        if FENCE_RE.match(line):
+            self._flush_table()
+            if self._code is None:
+                self._code = []
+            else:
+                self._draw_code(self._code)
+                self._code = None
+            return
+        if self._code is not None:
+            self._code.append(line)
+            return
+
+        # Pipe table rows are laid out together once the table ends
+        if TABLE_ROW_RE.match(line):
+            self._table.append(line)
+            return
+        self._flush_table()
+
+        # Blank line -> small spacing
+        if not line.strip():
+            self.y -= 8
+            if self.y <= self.bottom_margin:
+                self._new_page()
+            return
+
+        # Heading detection (#, ##, ### ...)
+        h_match = HEADING_RE.match(line)
+        if h_match:
+            self._draw_heading(*h_match.groups())
+            return
+
+        # Bullet detection (-, *, •) with indentation
+        b_match = BULLET_RE.match(line)
+        if b_match:
+            indent_spaces, symbol, b_text = b_match.groups()
+            # Compute bullet level by leading spaces (2 spaces per level)
+            level = min(len(indent_spaces) // 2, 4)
+            indent_offset = 22 + (level * 20)
+            wrapped = self.wrap(b_text, self.base_font, self.base_size, self.usable_width - indent_offset)
+            if wrapped:
+                if self.y <= self.bottom_margin:
+                    self._new_page()
+                self.c.setFont(self.base_font, self.base_size)
+                self.c.drawString(self.left_margin + indent_offset - 10, self.y, "•")
+                self._draw_lines(wrapped, self.left_margin + indent_offset, self.base_font, self.base_size, self.line_height)
+            # Spacing after a bullet block
+            self.y -= 6
+            return
+
+        # Regular paragraph line
+        wrapped = self.wrap(line, self.base_font, self.base_size, self.usable_width)
+        self._draw_lines(wrapped, self.left_margin, self.base_font, self.base_size, self.line_height)
+        # Paragraph spacing
+        self.y -= 8
+
+    def _draw_heading(self, hashes: str, h_text: str) -> None:
+        c = self.c
+        # Larger font sizes for headings
+        size = {1: 26, 2: 22, 3: 18}.get(len(hashes), 16)
+        # Spacing before heading
+        self.y -= 12
+        if self.y <= self.bottom_margin:
+            self._new_page()
+        c.setFont("Helvetica-Bold", size)
+        for i, w in enumerate(self.wrap(h_text, "Helvetica-Bold", size, self.usable_width)):
+            if self.y <= self.bottom_margin:
+                self._new_page()
+                c.setFont("Helvetica-Bold", size)
+            c.drawString(self.left_margin, self.y, w)
+            self.y -= (size + 4 if i == 0 else size + 2)
+        # Spacing after heading
+        self.y -= 8
+        c.setFont(self.base_font, self.base_size)
+
+    def _draw_code(self, code: list[str]) -> None:
+        """Monospace block on a light background; long lines are broken at the column limit."""
+        c = self.c
+        x = self.left_margin + 8
+        inner = self.usable_width - 16
+        columns = max(1, int(inner * 1000 / (600 * self.CODE_SIZE)))  # Courier glyphs are all 600 units
+        lines: list[str] = []
+        for line in code or [""]:
+            lines += [line[i:i + columns] for i in range(0, len(line), columns)] or [""]
+
+        self.y -= 4
+        i = 0
+        while i < len(lines):
+            if self.y - self.CODE_LEADING <= self.bottom_margin:
+                self._new_page()
+            fits = max(1, int((self.y - self.bottom_margin) // self.CODE_LEADING))
+            chunk = lines[i:i + fits]
+            top = self.y + self.CODE_LEADING - 3
+            c.setFillGray(0.94)
+            c.rect(self.left_margin, top - len(chunk) * self.CODE_LEADING - 4, self.usable_width,
+                   len(chunk) * self.CODE_LEADING + 4, stroke=0, fill=1)
+            c.setFillGray(0)
+            self._draw_lines(chunk, x, self.CODE_FONT, self.CODE_SIZE, self.CODE_LEADING)
+            i += len(chunk)
+        self.y -= 10
+        c.setFont(self.base_font, self.base_size)
+
+    def _flush_table(self) -> None:
+        if not self._table:
+            return
+        rows = self._table
+        self._table = []
+        header = len(rows) > 1 and bool(TABLE_RULE_RE.match(rows[1]))
+        cells = [[cell.strip() for cell in row.strip().strip("|").split("|")] for row in rows if not TABLE_RULE_RE.match(row)]
+        if cells:
+            self._draw_table(cells, header)
+
+    def _draw_table(self, rows: list[list[str]], header: bool) -> None:
+        """Grid table; column widths follow each column's longest cell, scaled to the page width."""
+        c = self.c
+        size, leading, pad = self.TABLE_SIZE, self.TABLE_LEADING, self.TABLE_PAD
+        ncols = max(len(r) for r in rows)
+        rows = [r + [""] * (ncols - len(r)) for r in rows]
+        regular, bold = font_metrics("Helvetica"), font_metrics("Helvetica-Bold")
+        natural = [
+            max((bold if header and r == 0 else regular).string_width(rows[r][col], size) for r in range(len(rows))) + 2 * pad
+            for col in range(ncols)
+        ]
+        floor = min(48.0, self.usable_width / ncols)
+        widths = [max(floor, w) for w in natural]
+        total = sum(widths)
+        if total > self.usable_width:
+            widths = [w * self.usable_width / total for w in widths]
+
+        self.y -= 4
+        c.setLineWidth(0.5)
+        for r, row in enumerate(rows):
+            font = "Helvetica-Bold" if header and r == 0 else "Helvetica"
+            wrapped = [self.wrap(text, font, size, widths[col] - 2 * pad) or [""] for col, text in enumerate(row)]
+            height = max(len(w) for w in wrapped) * leading + 2 * pad
+            if self.y - height < self.bottom_margin:
+                self._new_page()
+            top = self.y + leading - 3
+            x = self.left_margin
+            if header and r == 0:
+                c.setFillGray(0.9)
+                c.rect(x, top - height, sum(widths), height, stroke=0, fill=1)
+                c.setFillGray(0)
+            for col, lines in enumerate(wrapped):
+                c.rect(x, top - height, widths[col], height, stroke=1, fill=0)
+                text = c.beginText(x + pad, self.y - pad)
+                text.setFont(font, size, leading)
+                for line in lines:
+                    text.textLine(line)
+                c.drawText(text)
+                x += widths[col]
+            self.y -= height
+        self.y -= 10
+        c.setFont(self.base_font, self.base_size)
+
+    def close(self) -> bytes:
+        if self._code is not None:
+            self._draw_code(self._code)
+            self._code = None
+        self._flush_table()
+        if not self.lines:
+            self.add_line("")
+        self.c.save()
+        return self.buffer.getvalue()
+
+
+def generate_pdf_from_text(text: str, title: str = "BrainDrain Notes") -> bytes:
+    """Generate a multi-page PDF from plain/markdown text and return bytes.
+    Enhancements:
+    - Larger headings for topics and subtopics (markdown-style #, ##, ###).
+    - Proper bullets with indentation for sub-bullets.
+    - Consistent spacing between sections and paragraphs.
+    - Fenced code blocks in a monospace font and markdown pipe tables as grids.
+    """
+    writer = NotesPdfWriter(title)
+    for line in (text or "").splitlines():
+        writer.add_line(line)
+    return writer.close()
+
+
+def export_digest(text: str, title: str) -> str:
+    """Cache key of an export: hex SHA-256 of the title and the notes text."""
+    return hashlib.sha256(f"{title}\0{text}".encode("utf-8")).hexdigest()
+
+
+# --- Export pool and cache --------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Lazily start the shared export pool. Threads, because the streaming writer keeps a live canvas."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, PDF_EXPORT_WORKERS), thread_name_prefix="pdf-export")
+        return _pool
+
+
+class ExportCache:
+    """Bounded LRU of export futures keyed by export_digest, shared by every session in the process.
+
+    Holding futures (not bytes) means a second request for an export that is still being
+    built waits for it instead of starting another one.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Future | None:
+        with self._lock:
+            future = self._entries.get(digest)
+            if future is None:
+                return None
+            if future.done() and future.exception() is not None:
+                # Never serve a failed build; the next request retries
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return future
+
+    def put(self, digest: str, future: Future) -> Future:
+        """Store `future` unless another build for the same digest got there first; returns the stored one."""
+        with self._lock:
+            existing = self._entries.get(digest)
+            if existing is not None and not (existing.done() and existing.exception() is not None):
+                self._entries.move_to_end(digest)
+                return existing
+            self._entries[digest] = future
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return future
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+export_cache = ExportCache(PDF_EXPORT_CACHE_ENTRIES)
+
+
+def export_pdf(text: str, title: str = "BrainDrain Notes") -> Future:
+    """Future PDF bytes for `text`: a cached (or in-flight) build when there is one, else a new pool job."""
+    digest = export_digest(text, title)
+    future = export_cache.get(digest)
+    if future is not None:
+        return future
+    return export_cache.put(digest, _get_pool().submit(generate_pdf_from_text, text, title))
+
+
+def export_pdf_bytes(text: str, title: str = "BrainDrain Notes") -> bytes:
+    """Blocking export_pdf; suitable as a deferred st.download_button data callable."""
+    return export_pdf(text, title).result()
+
+
+class StreamingPdfExport:
+    """Builds the notes PDF on the export pool while the notes are still streaming.
+
+    feed() only buffers text and schedules work, so the script thread never lays out pages.
+    Complete lines are rendered in order by at most one pool task at a time; finish() renders
+    the trailing partial line and caches the result under the digest of the full text.
+    """
+
+    def __init__(self, title: str = "BrainDrain Notes"):
+        self.title = title
+        self._parts: list[str] = []
+        self._partial = ""
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._closing = False
+        self._writer: NotesPdfWriter | None = None
+        self.result: Future = Future()
+
+    def feed(self, chunk: str) -> None:
+        if not chunk or self._closing:
+            return
+        self._parts.append(chunk)
+        *complete, self._partial = (self._partial + chunk).split("\n")
+        if complete:
+            self._enqueue(complete)
+
+    def _enqueue(self, lines: list[str]) -> None:
+        with self._lock:
+            self._pending.extend(lines)
+            if self._running:
+                return
+            self._running = True
+        _get_pool().submit(self._drain)
+
+    def _drain(self) -> None:
+        try:
+            if self._writer is None:
+                self._writer = NotesPdfWriter(self.title)
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._running = False
+                        closing = self._closing
+                        break
+                    line = self._pending.popleft()
+                self._writer.add_line(line.rstrip("\r"))
+            if closing and not self.result.done():
+                self.result.set_result(self._writer.close())
+        except Exception as e:
+            with self._lock:
+                self._running = False
+            if not self.result.done():
+                self.result.set_exception(e)
+
+    def finish(self) -> Future:
+        """Flush the last line, close the document and cache it; returns the future bytes."""
+        text = "".join(self._parts)
+        with self._lock:
+            if self._closing:
+                return self.result
+            self._closing = True
+            if self._partial:
+                self._pending.append(self._partial)
+            self._partial = ""
+            start = not self._running
+            self._running = True
+        if start:
+            _get_pool().submit(self._drain)
+        return export_cache.put(export_digest(text, self.title), self.result)
@@ -0,0 +1,348 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from typing import Iterator
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyPDF2 import PdfReader
+
+# Extraction cache settings (memory tier is always on; disk tier only when a directory is set)
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "16"))
+PDF_CACHE_MAX_CHARS = int(os.getenv("PDF_CACHE_MAX_CHARS", "20000000"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+
+
+def _usable_cpus() -> int:
+    """CPUs this process may use: its affinity set, capped by the cgroup v2 CPU quota (the pod's CPU limit)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    try:
+        # "<quota> <period>" in microseconds, or "max <period>" without a limit
+        with open("/sys/fs/cgroup/cpu.max", "r", encoding="utf-8") as fh:
+            quota, period = fh.read().split()[:2]
+        if quota != "max":
+            # Round a fractional limit up: 1500m still gets two workers
+            cpus = min(cpus, -(-int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+# Parallel extraction: documents with fewer pages than the threshold stay on the serial path;
+# the default worker count is the CPUs actually usable here (1 under a 1-CPU pod limit = serial)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or _usable_cpus()
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+
+def pdf_digest(data: bytes) -> str:
+    """Content address of an uploaded PDF (hex SHA-256 of its bytes)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    """Bounded LRU of extracted page texts keyed by document digest, with an optional on-disk tier.
+
+    The memory tier is shared by every Streamlit session in the process. The disk tier
+    survives restarts and is shared by every process pointing at the same directory.
+    """
+
+    def __init__(self, max_entries: int, max_chars: int, directory: str = ""):
+        self.max_entries = max(1, max_entries)
+        self.max_chars = max(1, max_chars)
+        self.directory = directory
+        self._entries: "OrderedDict[str, tuple[str, ...]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, digest: str) -> tuple[str, ...] | None:
+        with self._lock:
+            pages = self._entries.get(digest)
+            if pages is not None:
+                self._entries.move_to_end(digest)
+                return pages
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(digest), "r", encoding="utf-8") as fh:
+                pages = tuple(json.load(fh))
+        except (OSError, ValueError):
+            return None
+        self._remember(digest, pages)
+        return pages
+
+    def put(self, digest: str, pages) -> None:
+        pages = tuple(pages)
+        self._remember(digest, pages)
+        if not self.directory:
+            return
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp = f"{self._path(digest)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(list(pages), fh)
+            os.replace(tmp, self._path(digest))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _remember(self, digest: str, pages: tuple[str, ...]) -> None:
+        size = sum(len(p) for p in pages)
+        if size > self.max_chars:
+            # Larger than the whole memory budget: leave it to the disk tier
+            return
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self._chars -= sum(len(p) for p in old)
+            self._entries[digest] = pages
+            self._chars += size
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= sum(len(p) for p in evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+
+page_cache = PageCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_MAX_CHARS, PDF_CACHE_DIR)
+
+
+# --- Document info ----------------------------------------------------------
+
+_INFO_CACHE_MAX = 64
+_info_cache: "OrderedDict[str, dict]" = OrderedDict()
+_info_lock = threading.Lock()
+
+
+def _flatten_outline(reader: PdfReader, items, level: int, out: list) -> None:
+    for item in items:
+        if isinstance(item, list):
+            _flatten_outline(reader, item, level + 1, out)
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page is None or page < 0:
+            continue
+        out.append((level, str(getattr(item, "title", "") or "Untitled"), page))
+
+
+def _outline_sections(reader: PdfReader, num_pages: int) -> list[dict]:
+    try:
+        items = reader.outline
+    except Exception:
+        return []
+    flat: list = []
+    _flatten_outline(reader, items or [], 0, flat)
+    sections = []
+    for i, (level, title, page) in enumerate(flat):
+        # A section runs until the next entry at the same or a shallower level
+        end = num_pages
+        for next_level, _, next_page in flat[i + 1:]:
+            if next_level <= level:
+                end = max(next_page, page + 1)
+                break
+        sections.append({"title": title, "level": level, "start": page, "end": min(end, num_pages)})
+    return sections
+
+
+def pdf_info(data: bytes, digest: str | None = None) -> dict:
+    """Page count and outline of a document, without extracting any text.
+
+    Returns a dict with shape:
+    {"num_pages": int, "outline": [{"title": str, "level": int, "start": int, "end": int}]}
+    where start/end are a 0-based, end-exclusive page range.
+    """
+    digest = digest or pdf_digest(data)
+    with _info_lock:
+        info = _info_cache.get(digest)
+        if info is not None:
+            _info_cache.move_to_end(digest)
+            return info
+    reader = PdfReader(io.BytesIO(data))
+    num_pages = len(reader.pages)
+    info = {"num_pages": num_pages, "outline": _outline_sections(reader, num_pages)}
+    with _info_lock:
+        _info_cache[digest] = info
+        while len(_info_cache) > _INFO_CACHE_MAX:
+            _info_cache.popitem(last=False)
+    return info
+
+
+# --- Extraction -------------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Lazily start the shared extraction pool. Uses 'spawn' so workers never inherit Streamlit's threads."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_range(data: bytes, start: int, end: int) -> list[str]:
+    """Worker entry point: extract pages [start, end) of the document."""
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _page_ranges(start: int, end: int, per_task: int) -> list[tuple[int, int]]:
+    per_task = max(1, per_task)
+    return [(s, min(s + per_task, end)) for s in range(start, end, per_task)]
+
+
+def workers_for(num_pages: int) -> int:
+    """Number of extraction processes used for a range of this many pages (1 = serial path)."""
+    if PDF_EXTRACT_WORKERS <= 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+        return 1
+    return min(PDF_EXTRACT_WORKERS, len(_page_ranges(0, num_pages, PDF_PAGES_PER_TASK)))
+
+
+def _iter_serial(data: bytes, start: int, end: int) -> Iterator[str]:
+    reader = PdfReader(io.BytesIO(data))
+    for i in range(start, end):
+        yield reader.pages[i].extract_text() or ""
+
+
+def _iter_parallel(data: bytes, start: int, end: int) -> Iterator[str]:
+    """Extract page ranges on the process pool and yield pages in document order.
+
+    At most two tasks per worker are in flight, so finished-but-unconsumed pages stay bounded.
+    """
+    ranges = _page_ranges(start, end, PDF_PAGES_PER_TASK)
+    window = PDF_EXTRACT_WORKERS * 2
+    pending: deque = deque()
+    next_range = 0
+    pos = start
+    try:
+        pool = _get_pool()
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < window:
+                s, e = ranges[next_range]
+                pending.append(pool.submit(_extract_range, data, s, e))
+                next_range += 1
+            for text in pending.popleft().result():
+                yield text
+                pos += 1
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); rebuild the pool next time and finish serially now
+        _reset_pool()
+        yield from _iter_serial(data, pos, end)
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _clamp_range(start: int, end: int | None, num_pages: int) -> tuple[int, int]:
+    start = max(0, min(int(start or 0), num_pages))
+    end = num_pages if end is None else max(start, min(int(end), num_pages))
+    return start, end
+
+
+def _range_key(digest: str, start: int, end: int, num_pages: int) -> str:
+    return digest if (start, end) == (0, num_pages) else f"{digest}:{start}-{end}"
+
+
+def _cached_range(digest: str, start: int, end: int, num_pages: int) -> tuple[str, ...] | None:
+    pages = page_cache.get(_range_key(digest, start, end, num_pages))
+    if pages is None and (start, end) != (0, num_pages):
+        full = page_cache.get(digest)
+        if full is not None:
+            pages = full[start:end]
+    return pages
+
+
+def is_range_cached(data: bytes, start: int = 0, end: int | None = None, digest: str | None = None) -> bool:
+    """True when pages [start, end) can be served without extraction."""
+    digest = digest or pdf_digest(data)
+    num_pages = pdf_info(data, digest)["num_pages"]
+    start, end = _clamp_range(start, end, num_pages)
+    return _cached_range(digest, start, end, num_pages) is not None
+
+
+def iter_pdf_pages(data: bytes, start: int = 0, end: int | None = None, digest: str | None = None) -> Iterator[tuple[int, str]]:
+    """Yield (page_index, text) for pages [start, end) in order, as each page becomes available.
+
+    Only the selected pages are extracted and only they are kept (in the cache, once the
+    range completes). Large ranges are extracted on the process pool.
+    """
+    digest = digest or pdf_digest(data)
+    num_pages = pdf_info(data, digest)["num_pages"]
+    start, end = _clamp_range(start, end, num_pages)
+    cached = _cached_range(digest, start, end, num_pages)
+    if cached is not None:
+        for i, text in enumerate(cached, start):
+            yield i, text
+        return
+    source = _iter_parallel(data, start, end) if workers_for(end - start) > 1 else _iter_serial(data, start, end)
+    pages: list[str] = []
+    for text in source:
+        pages.append(text)
+        yield start + len(pages) - 1, text
+    page_cache.put(_range_key(digest, start, end, num_pages), pages)
+
+
+def extract_pdf(data: bytes, digest: str | None = None, start: int = 0, end: int | None = None) -> dict:
+    """Extract pages [start, end) of a document and report throughput.
+
+    Returns a dict with shape:
+    {"digest": str, "pages": tuple[str, ...], "seconds": float, "pages_per_sec": float,
+     "workers": int, "cached": bool}
+    """
+    digest = digest or pdf_digest(data)
+    started = time.perf_counter()
+    cached = is_range_cached(data, start, end, digest)
+    pages = tuple(text for _, text in iter_pdf_pages(data, start, end, digest))
+    seconds = time.perf_counter() - started
+    return {
+        "digest": digest,
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_sec": len(pages) / seconds if seconds > 0 else 0.0,
+        "workers": 0 if cached else workers_for(len(pages)),
+        "cached": cached,
+    }
+
+
+def extract_pdf_pages(data: bytes, digest: str | None = None) -> tuple[str, ...]:
+    """Return the text of every page, served from the cache when this document was seen before."""
+    return extract_pdf(data, digest)["pages"]
+
+
+def extract_pdf_text(data: bytes, digest: str | None = None) -> str:
+    """Return the full document text (pages concatenated in order)."""
+    return "".join(extract_pdf_pages(data, digest))
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+# Question bank: every generated quiz question is kept, keyed by normalized topic and difficulty
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1") not in {"0", "false", "False", ""}
+QUESTION_BANK_DB = os.getenv("QUESTION_BANK_DB", ".cache/question_bank.sqlite3")
+# Per-session "already seen" marks are forgotten after this long
+QUESTION_BANK_SEEN_TTL_SECONDS = float(os.getenv("QUESTION_BANK_SEEN_TTL_SECONDS", str(7 * 86400)))
+
+# Inputs longer than this are documents: keyed by a digest of their normalized text
+_TOPIC_MAX_CHARS = 120
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_topic(topic_or_text: str) -> str:
+    """Bank key for a quiz source: "DBMS", " dbms! " and "Dbms" share one bank; long text is hashed."""
+    norm = " ".join(_NON_WORD_RE.sub(" ", str(topic_or_text or "").lower()).split())
+    if len(norm) <= _TOPIC_MAX_CHARS:
+        return norm
+    return "doc:" + hashlib.sha256(norm.encode("utf-8")).hexdigest()[:32]
+
+
+def _stem_key(question: str) -> str:
+    return " ".join(str(question).lower().split())
+
+
+class QuestionBank:
+    """Sanitized quiz questions in SQLite, plus which session has already been served which question.
+
+    Questions are unique per (topic, difficulty, normalized stem), so re-adding a question is a
+    no-op. Like the response cache, an unwritable database path turns the bank off instead of
+    failing quiz requests.
+    """
+
+    def __init__(self, db_path: str, seen_ttl: float = QUESTION_BANK_SEEN_TTL_SECONDS):
+        self.db_path = db_path
+        self.seen_ttl = seen_ttl
+        self._db = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path)
+
+    def _conn(self):
+        if not self.db_path:
+            return None
+        if self._db is None:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS questions ("
+                    " id INTEGER PRIMARY KEY, topic TEXT, difficulty TEXT, stem TEXT, body TEXT, created REAL,"
+                    " UNIQUE (topic, difficulty, stem))"
+                )
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS seen ("
+                    " session TEXT, question INTEGER, at REAL, PRIMARY KEY (session, question))"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS seen_at ON seen(at)")
+                db.commit()
+                self._db = db
+            except sqlite3.Error:
+                self.db_path = ""
+                return None
+        return self._db
+
+    def add(self, topic: str, difficulty: str, questions: list[dict]) -> int:
+        """Store questions (create_quiz_json item shape); returns how many were new."""
+        rows = [
+            (topic, difficulty, _stem_key(q["question"]), json.dumps(q, ensure_ascii=False), time.time())
+            for q in questions
+            if str(q.get("question", "")).strip()
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return 0
+            try:
+                before = db.total_changes
+                db.executemany(
+                    "INSERT OR IGNORE INTO questions (topic, difficulty, stem, body, created) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.commit()
+                return db.total_changes - before
+            except sqlite3.Error:
+                return 0
+
+    def unseen_count(self, topic: str, difficulty: str, session: str | None = None) -> int:
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return 0
+            try:
+                return db.execute(
+                    "SELECT COUNT(*) FROM questions q WHERE topic = ? AND difficulty = ?"
+                    " AND NOT EXISTS (SELECT 1 FROM seen s WHERE s.session = ? AND s.question = q.id)",
+                    (topic, difficulty, session or ""),
+                ).fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def take(self, topic: str, difficulty: str, count: int, session: str | None = None,
+             minimum: int | None = None, mark: bool = True) -> list[dict] | None:
+        """Sample up to `count` questions `session` has not seen yet and mark them seen (unless `mark` is False).
+
+        Returns None when fewer than `minimum` (default: `count`) are available. Without a
+        session nothing is marked, so every call samples the whole bank.
+        """
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return None
+            try:
+                ids = [row[0] for row in db.execute(
+                    "SELECT id FROM questions q WHERE topic = ? AND difficulty = ?"
+                    " AND NOT EXISTS (SELECT 1 FROM seen s WHERE s.session = ? AND s.question = q.id)",
+                    (topic, difficulty, session or ""),
+                )]
+                if not ids or len(ids) < (count if minimum is None else minimum):
+                    return None
+                picked = random.sample(ids, min(count, len(ids)))
+                marks = ",".join("?" * len(picked))
+                bodies = dict(db.execute(f"SELECT id, body FROM questions WHERE id IN ({marks})", picked).fetchall())
+                if session and mark:
+                    self._mark(db, session, picked)
+                return [json.loads(bodies[i]) for i in picked]
+            except (sqlite3.Error, ValueError):
+                return None
+
+    def mark_seen(self, topic: str, difficulty: str, session: str | None, questions: list[dict]) -> None:
+        """Record freshly generated questions as already served to `session`."""
+        if not session or not questions:
+            return
+        stems = [_stem_key(q["question"]) for q in questions]
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                marks = ",".join("?" * len(stems))
+                ids = [row[0] for row in db.execute(
+                    f"SELECT id FROM questions WHERE topic = ? AND difficulty = ? AND stem IN ({marks})",
+                    (topic, difficulty, *stems),
+                )]
+                self._mark(db, session, ids)
+            except sqlite3.Error:
+                pass
+
+    def _mark(self, db, session: str, ids: list[int]) -> None:
+        now = time.time()
+        db.executemany("INSERT OR REPLACE INTO seen (session, question, at) VALUES (?, ?, ?)", [(session, i, now) for i in ids])
+        self._writes += 1
+        # Amortized: forget old sessions' marks every 32 writes
+        if self._writes % 32 == 1:
+            db.execute("DELETE FROM seen WHERE at <= ?", (now - self.seen_ttl,))
+        db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return {"questions": 0, "topics": 0}
+            try:
+                questions, topics = db.execute(
+                    "SELECT COUNT(*), COUNT(DISTINCT topic || '|' || difficulty) FROM questions"
+                ).fetchone()
+                return {"questions": questions, "topics": topics}
+            except sqlite3.Error:
+                return {"questions": 0, "topics": 0}
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM seen")
+                db.execute("DELETE FROM questions")
+                db.commit()
+
+
+question_bank = QuestionBank(QUESTION_BANK_DB if QUESTION_BANK_ENABLED else "")
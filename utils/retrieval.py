@@ -0,0 +1,165 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Chunking and retrieval settings
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1200"))
+RETRIEVAL_CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "150"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_INDEX_CACHE = int(os.getenv("RETRIEVAL_INDEX_CACHE", "8"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_BREAK_RE = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i if in into is it its of on or that the "
+    "their then there these this to was were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased alphanumeric terms with common stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def chunk_text(text: str, chunk_chars: int = RETRIEVAL_CHUNK_CHARS, overlap: int = RETRIEVAL_CHUNK_OVERLAP) -> list[str]:
+    """Split text into ~chunk_chars pieces, preferring paragraph and sentence boundaries.
+
+    Consecutive chunks share up to `overlap` characters so facts on a boundary stay retrievable.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    chunk_chars = max(200, chunk_chars)
+    overlap = max(0, min(overlap, chunk_chars // 2))
+    chunks = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        end = min(pos + chunk_chars, n)
+        if end < n:
+            # Cut at the last paragraph/sentence break in the back half of the window
+            window = text[pos + chunk_chars // 2:end]
+            cut = None
+            for m in _BREAK_RE.finditer(window):
+                cut = m.end()
+            if cut is not None:
+                end = pos + chunk_chars // 2 + cut
+        piece = text[pos:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= n:
+            break
+        pos = max(end - overlap, pos + 1)
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over text chunks, stored term-major as NumPy postings arrays.
+
+    Each term owns a slice of `_docs`/`_weights` (CSC-style via `_offsets`), and the per-posting
+    BM25 weight is precomputed at build time, so a query is a sum of a few array slices.
+    """
+
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        tokenized = [tokenize(c) for c in chunks]
+        num_docs = len(chunks)
+        lengths = np.array([len(t) for t in tokenized], dtype=np.float32)
+        avgdl = float(lengths.mean()) if num_docs else 0.0
+
+        postings: dict[str, dict[int, int]] = {}
+        for doc_id, terms in enumerate(tokenized):
+            for term in terms:
+                tf = postings.setdefault(term, {})
+                tf[doc_id] = tf.get(doc_id, 0) + 1
+
+        self.vocab: dict[str, int] = {}
+        offsets = [0]
+        docs: list[int] = []
+        freqs: list[int] = []
+        for term_id, (term, tf) in enumerate(postings.items()):
+            self.vocab[term] = term_id
+            docs.extend(tf.keys())
+            freqs.extend(tf.values())
+            offsets.append(len(docs))
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._docs = np.array(docs, dtype=np.int32)
+        tf_arr = np.array(freqs, dtype=np.float32)
+
+        df = np.diff(self._offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        term_of_posting = np.repeat(np.arange(len(self.vocab)), np.diff(self._offsets))
+        norm = k1 * (1.0 - b + b * lengths[self._docs] / avgdl) if avgdl else np.full_like(tf_arr, k1)
+        self._weights = (self.idf[term_of_posting] * tf_arr * (k1 + 1.0) / (tf_arr + norm)).astype(np.float32)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self._offsets[term_id], self._offsets[term_id + 1]
+            # Each doc appears once per term, so plain fancy-index add is safe here
+            scores[self._docs[lo:hi]] += self._weights[lo:hi]
+        return scores
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> list[tuple[int, float]]:
+        """Top-k (chunk_index, score) pairs with a positive score, best first."""
+        if not self.chunks:
+            return []
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def top_chunks(self, query: str, k: int = RETRIEVAL_TOP_K) -> list[str]:
+        """Best-matching chunks in document order, so excerpts read naturally."""
+        hits = sorted(i for i, _ in self.search(query, k))
+        return [self.chunks[i] for i in hits]
+
+    def salient_query(self, num_terms: int = 24) -> str:
+        """Highest-weighted terms across the document; a stand-in query when the user asked nothing specific."""
+        if not self.vocab:
+            return ""
+        totals = np.add.reduceat(self._weights, self._offsets[:-1]) if len(self._weights) else np.zeros(0)
+        terms = list(self.vocab)
+        best = np.argsort(-totals)[:num_terms]
+        return " ".join(terms[i] for i in best)
+
+
+_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def get_index(text: str, digest: str | None = None) -> BM25Index:
+    """Return the index for a document, building it only the first time its hash is seen."""
+    digest = digest or text_digest(text)
+    with _indexes_lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+            return index
+    index = BM25Index(chunk_text(text))
+    with _indexes_lock:
+        _indexes[digest] = index
+        while len(_indexes) > max(1, RETRIEVAL_INDEX_CACHE):
+            _indexes.popitem(last=False)
+    return index
+
+
+def retrieve_context(text: str, query: str, k: int = RETRIEVAL_TOP_K, digest: str | None = None) -> list[str]:
+    """Top-k chunks of `text` relevant to `query` (falls back to the document's salient terms)."""
+    index = get_index(text, digest)
+    chunks = index.top_chunks(query, k) if query and query.strip() else []
+    if not chunks:
+        chunks = index.top_chunks(index.salient_query(), k)
+    return chunks
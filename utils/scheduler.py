@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from utils.cancellation import current_cancel_token
+from utils.context_packer import estimate_tokens
+
+# Process-wide upstream limits
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1") not in {"0", "false", "False", ""}
+LLM_RATE_RPS = float(os.getenv("LLM_RATE_RPS", "5"))
+LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "10"))
+LLM_TOKENS_PER_MIN = float(os.getenv("LLM_TOKENS_PER_MIN", "200000"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "90"))
+
+# Lower value = served first. Interactive Solver chats jump ahead of quizzes, which jump ahead of long notes;
+# speculative quiz prefetches and background question bank top-ups go last.
+PRIORITIES = {"solver": 0, "quizzer": 1, "notes": 2, "quiz_prefetch": 3, "quiz_topup": 3}
+DEFAULT_PRIORITY = 1
+
+_POLL_SECONDS = 0.25
+
+
+class QueueTimeout(RuntimeError):
+    """Raised when a request waited longer than its queue timeout for an upstream slot."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` units/sec refill up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 1e-9)
+        self.capacity = max(capacity, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 when it is available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+# Observer for the current caller's queue position; set by the UI around a generation
+_queue_observer: contextvars.ContextVar = contextvars.ContextVar("llm_queue_observer", default=None)
+
+
+@contextmanager
+def queue_status(callback: Callable[[int], None]):
+    """Report queue position changes to `callback(position)` for calls made inside this block (0 = admitted)."""
+    token = _queue_observer.set(callback)
+    try:
+        yield
+    finally:
+        _queue_observer.reset(token)
+
+
+def current_observer():
+    return _queue_observer.get()
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "tokens", "mode")
+
+    def __init__(self, priority: int, seq: int, tokens: float, mode: str):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.mode = mode
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Scheduler:
+    """Priority queue in front of two token buckets (requests/sec and tokens/min).
+
+    Requests are admitted strictly in (priority, arrival) order: the head of the queue waits for
+    both buckets, everyone else waits behind it. Works for threads (`acquire`) and coroutines
+    (`aacquire`) sharing the same queue.
+    """
+
+    def __init__(self, rps: float, burst: float, tokens_per_min: float, enabled: bool = True):
+        self.enabled = enabled
+        self.requests = TokenBucket(rps, burst)
+        self.tokens = TokenBucket(tokens_per_min / 60.0, tokens_per_min)
+        self._cond = threading.Condition()
+        self._heap: list[_Ticket] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.timeouts = 0
+
+    def _enqueue(self, mode: str, tokens: float) -> _Ticket:
+        ticket = _Ticket(PRIORITIES.get(mode, DEFAULT_PRIORITY), next(self._seq), tokens, mode)
+        with self._cond:
+            heapq.heappush(self._heap, ticket)
+        return ticket
+
+    def _position(self, ticket: _Ticket) -> int:
+        return 1 + sum(1 for t in self._heap if t < ticket)
+
+    def _try_admit(self, ticket: _Ticket) -> tuple[bool, float, int]:
+        """(admitted, seconds to wait, queue position). Must hold the condition lock."""
+        if self._heap and self._heap[0] is ticket:
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(ticket.tokens)
+                heapq.heappop(self._heap)
+                self.admitted += 1
+                self._cond.notify_all()
+                return True, 0.0, 0
+            return False, min(wait, _POLL_SECONDS), 1
+        return False, _POLL_SECONDS, self._position(ticket)
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        with self._cond:
+            try:
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+            except ValueError:
+                pass
+            self._cond.notify_all()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, mode: str, tokens: float, timeout: float | None = None, observer=None, cancel=None) -> None:
+        """Block until this request may go upstream; raises QueueTimeout after `timeout` seconds and
+        Cancelled as soon as `cancel` (default: the current cancel token) is cancelled."""
+        if not self.enabled:
+            return
+        observer = observer or current_observer()
+        cancel = cancel or current_cancel_token()
+        deadline = time.monotonic() + (LLM_QUEUE_TIMEOUT_SECONDS if timeout is None else timeout)
+        ticket = self._enqueue(mode, tokens)
+        last = None
+        unregister = cancel.on_cancel(self._wake) if cancel is not None else None
+        try:
+            while True:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                with self._cond:
+                    admitted, wait, position = self._try_admit(ticket)
+                    if not admitted:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise QueueTimeout(f"Timed out after waiting in the model queue ({mode}).")
+                        if position == last:
+                            self._cond.wait(min(wait, remaining))
+                if observer is not None and position != last and (last is not None or position > 0):
+                    observer(position)
+                last = position
+                if admitted:
+                    return
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+
+    async def aacquire(self, mode: str, tokens: float, timeout: float | None = None, observer=None, cancel=None) -> None:
+        """Coroutine version of acquire; polls instead of blocking the event loop."""
+        if not self.enabled:
+            return
+        observer = observer or current_observer()
+        cancel = cancel or current_cancel_token()
+        deadline = time.monotonic() + (LLM_QUEUE_TIMEOUT_SECONDS if timeout is None else timeout)
+        ticket = self._enqueue(mode, tokens)
+        last = None
+        try:
+            while True:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                with self._cond:
+                    admitted, wait, position = self._try_admit(ticket)
+                if observer is not None and position != last and (last is not None or position > 0):
+                    observer(position)
+                last = position
+                if admitted:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise QueueTimeout(f"Timed out after waiting in the model queue ({mode}).")
+                await asyncio.sleep(min(wait, remaining, 0.05))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def stats(self) -> dict:
+        with self._cond:
+            waiting = {}
+            for t in self._heap:
+                waiting[t.mode] = waiting.get(t.mode, 0) + 1
+        return {"admitted": self.admitted, "timeouts": self.timeouts, "waiting": waiting}
+
+
+scheduler = Scheduler(LLM_RATE_RPS, LLM_RATE_BURST, LLM_TOKENS_PER_MIN, LLM_RATE_LIMIT_ENABLED)
+
+
+def estimate_request_tokens(prompt: str, max_tokens: int | None) -> int:
+    """Rough prompt + completion budget used for the tokens/min bucket."""
+    return estimate_tokens(prompt) + (max_tokens or 1024)
@@ -0,0 +1,161 @@
+import threading
+from typing import Callable, Iterable, Iterator
+
+from utils.cancellation import CancelToken, cancel_scope
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls: the first caller runs `fn`, later callers wait for its result.
+
+    A waiter whose `cancel` token is cancelled stops waiting (raising Cancelled); the call goes on
+    for the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable, cancel: CancelToken | None = None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            while not call.done.wait(0.1):
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class _Broadcast:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: list = []
+        self.finished = False
+        self.abandoned = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        # Cancelled once every subscriber has gone, so the upstream stops without waiting for its next chunk
+        self.token = CancelToken()
+
+
+class StreamGroup:
+    """Coalesce concurrent identical streams: one upstream iterator fans out to every subscriber.
+
+    The upstream is drained by a pump thread so a slow subscriber never stalls the others.
+    Subscribers that join late first receive the chunks already produced. A subscriber leaves by
+    closing its iterator or through its `cancel` token. When every subscriber has gone away, the
+    flight's own cancel token (current while the upstream runs) is cancelled and the pump closes
+    the upstream iterator.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def stream(self, key: str, factory: Callable[[], Iterable], cancel: CancelToken | None = None) -> Iterator:
+        with self._lock:
+            b = self._flights.get(key)
+            leader = b is None or b.abandoned
+            if leader:
+                b = _Broadcast()
+                self._flights[key] = b
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+            with b.cond:
+                b.subscribers += 1
+        if leader:
+            threading.Thread(target=self._pump, args=(key, b, factory), name="llm-stream-pump", daemon=True).start()
+        return self._subscribe(key, b, cancel)
+
+    def _pump(self, key: str, b: _Broadcast, factory: Callable[[], Iterable]) -> None:
+        it = None
+        try:
+            with cancel_scope(b.token):
+                it = iter(factory())
+                for chunk in it:
+                    with b.cond:
+                        if b.abandoned:
+                            break
+                        b.chunks.append(chunk)
+                        b.cond.notify_all()
+        except BaseException as e:
+            b.error = e
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            with self._lock:
+                if self._flights.get(key) is b:
+                    del self._flights[key]
+            with b.cond:
+                b.finished = True
+                b.cond.notify_all()
+
+    def _wake(self, b: _Broadcast) -> None:
+        with b.cond:
+            b.cond.notify_all()
+
+    def _subscribe(self, key: str, b: _Broadcast, cancel: CancelToken | None = None) -> Iterator:
+        pos = 0
+        unregister = cancel.on_cancel(lambda: self._wake(b)) if cancel is not None else None
+        try:
+            while True:
+                with b.cond:
+                    while pos >= len(b.chunks) and not b.finished and not (cancel is not None and cancel.cancelled):
+                        b.cond.wait()
+                    if cancel is not None and cancel.cancelled:
+                        return
+                    batch = b.chunks[pos:]
+                    finished = b.finished
+                pos += len(batch)
+                yield from batch
+                if finished and pos >= len(b.chunks):
+                    if b.error is not None:
+                        raise b.error
+                    return
+        finally:
+            if unregister is not None:
+                unregister()
+            with self._lock:
+                with b.cond:
+                    b.subscribers -= 1
+                    abandoned = b.subscribers <= 0 and not b.finished
+                    if abandoned:
+                        b.abandoned = True
+                        if self._flights.get(key) is b:
+                            del self._flights[key]
+            if abandoned:
+                b.token.cancel()